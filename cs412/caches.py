@@ -0,0 +1,32 @@
+"""
+The site's named caches.
+
+"default" is per process and only holds entries keyed by a data version,
+which any worker can rebuild. Data version counters live in "versions", a
+database table shared by the web workers and management commands that only
+ever holds those few counters, so they are never culled. Heavy users' seen
+bitmaps live in "swipe", shared by the workers.
+
+Settings overrides (as in tests) that only define the default cache get it
+for every name.
+"""
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+VERSIONS_ALIAS = 'versions'
+SWIPE_ALIAS = 'swipe'
+
+
+def get_cache(alias):
+    """Return the named cache, or the default cache when it isn't configured."""
+    return caches[alias if alias in settings.CACHES else DEFAULT_CACHE_ALIAS]
+
+
+def versions_cache():
+    """Return the cache holding data version counters."""
+    return get_cache(VERSIONS_ALIAS)
+
+
+def swipe_cache():
+    """Return the cache holding users' seen bitmaps."""
+    return get_cache(SWIPE_ALIAS)
@@ -0,0 +1,125 @@
+"""
+Pagination with cached and approximate counts.
+
+Django's Paginator runs SELECT COUNT(*) over the whole filtered queryset on
+every page, which on a large table costs as much as fetching the page. Here
+counts are kept in Django's cache under a key built from the filters and a
+version of the data, so each filter combination is counted at most once per
+change to the table. Without a cached count a page fetches one extra row
+instead, which tells whether another page follows; the total is then only
+known to be "at least" that far, until the last page is reached and gives
+the exact count for free.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models.signals import post_delete, post_save
+
+from .caches import versions_cache
+
+# Seconds a count stays cached; changes to the data already invalidate it
+COUNT_TIMEOUT = 24 * 60 * 60
+
+
+def table_version(model):
+    """Return the version of a model's table, bumped by every tracked change."""
+    return versions_cache().get(f'pagination:version:{model._meta.label_lower}', 0)
+
+
+def bump_table_version(model):
+    """Invalidate every count cached for a model's table."""
+    key = f'pagination:version:{model._meta.label_lower}'
+    try:
+        return versions_cache().incr(key)
+    except ValueError:
+        version = int(time.time())
+        versions_cache().set(key, version, timeout=None)
+        return version
+
+
+def track_table_changes(model):
+    """Bump the model's table version whenever one of its rows is saved or deleted."""
+    def changed(sender, **kwargs):
+        bump_table_version(sender)
+
+    # Weak references would drop the closure straight away
+    post_save.connect(changed, sender=model, weak=False, dispatch_uid=f'pagination:{model._meta.label_lower}:save')
+    post_delete.connect(changed, sender=model, weak=False, dispatch_uid=f'pagination:{model._meta.label_lower}:delete')
+
+
+def count_key(namespace, version, cleaned_data):
+    """
+    Build the cache key for the count of one filter combination.
+
+    Empty filters are dropped and model instances (from ModelChoiceFields)
+    stand for their primary key, so equivalent queries share a key.
+    """
+    filters = sorted(
+        (name, getattr(value, 'pk', value)) for name, value in cleaned_data.items()
+        if value not in (None, '', False)
+    )
+    digest = hashlib.blake2b(repr(filters).encode(), digest_size=16).hexdigest()
+    return f'pagination:count:{namespace}:{version}:{digest}'
+
+
+def cached_count(queryset, key):
+    """Return the queryset's count from the cache, counting and storing it on a miss."""
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout=COUNT_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator whose count comes from the cache, or is a lower bound.
+
+    `count_key` is the cache key for this queryset's count (see count_key).
+    When it is cached, paging works like Paginator's. Otherwise page()
+    fetches per_page + 1 rows, and count is the number of rows known to
+    exist up to there, with `exact` False, so num_pages is "at least" one
+    more than the current page while more rows follow. Reading count before
+    asking for a page counts exactly, as does the 'last' page of a ListView.
+    orphans is not supported.
+    """
+
+    def __init__(self, object_list, per_page, count_key, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self._count = cache.get(count_key)
+        # Whether count is the real total rather than a lower bound
+        self.exact = self._count is not None
+
+    @property
+    def count(self):
+        if self._count is None:
+            self._count = cached_count(self.object_list, self.count_key)
+            self.exact = True
+        return self._count
+
+    def page(self, number):
+        """Return the page, fetching one extra row instead of counting when the count is not cached."""
+        if self._count is not None:
+            return super().page(number)
+
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage(self.error_messages['no_results'])
+
+        self._count = bottom + len(rows)
+        # Unless more rows follow this is the last page, and so the exact count
+        self.exact = len(rows) <= self.per_page
+        if self.exact:
+            cache.set(self.count_key, self._count, timeout=COUNT_TIMEOUT)
+        return self._get_page(rows[:self.per_page], number, self)
@@ -79,13 +79,71 @@ WSGI_APPLICATION = "cs412.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Read-only copy of the database that load_voters writes after every load
+# (see voter_analytics/replica.py)
+VOTER_REPLICA_PATH = BASE_DIR / "analytics_replica.sqlite3"
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    # The replica file is only ever replaced whole, never written in place,
+    # so SQLite can skip locking it (immutable) and read it through mmap
+    "analytics": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"file:{VOTER_REPLICA_PATH}?mode=ro&immutable=1",
+        "OPTIONS": {"init_command": "PRAGMA mmap_size=1073741824"},
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+DATABASE_ROUTERS = ["voter_analytics.routers.AnalyticsReplicaRouter"]
+
+# Send voter_analytics reads to the "analytics" replica once it exists,
+# so they never wait on writes to the main database
+VOTER_ANALYTICS_REPLICA = True
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# See cs412/caches.py for what each cache holds. The database tables of
+# "versions" and "swipe" are created by migrations, so `migrate` sets them up.
+
+CACHES = {
+    # Per process: counts and choice lists keyed by a data version
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "cs412-default",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+    # Data version counters shared by the web workers and management
+    # commands, such as the voter data generation bumped by load_voters;
+    # only a handful of keys, so never culled
+    "versions": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_versions",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+    # Heavy users' seen bitmaps, shared by the web workers and written when
+    # they pass on a profile (see project/seen.py). Swipe queues are a
+    # model, SwipeQueue
+    "swipe": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_swipe",
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    },
 }
 
+# Number of filter combinations whose rendered voter graphs are kept per worker
+VOTER_CHART_CACHE_SIZE = 64
+
+# Answer the voter graphs from an in-memory NumPy snapshot of the voter table
+# instead of SQL (needs numpy); load_voters writes the snapshot files here
+VOTER_GRAPHS_SNAPSHOT = False
+VOTER_SNAPSHOT_DIR = BASE_DIR / "voter_snapshot"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -127,6 +185,19 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedStaticFilesStorage",
+    },
+}
+
+# Versioned vendor files (e.g. plotly-2.35.2.min.js) never change, so
+# WhiteNoise can serve them with far-future immutable cache headers
+WHITENOISE_IMMUTABLE_FILE_TEST = r'-\d+\.\d+\.\d+\.min\.js$'
+
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 MEDIA_URL = '/media/'
 
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class ProjectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'project'
+
+    def ready(self):
+        """
+        Invalidate cached song counts whenever a song changes, log profile
+        changes for the taste index, and drop users' swipe queues whenever
+        their matches or profile change.
+        """
+        from cs412.pagination import track_table_changes
+        from .matching import track_taste_changes
+        from .models import Song
+        from .swipe_queue import track_eligibility_changes
+        track_table_changes(Song)
+        track_taste_changes()
+        track_eligibility_changes()
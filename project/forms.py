@@ -10,6 +10,7 @@ Key Components:
     - Genre and song preference forms
     - Song creation and search forms
     - Inline formsets for handling related data
+    - Swipe deck and like/pass decision forms for the swipe API
 """
 
 from django import forms
@@ -186,4 +187,56 @@ Additioonal documentation of features not used in class:
 Fomsets: https://docs.djangoproject.com/en/5.1/topics/forms/formsets/
 https://medium.com/@adandan01/django-inline-formsets-example-mybook-420cc4b6225d
 
-'''
\ No newline at end of file
+'''
+class SwipeDeckForm(forms.Form):
+    """
+    Form for requesting a deck of swipe candidates.
+    
+    Validates how many cards to return, up to MAX_CARDS per request.
+    """
+    MAX_CARDS = 50
+
+    count = forms.IntegerField(required=False, min_value=1, max_value=MAX_CARDS)
+
+    def clean_count(self):
+        """Defaults to 20 cards."""
+        return self.cleaned_data['count'] or 20
+
+class SwipeDecisionsForm(forms.Form):
+    """
+    Form for a batch of like and pass decisions.
+    
+    Each field is a JSON list of profile ids, either from a JSON request
+    body or as a JSON string in form data. A profile can't be both liked
+    and passed.
+    """
+    MAX_DECISIONS = 200
+
+    likes = forms.JSONField(required=False)
+    passes = forms.JSONField(required=False)
+
+    def clean_profile_ids(self, name):
+        """Checks a field is a list of profile ids, without duplicates."""
+        profile_ids = self.cleaned_data[name] or []
+        if not isinstance(profile_ids, list) or not all(
+            isinstance(profile_id, int) and not isinstance(profile_id, bool) for profile_id in profile_ids
+        ):
+            raise forms.ValidationError("Enter a list of profile ids.")
+        return list(dict.fromkeys(profile_ids))
+
+    def clean_likes(self):
+        return self.clean_profile_ids('likes')
+
+    def clean_passes(self):
+        return self.clean_profile_ids('passes')
+
+    def clean(self):
+        """Ensures the batch isn't too large and no profile is both liked and passed."""
+        cleaned_data = super().clean()
+        likes, passes = cleaned_data.get('likes'), cleaned_data.get('passes')
+        if likes is not None and passes is not None:
+            if len(likes) + len(passes) > self.MAX_DECISIONS:
+                raise forms.ValidationError(f"Send at most {self.MAX_DECISIONS} decisions at a time.")
+            if set(likes) & set(passes):
+                raise forms.ValidationError("A profile can't be both liked and passed.")
+        return cleaned_data
@@ -0,0 +1,95 @@
+"""
+Time a swipe with and without the precomputed swipe queue.
+
+Runs in a scratch copy of the database and fills it with synthetic profiles
+(see project/synthetic.py), gives a user some likes and matches, then times
+picking their next candidate the way SwipeView used to, querying their
+matches and ranking the profiles on every swipe, and by popping their swipe
+queue (see project/swipe_queue.py), counting the queries each takes. The
+queue and the seen bitmaps are kept in the scratch database, as they are on
+the site. Reading a heavy user's seen set (see project/seen.py) is then
+timed from ShownProfile and from its cached bitmap.
+
+Usage:
+    python manage.py benchmark_swipe_queue [--profiles 100000] [--matches 500] [--seen 20000] [--swipes 1000]
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from project import matching, seen, swipe_queue
+from project.models import Match, Profile, ShownProfile
+from project.synthetic import populate
+
+
+class Command(BaseCommand):
+    help = 'Compare the cost of a swipe with and without the precomputed swipe queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=100_000, help='Synthetic profiles to generate.')
+        parser.add_argument('--matches', type=int, default=500, help="Likes and matches of the swiping user.")
+        parser.add_argument('--seen', type=int, default=20_000, help="Profiles the heavy user has been shown.")
+        parser.add_argument('--swipes', type=int, default=1000, help='Swipes timed each way.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            populate(options['profiles'], seed=options['seed'])
+            ids = list(Profile.objects.values_list('pk', flat=True))
+            user = Profile.objects.get(pk=rng.choice(ids))
+            Match.objects.bulk_create(
+                Match(sender=user, receiver_id=other_id, status=rng.choice(['pending', 'accepted']))
+                for other_id in rng.sample(ids, options['matches'])
+                if other_id != user.pk
+            )
+            matching.get_index()
+            self.run(user, options['swipes'])
+            self.run_seen(rng.choice(ids), rng.sample(ids, options['seen']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, user, swipes):
+        def legacy_swipe(cursor):
+            ranked = matching.ranked_candidates(user, exclude=swipe_queue.matched_profile_ids(user), after=cursor)
+            Profile.objects.get(pk=ranked[0][1])
+            return ranked[0]
+
+        def queue_swipe(cursor):
+            candidate, score = swipe_queue.next_candidate(user)
+            return score, candidate.pk
+
+        self.stdout.write(f"{'swipe':<8} {'median ms':>10} {'p95 ms':>8} {'max ms':>8} {'queries':>8}")
+        for label, swipe in [('per-view', legacy_swipe), ('queue', queue_swipe)]:
+            cursor, timings = None, []
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(swipes):
+                    started = time.perf_counter()
+                    cursor = swipe(cursor)
+                    timings.append(1000 * (time.perf_counter() - started))
+            timings.sort()
+            p95 = timings[int(0.95 * (len(timings) - 1))]
+            self.stdout.write(
+                f'{label:<8} {timings[len(timings) // 2]:10.2f} {p95:8.2f} {timings[-1]:8.2f} '
+                f'{len(queries) / swipes:8.2f}'
+            )
+
+    def run_seen(self, user_id, seen_ids):
+        heavy = Profile.objects.get(pk=user_id)
+        ShownProfile.objects.bulk_create(
+            ShownProfile(profile=heavy, shown_profile_id=profile_id) for profile_id in seen_ids if profile_id != user_id
+        )
+        timings = {}
+        # A first read from the table caches the bitmap for the ones after it
+        for label in ['table', 'bitmap']:
+            started = time.perf_counter()
+            profile_ids = seen.seen_profile_ids(heavy)
+            timings[label] = 1000 * (time.perf_counter() - started)
+        self.stdout.write(
+            f"Read a seen set of {len(profile_ids):,} profiles in {timings['table']:.1f} ms from ShownProfile, "
+            f"{timings['bitmap']:.1f} ms from its cached bitmap."
+        )
@@ -0,0 +1,110 @@
+"""
+Time taste compatibility ranking of swipe candidates over synthetic profiles.
+
+Runs in a scratch copy of the database and fills it with synthetic profiles
+(see project/synthetic.py), builds the taste index once, then times ranking
+the next candidate for a sample of users, each with some profiles already
+matched and a cursor part way down their ranking, as SwipeView does. The
+rankings of a few users are checked against scoring every profile in Python.
+Then each user's ranking is timed again right after another profile has
+been edited (saved twice, as ProfileUpdateView does) or has signed up, when
+the index first has to catch up with the change.
+
+Usage:
+    python manage.py benchmark_swipe_ranking [--profiles 100000] [--users 200]
+"""
+import random
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from project import matching
+from project.models import Profile
+from project.synthetic import GENRES
+from project.synthetic import populate
+
+# A swipe's ranking should stay well inside this
+TARGET_MS = 20
+
+
+class Command(BaseCommand):
+    help = 'Time ranking swipe candidates by taste compatibility in a scratch database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', type=int, default=100_000, help='Synthetic profiles to generate.')
+        parser.add_argument('--users', type=int, default=200, help='Users to rank candidates for.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            populate(options['profiles'], seed=options['seed'])
+            started = time.perf_counter()
+            matching.get_index()
+            self.stdout.write(
+                f"Indexed {options['profiles']:,} profiles in {1000 * (time.perf_counter() - started):.0f} ms."
+            )
+            self.run(options['users'], random.Random(options['seed']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, users, rng):
+        ids = list(Profile.objects.values_list('pk', flat=True))
+        tastes = dict(Profile.objects.values_list('pk', 'taste'))
+        timings = []
+        for user_id in rng.sample(ids, users):
+            user = Profile(pk=user_id, taste=tastes[user_id])
+            matched = set(rng.sample(ids, 50))
+            # Start part way down the ranking, as after a few swipes
+            after = matching.ranked_candidates(user, exclude=matched, limit=20)[-1]
+            started = time.perf_counter()
+            ranked = matching.ranked_candidates(user, exclude=matched, after=after)
+            timings.append(1000 * (time.perf_counter() - started))
+            if len(timings) <= 5:
+                self.check_ranking(user, matched, tastes, ranked, after)
+
+        worst = self.report('Ranked the next candidate', timings)
+
+        after_change = []
+        for i, user_id in enumerate(rng.sample(ids, users)):
+            user = Profile(pk=user_id, taste=tastes[user_id])
+            if i % 2:
+                edited = Profile.objects.get(pk=rng.choice(ids))
+                edited.save()
+                edited.taste = sorted({*edited.taste, f'g{rng.randrange(GENRES)}'})
+                edited.save(update_fields=['taste'])
+            else:
+                Profile.objects.create(
+                    username=f'signup{i}', email=f'signup{i}@example.com', birth_date=date(1990, 1, 1),
+                    taste=tastes[rng.choice(ids)],
+                )
+            started = time.perf_counter()
+            matching.ranked_candidates(user)
+            after_change.append(1000 * (time.perf_counter() - started))
+        worst = max(worst, self.report('Ranked the next candidate after an edit or signup', after_change))
+
+        if worst > TARGET_MS:
+            self.stdout.write(self.style.ERROR(f'Ranking took over {TARGET_MS} ms.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Every ranking finished within {TARGET_MS} ms.'))
+
+    def report(self, label, timings):
+        """Print the median and worst of some timings in ms; returns the worst."""
+        timings = sorted(timings)
+        median, worst = timings[len(timings) // 2], timings[-1]
+        self.stdout.write(f'{label} in {median:.1f} ms median, {worst:.1f} ms worst.')
+        return worst
+
+    def check_ranking(self, user, matched, tastes, ranked, after):
+        """Compare the index's next candidate with scoring every profile in Python."""
+        expected = sorted(
+            (-matching.compatibility(user.taste, taste), profile_id)
+            for profile_id, taste in tastes.items()
+            if profile_id != user.pk and profile_id not in matched
+        )
+        position = expected.index((-after[0], after[1]))
+        score, profile_id = expected[position + 1]
+        if ranked != [(-score, profile_id)]:
+            raise CommandError(f'Ranking for profile {user.pk} differs from scoring every profile.')
@@ -0,0 +1,31 @@
+"""
+Delete expired swipe passes from ShownProfile.
+
+Profiles a user passed on are left out of their swipe queue until the
+pass is older than --days, after which they can be shown again. Run
+this daily (e.g. from cron) so the table only holds the live seen sets.
+
+Usage:
+    python manage.py compact_shown_profiles [--days 90] [--chunk-size 5000]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from project import seen
+
+
+class Command(BaseCommand):
+    help = 'Delete the swipe passes older than the seen-profile TTL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=seen.SEEN_TTL_DAYS, help='Keep passes this recent.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Passes deleted per transaction.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        deleted = seen.compact(options['days'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} passes older than {options['days']} days "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,285 @@
+"""
+Taste compatibility ranking for the swipe queue.
+
+Each profile's taste is a sparse vector over features, stored on
+Profile.taste as a sorted list of feature keys: its preferred genres
+("g<genre id>"), its favorite songs ("s<song id>") and the artists of those
+songs ("a:<artist>"). It is refreshed whenever the profile's genre and song
+formsets are saved.
+
+The compatibility of two profiles is the weighted overlap of their vectors:
+every shared genre, favorite song and artist adds its feature's weight, so
+two fans of different songs by the same artist still get a co-artist bonus.
+
+Ranking reads an inverted index held by each worker: for every feature, a
+bitmap (a Python int) of the profiles that have it, bit i standing for the
+i-th profile in id order. The weighted bitmaps of one profile's features are
+added up bit-sliced, into a few bitmaps each holding one binary digit of
+every profile's score, so scoring all profiles costs a handful of big-integer
+operations per feature instead of a Python loop over the profiles. The best
+candidates are then read off from the highest digit down.
+
+Every profile save and deletion is logged in TasteChange. Before ranking, a
+worker applies the entries logged since its last look to its index: it
+moves each changed profile's bit from its old features' bitmaps to its new
+ones, appending new profiles and clearing deleted ones. Only the latest
+CHANGE_LOG_SIZE entries are kept; a worker that has fallen further behind
+rebuilds its index from the Profile table.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
+
+from .models import Profile, ProfileGenre, ProfileSong, TasteChange
+
+# Score added by each shared feature, by feature kind
+WEIGHTS = {
+    'g': 2,  # preferred genre
+    's': 6,  # favorite song
+    'a': 3,  # artist of a favorite song
+}
+
+# TasteChange entries kept for workers catching up
+CHANGE_LOG_SIZE = 10_000
+
+_index = None
+_lock = threading.Lock()
+
+
+def feature_weight(feature):
+    """Return the weight of a feature key."""
+    return WEIGHTS[feature[0]]
+
+
+def taste_features(profile):
+    """Return the sorted feature keys of a profile's genres, favorite songs and their artists."""
+    genre_ids = ProfileGenre.objects.filter(profile=profile).values_list('genre_id', flat=True)
+    features = {f'g{genre_id}' for genre_id in genre_ids}
+    for song_id, artist in ProfileSong.objects.filter(profile=profile).values_list('song_id', 'song__artist'):
+        features.add(f's{song_id}')
+        features.add(f'a:{artist.strip().casefold()}')
+    return sorted(features)
+
+
+def refresh_taste(profile):
+    """
+    Recompute and store a profile's taste vector.
+
+    For use after saving the profile in the same transaction: that save
+    logged the TasteChange, and workers read the taste when they apply it,
+    so the column is written with an UPDATE that logs nothing more.
+    """
+    profile.taste = taste_features(profile)
+    Profile.objects.filter(pk=profile.pk).update(taste=profile.taste)
+    return profile.taste
+
+
+def compatibility(features, other_features):
+    """Return the compatibility score of two taste vectors."""
+    return sum(feature_weight(feature) for feature in set(features) & set(other_features))
+
+
+class TasteIndex:
+    """
+    Per-feature bitmaps of the profiles, for ranking candidates by compatibility.
+
+    Attributes:
+        change_id: id of the last TasteChange applied to the index
+        ids: profile ids in ascending order; bit i of a bitmap is ids[i]
+        tastes: profile id -> the features its bit is set for
+        postings: feature key -> bitmap of the profiles with that feature
+        everyone: bitmap of the profiles that haven't been deleted
+    """
+
+    def __init__(self, rows, change_id=0):
+        """Build the index from (profile id, taste) rows in ascending id order."""
+        self.change_id = change_id
+        self.ids = []
+        self.tastes = {}
+        positions = {}
+        for position, (profile_id, features) in enumerate(rows):
+            self.ids.append(profile_id)
+            self.tastes[profile_id] = features = tuple(features or ())
+            for feature in features:
+                positions.setdefault(feature, []).append(position)
+        self.everyone = (1 << len(self.ids)) - 1
+        self.postings = {feature: self.bitmap(feature_positions) for feature, feature_positions in positions.items()}
+
+    @classmethod
+    def build(cls):
+        """Build the index from the Profile table."""
+        # Read first: changes logged while the profiles are read are applied again, which is harmless
+        change_id = TasteChange.objects.aggregate(last=Max('pk'))['last'] or 0
+        return cls(Profile.objects.order_by('id').values_list('id', 'taste').iterator(chunk_size=5000), change_id)
+
+    def sync(self):
+        """
+        Apply the TasteChanges logged since the last one applied.
+
+        Returns False, leaving the index as it was, if some of them have been
+        pruned from the log or a profile would have to be inserted before
+        the last indexed one, so that the index has to be rebuilt.
+        """
+        changes = list(TasteChange.objects.filter(pk__gt=self.change_id).order_by('pk').values_list('pk', 'profile_id'))
+        if not changes:
+            return True
+        if changes[0][0] != self.change_id + 1 and self.change_id:
+            # Entries were pruned (or rolled back) before this worker saw them
+            return False
+        changed = {profile_id for _, profile_id in changes}
+        rows = dict(Profile.objects.filter(pk__in=changed).values_list('id', 'taste'))
+        if any(profile_id not in self.tastes and self.ids and profile_id < self.ids[-1] for profile_id in rows):
+            return False
+        for profile_id in sorted(changed):
+            self.update(profile_id, rows.get(profile_id))
+        self.change_id = changes[-1][0]
+        return True
+
+    def update(self, profile_id, features):
+        """Move a profile's bit to the bitmaps of its new features; None removes it."""
+        if profile_id in self.tastes:
+            position = bisect_left(self.ids, profile_id)
+        elif features is None:
+            return
+        else:
+            position = len(self.ids)
+            self.ids.append(profile_id)
+            self.tastes[profile_id] = ()
+        bit = 1 << position
+        old = set(self.tastes[profile_id])
+        new = set(features or ())
+        for feature in old - new:
+            self.postings[feature] &= ~bit
+            if not self.postings[feature]:
+                del self.postings[feature]
+        for feature in new - old:
+            self.postings[feature] = self.postings.get(feature, 0) | bit
+        if features is None:
+            del self.tastes[profile_id]
+            self.everyone &= ~bit
+        else:
+            self.tastes[profile_id] = tuple(features)
+            self.everyone |= bit
+
+    def bitmap(self, positions):
+        """Return a bitmap with the given bit positions set."""
+        bits = bytearray((len(self.ids) + 7) // 8)
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, 'little')
+
+    def positions(self, profile_ids):
+        """Yield the bit positions of the indexed profiles among profile_ids."""
+        for profile_id in profile_ids:
+            position = bisect_left(self.ids, profile_id)
+            if position < len(self.ids) and self.ids[position] == profile_id:
+                yield position
+
+    def score_digits(self, features):
+        """
+        Return every profile's compatibility with `features` as binary digits.
+
+        Digit k is a bitmap of the profiles whose score has bit k set. Each
+        feature's bitmap is added once per set bit of its weight, carrying
+        into the higher digits like a ripple-carry adder.
+        """
+        digits = []
+        for feature in features:
+            bitmap = self.postings.get(feature)
+            if not bitmap:
+                continue
+            weight, shift = feature_weight(feature), 0
+            while weight:
+                if weight & 1:
+                    carry, digit = bitmap, shift
+                    while carry:
+                        if digit >= len(digits):
+                            digits.extend([0] * (digit + 1 - len(digits)))
+                        digits[digit], carry = digits[digit] ^ carry, digits[digit] & carry
+                        digit += 1
+                weight >>= 1
+                shift += 1
+        return digits
+
+    def take(self, bitmap, score, limit):
+        """Return up to `limit` (score, profile id) pairs for the lowest ids set in bitmap."""
+        ranked = []
+        while bitmap and len(ranked) < limit:
+            lowest = bitmap & -bitmap
+            ranked.append((score, self.ids[lowest.bit_length() - 1]))
+            bitmap ^= lowest
+        return ranked
+
+    def rank(self, features, exclude=(), after=None, limit=1):
+        """
+        Return the most compatible candidates for a taste vector, best first.
+
+        Candidates are ordered by score, highest first, then by profile id.
+        `exclude` are profile ids never to return and `after` an optional
+        (score, profile id) cursor from a previous call to continue from.
+        Returns up to `limit` (score, profile id) pairs.
+        """
+        digits = self.score_digits(features)
+        candidates = self.everyone & ~self.bitmap(self.positions(exclude))
+        ranked = []
+        if after is not None:
+            score, profile_id = after
+            if score >> len(digits):
+                # Nobody scores that high any more: every candidate comes after
+                below, equal = candidates, 0
+            else:
+                below, equal = 0, candidates
+                for digit in reversed(range(len(digits))):
+                    if score >> digit & 1:
+                        below |= equal & ~digits[digit]
+                        equal &= digits[digit]
+                    else:
+                        equal &= ~digits[digit]
+            # Ties with the cursor continue after its id
+            equal &= ~((1 << bisect_right(self.ids, profile_id)) - 1)
+            ranked = self.take(equal, score, limit)
+            candidates = below
+
+        while candidates and len(ranked) < limit:
+            # Narrow down to the candidates with the highest score, digit by digit
+            best, score = candidates, 0
+            for digit in reversed(range(len(digits))):
+                if narrowed := best & digits[digit]:
+                    best = narrowed
+                    score |= 1 << digit
+            ranked.extend(self.take(best, score, limit - len(ranked)))
+            candidates &= ~best
+        return ranked
+
+
+def log_taste_change(profile_id):
+    """Log a change to a profile for the workers' taste indexes, pruning old entries."""
+    change = TasteChange.objects.create(profile_id=profile_id)
+    if change.pk % 1000 == 0:
+        TasteChange.objects.filter(pk__lte=change.pk - CHANGE_LOG_SIZE).delete()
+
+
+def track_taste_changes():
+    """Log a TasteChange whenever a profile is saved or deleted."""
+    def changed(sender, instance, **kwargs):
+        log_taste_change(instance.pk)
+
+    # Weak references would drop the closure straight away
+    post_save.connect(changed, sender=Profile, weak=False, dispatch_uid='matching:profile:save')
+    post_delete.connect(changed, sender=Profile, weak=False, dispatch_uid='matching:profile:delete')
+
+
+def get_index():
+    """Return this worker's taste index, updated with the profiles changed since its last use."""
+    global _index
+    with _lock:
+        if _index is None or not _index.sync():
+            _index = TasteIndex.build()
+        return _index
+
+
+def ranked_candidates(profile, exclude=(), after=None, limit=1):
+    """Return up to `limit` (score, profile id) pairs of the profiles most compatible with `profile`."""
+    return get_index().rank(profile.taste, exclude={profile.pk, *exclude}, after=after, limit=limit)
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+def fill_tastes(apps, schema_editor):
+    # Same features as project.matching.taste_features
+    Profile = apps.get_model('project', 'Profile')
+    ProfileGenre = apps.get_model('project', 'ProfileGenre')
+    ProfileSong = apps.get_model('project', 'ProfileSong')
+    tastes = {}
+    for profile_id, genre_id in ProfileGenre.objects.values_list('profile_id', 'genre_id'):
+        tastes.setdefault(profile_id, set()).add(f'g{genre_id}')
+    for profile_id, song_id, artist in ProfileSong.objects.values_list('profile_id', 'song_id', 'song__artist'):
+        tastes.setdefault(profile_id, set()).update([f's{song_id}', f'a:{artist.strip().casefold()}'])
+    profiles = list(Profile.objects.filter(pk__in=tastes))
+    for profile in profiles:
+        profile.taste = sorted(tastes[profile.pk])
+    Profile.objects.bulk_update(profiles, ['taste'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0007_delete_comment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='taste',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(fill_tastes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0008_profile_taste'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shownprofile',
+            index=models.Index(fields=['timestamp'], name='shownprofile_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0009_shownprofile_timestamp_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['sender', 'status'], name='match_sender_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['receiver', 'status'], name='match_receiver_status_idx'),
+        ),
+    ]
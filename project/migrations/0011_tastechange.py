@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0010_match_status_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TasteChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile_id', models.BigIntegerField()),
+            ],
+        ),
+    ]
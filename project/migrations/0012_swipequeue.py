@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0011_tastechange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwipeQueue',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='swipe_queue', serialize=False, to='project.profile')),
+                ('entries', models.JSONField(default=list)),
+                ('shown', models.JSONField(null=True)),
+                ('impressions', models.JSONField(default=list)),
+                ('refilled_at', models.DateTimeField(null=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
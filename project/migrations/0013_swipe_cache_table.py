@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # The "swipe" cache in settings.CACHES (see cs412/caches.py)
+    call_command('createcachetable', 'cache_swipe', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0012_swipequeue'),
+    ]
+
+    operations = [
+        # Left in place on rollback: it only holds rebuildable cache entries
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:21
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0013_swipe_cache_table'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='swipequeue',
+            name='impressions',
+        ),
+    ]
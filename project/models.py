@@ -11,6 +11,8 @@ Models:
     - ProfileSong: Links between profiles and their favorite songs
     - Match: Represents potential connections between users
     - ShownProfile: Tracks which profiles have been shown to users
+    - TasteChange: Log of profile changes for keeping the taste index up to date
+    - SwipeQueue: Each user's precomputed queue of swipe candidates
 """
 
 from django.db import models
@@ -47,6 +49,8 @@ class Profile(models.Model):
         birth_date (DateField): User's date of birth
         bio (TextField): Optional biographical information
         created_at (DateTimeField): Timestamp of profile creation
+        taste (JSONField): Sorted taste vector feature keys of the profile's genres,
+            favorite songs and their artists, kept up to date by matching.refresh_taste
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True)
     username = models.CharField(max_length=150, unique=True)
@@ -54,6 +58,7 @@ class Profile(models.Model):
     birth_date = models.DateField()
     bio = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    taste = models.JSONField(default=list, blank=True, editable=False)
 
     def __str__(self):
         """Returns the username as the string representation."""
@@ -161,7 +166,9 @@ class Match(models.Model):
         status (CharField): Current state of the match (pending/accepted/rejected)
     
     Meta:
-        unique_together ensures only one match can exist between any two profiles
+        unique_together ensures only one match can exist between any two profiles,
+        and the (sender, status) and (receiver, status) indexes serve the lookups
+        of a profile's matches
     """
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -176,6 +183,12 @@ class Match(models.Model):
 
     class Meta:
         unique_together = ('sender', 'receiver')
+        indexes = [
+            # Each side of a profile's matches is looked up by status, in
+            # its own branch of a UNION
+            models.Index(fields=['sender', 'status'], name='match_sender_status_idx'),
+            models.Index(fields=['receiver', 'status'], name='match_receiver_status_idx'),
+        ]
 
     def __str__(self):
         """Returns a string describing the match and its status."""
@@ -183,18 +196,19 @@ class Match(models.Model):
 
 class ShownProfile(models.Model):
     """
-    Tracks which profiles have been shown to other profiles.
+    Tracks which profiles have been passed on by other profiles.
     
-    This model maintains a history of profile views to prevent showing the same
-    profiles repeatedly and to track user interactions.
+    This model maintains a history of passes to prevent showing the same
+    profiles repeatedly until the passes expire (see seen.py).
     
     Attributes:
-        profile (ForeignKey): The profile viewing other profiles
-        shown_profile (ForeignKey): The profile that was viewed
-        timestamp (DateTimeField): When the profile was shown
+        profile (ForeignKey): The profile that passed on other profiles
+        shown_profile (ForeignKey): The profile that was passed on
+        timestamp (DateTimeField): When the profile was passed on
     
     Meta:
-        unique_together ensures each profile viewing is recorded only once
+        unique_together ensures each profile viewing is recorded only once, and
+        its index serves the lookups of a profile's seen set (see seen.py)
     """
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='shown_profiles_records')
     shown_profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='shown_to_profiles')
@@ -202,11 +216,61 @@ class ShownProfile(models.Model):
 
     class Meta:
         unique_together = ('profile', 'shown_profile')
+        indexes = [
+            # compact_shown_profiles deletes passes by age
+            models.Index(fields=['timestamp'], name='shownprofile_timestamp_idx'),
+        ]
 
     def __str__(self):
         """Returns a string describing which profile was shown to whom."""
         return f"{self.profile.username} has seen {self.shown_profile.username}"
 
+class TasteChange(models.Model):
+    """
+    Log of profile saves and deletions, for keeping the taste index up to date.
+    
+    Every web worker holds its own taste index (see matching.py). Instead of
+    rebuilding it after any profile changes, a worker reads the entries
+    logged since the last one it applied and updates just those profiles.
+    Only the latest entries are kept.
+    
+    Attributes:
+        profile_id (BigIntegerField): The profile that was saved or deleted; not
+            a foreign key, so entries for deleted profiles remain
+    """
+    profile_id = models.BigIntegerField()
+
+    def __str__(self):
+        """Returns a string describing the logged change."""
+        return f"Change {self.pk} to profile {self.profile_id}"
+
+class SwipeQueue(models.Model):
+    """
+    A user's precomputed queue of swipe candidates (see swipe_queue.py).
+    
+    One row per user holds everything a swipe reads and writes, so a swipe
+    is a primary key lookup and one UPDATE. Every write bumps the version
+    and only applies if the version is still the one that was read, so two
+    concurrent requests can never pop the same candidate.
+    
+    Attributes:
+        profile (OneToOneField): The user the queue belongs to, also the primary key
+        entries (JSONField): The queued [score, profile id] pairs, best first
+        shown (JSONField): The [score, profile id] of the last candidate popped,
+            the user's place in the ranking; kept when the queue is emptied
+        refilled_at (DateTimeField): When candidates were last ranked into the queue
+        version (PositiveIntegerField): Incremented by every write
+    """
+    profile = models.OneToOneField(Profile, on_delete=models.CASCADE, primary_key=True, related_name='swipe_queue')
+    entries = models.JSONField(default=list)
+    shown = models.JSONField(null=True)
+    refilled_at = models.DateTimeField(null=True)
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        """Returns a string describing the queue."""
+        return f"Swipe queue of {self.profile} ({len(self.entries)} candidates)"
+
 def load_data():
     """
     Utility function to populate the database with initial song data.
@@ -0,0 +1,100 @@
+"""
+Seen-profile tracking for the swipe queue.
+
+Every profile a user passes on, on the swipe page or in a batch of swipe
+decisions, is recorded in ShownProfile so that it is not queued again until
+the pass expires. Liked profiles are left out through their matches instead,
+and profiles popped from the queue without a decision are not recorded at
+all: they come round again once the ranking does (see swipe_queue.py).
+
+A user's seen set is read from the (profile, shown_profile) unique index,
+and the taste ranking (see matching.py) leaves it out of the candidates.
+Heavy users, with at least HEAVY_USER passes, get the set cached as a
+bitmap by profile id, one bit per profile, which new passes are OR-ed
+into, so their refills skip the query. compact_shown_profiles deletes the
+passes older than SEEN_TTL_DAYS and bumps the ShownProfile table
+version (see cs412.pagination), which the bitmaps' cache keys include.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from cs412.caches import swipe_cache
+from cs412.pagination import bump_table_version, table_version
+
+from .models import Profile, ShownProfile
+
+# Passes after which a user's seen set is cached as a bitmap
+HEAVY_USER = 1000
+# Days before a seen profile can be shown again
+SEEN_TTL_DAYS = 90
+# Seconds a seen bitmap is kept
+SEEN_TIMEOUT = 24 * 60 * 60
+
+# The set bits of every byte value, for decoding bitmaps
+BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def seen_key(profile_id):
+    return f'swipe:seen:{table_version(ShownProfile)}:{profile_id}'
+
+
+def encode(profile_ids, bitmap=b''):
+    """Return a bitmap with the bits of profile_ids set, on top of an existing one."""
+    bits = bytearray(bitmap)
+    for profile_id in profile_ids:
+        if profile_id >> 3 >= len(bits):
+            bits.extend(bytes((profile_id >> 3) + 1 - len(bits)))
+        bits[profile_id >> 3] |= 1 << (profile_id & 7)
+    return bytes(bits)
+
+
+def decode(bitmap):
+    """Return the set of profile ids in a bitmap."""
+    return {position << 3 | bit for position, byte in enumerate(bitmap) if byte for bit in BYTE_BITS[byte]}
+
+
+def seen_profile_ids(profile):
+    """Return the ids of the profiles a user has been shown."""
+    key = seen_key(profile.pk)
+    bitmap = swipe_cache().get(key)
+    if bitmap is not None:
+        return decode(bitmap)
+    profile_ids = set(ShownProfile.objects.filter(profile=profile).values_list('shown_profile_id', flat=True))
+    if len(profile_ids) >= HEAVY_USER:
+        swipe_cache().set(key, encode(profile_ids), SEEN_TIMEOUT)
+    return profile_ids
+
+
+def record_passes(profile, profile_ids):
+    """Record that a user passed on profile_ids, in one bulk insert; returns the ids of those that exist."""
+    # Profiles deleted since they were shown would fail the foreign key
+    profile_ids = list(
+        Profile.objects.filter(pk__in=profile_ids).exclude(pk=profile.pk).values_list('pk', flat=True)
+    )
+    ShownProfile.objects.bulk_create(
+        [ShownProfile(profile=profile, shown_profile_id=profile_id) for profile_id in profile_ids],
+        ignore_conflicts=True,
+    )
+    key = seen_key(profile.pk)
+    bitmap = swipe_cache().get(key)
+    if bitmap is not None:
+        swipe_cache().set(key, encode(profile_ids, bitmap), SEEN_TIMEOUT)
+    return profile_ids
+
+
+def compact(days=SEEN_TTL_DAYS, chunk_size=5000):
+    """Delete the passes older than `days`, chunk_size at a time; returns how many were deleted."""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        # Short transactions, so swipes are never kept waiting on the write lock for long
+        chunk = list(ShownProfile.objects.filter(timestamp__lt=cutoff).values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            break
+        ShownProfile.objects.filter(pk__in=chunk).delete()
+        deleted += len(chunk)
+    if deleted:
+        # Drop every cached seen bitmap
+        bump_table_version(ShownProfile)
+    return deleted
@@ -0,0 +1,159 @@
+"""
+Precomputed per-user swipe queues.
+
+Instead of working out the next candidate on every swipe, each user gets a
+queue of the next BATCH_SIZE candidates from the taste compatibility ranking
+(see matching.py), minus the profiles they have already matched with or
+passed on (see seen.py). The queue is a SwipeQueue row, so a swipe pops the
+next profile ids with a primary key lookup and one UPDATE, and only once it
+runs low (or has not been refilled for QUEUE_TIMEOUT) is it topped up with
+the candidates ranked after its last entry. When the ranking runs out, it
+starts over from the most compatible candidate left, such as new profiles,
+those popped without a decision and those whose passes have expired.
+
+Every write is a compare-and-swap on the row's version, retried when
+another request got there first, so concurrent swipes of one user never
+pop the same candidate.
+
+The last profile shown is kept apart from the queue, so emptying a queue
+never loses the user's place: the next swipe ranks again from there. A
+user's queue is emptied when their own profile (and so their taste)
+changes. A new or accepted match only takes the one profile it made
+ineligible out of the other user's queue. Other users' new profiles and
+taste changes reach a queue at its next refill, and profiles deleted after
+being queued are skipped when popped.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from . import matching, seen
+from .models import Match, Profile, SwipeQueue
+
+# Candidates ranked per refill
+BATCH_SIZE = 200
+# Refill once fewer candidates than this are left
+LOW_WATER = 20
+# Seconds after which a queue is refilled however full it is
+QUEUE_TIMEOUT = 24 * 60 * 60
+# Times a write is retried after losing a race with another request
+MAX_ATTEMPTS = 5
+
+
+def invalidate(*profile_ids):
+    """Empty the queues of the given profiles, keeping their place in the ranking."""
+    SwipeQueue.objects.filter(profile_id__in=profile_ids).update(entries=[], version=F('version') + 1)
+
+
+def discard(pairs):
+    """
+    Take candidates out of users' queues.
+
+    `pairs` are (user profile id, candidate profile id). Only the queues
+    holding one of the candidates are written.
+    """
+    candidates = {}
+    for profile_id, candidate_id in pairs:
+        candidates.setdefault(profile_id, set()).add(candidate_id)
+    queues = SwipeQueue.objects.filter(profile_id__in=candidates).values_list('profile_id', 'entries', 'version')
+    for profile_id, entries, version in queues:
+        kept = [entry for entry in entries if entry[1] not in candidates[profile_id]]
+        if len(kept) < len(entries):
+            written = SwipeQueue.objects.filter(profile_id=profile_id, version=version).update(
+                entries=kept, version=version + 1,
+            )
+            if not written:
+                # A swipe changed the queue meanwhile: empty it rather than retry
+                invalidate(profile_id)
+
+
+def track_eligibility_changes():
+    """Keep users' queues in step with their matches and their own profile."""
+    def match_changed(sender, instance, **kwargs):
+        # Mirrors matched_profile_ids: a like hides the receiver from the sender,
+        # an accepted match hides each profile from the other
+        pairs = [(instance.sender_id, instance.receiver_id)]
+        if instance.status == 'accepted':
+            pairs.append((instance.receiver_id, instance.sender_id))
+        discard(pairs)
+
+    def profile_changed(sender, instance, **kwargs):
+        invalidate(instance.pk)
+
+    # Weak references would drop the closures straight away
+    post_save.connect(match_changed, sender=Match, weak=False, dispatch_uid='swipe_queue:match:save')
+    post_save.connect(profile_changed, sender=Profile, weak=False, dispatch_uid='swipe_queue:profile:save')
+
+
+def matched_profile_ids(profile):
+    """Return the ids of the profiles a user is matched with, or has liked and is waiting on."""
+    # One branch per side, each answered from its (side, status) index
+    liked = Match.objects.filter(sender=profile, status__in=['accepted', 'pending']).values_list('receiver', flat=True)
+    liked_back = Match.objects.filter(receiver=profile, status='accepted').values_list('sender', flat=True)
+    return set(liked.union(liked_back, all=True))
+
+
+def refill(profile, queue, shown):
+    """Top a queue up to BATCH_SIZE with the unseen candidates ranked after its last entry."""
+    exclude = matched_profile_ids(profile) | seen.seen_profile_ids(profile) | {profile_id for _, profile_id in queue}
+    after = queue[-1] if queue else shown
+    queue = queue + matching.ranked_candidates(profile, exclude=exclude, after=after, limit=BATCH_SIZE - len(queue))
+    if not queue and after:
+        # The end of the ranking: start over from the most compatible unseen candidate
+        queue = matching.ranked_candidates(profile, exclude=exclude, limit=BATCH_SIZE)
+    return queue
+
+
+def save_queue(profile, version, **fields):
+    """Write a user's queue if it is still at `version` (None: not created yet); returns whether it was."""
+    if version is None:
+        try:
+            with transaction.atomic():
+                SwipeQueue.objects.create(profile=profile, version=1, **fields)
+        except IntegrityError:
+            return False
+        return True
+    return bool(SwipeQueue.objects.filter(profile=profile, version=version).update(version=version + 1, **fields))
+
+
+def next_candidates(profile, count=1, queryset=None):
+    """
+    Pop up to `count` candidates from a user's swipe queue.
+
+    Returns (profile to show, compatibility score) pairs, best first, with
+    the profiles fetched from `queryset` (all profiles by default) in one
+    query; fewer when there is nobody left to show, and none if the queue
+    kept changing under this request for MAX_ATTEMPTS tries.
+    """
+    queryset = Profile.objects.all() if queryset is None else queryset
+    for _ in range(MAX_ATTEMPTS):
+        state = SwipeQueue.objects.filter(profile=profile).values(
+            'entries', 'shown', 'refilled_at', 'version',
+        ).first() or {'entries': [], 'shown': None, 'refilled_at': None, 'version': None}
+        queue = [tuple(entry) for entry in state['entries']]
+        shown = tuple(state['shown']) if state['shown'] else None
+        refilled_at = state['refilled_at']
+        stale = refilled_at is None or refilled_at < timezone.now() - timedelta(seconds=QUEUE_TIMEOUT)
+        if stale or len(queue) < max(LOW_WATER, count):
+            queue, refilled_at = refill(profile, queue, shown), timezone.now()
+
+        candidates = []
+        while queue and len(candidates) < count:
+            popped, queue = queue[:count - len(candidates)], queue[count - len(candidates):]
+            found = queryset.in_bulk([profile_id for _, profile_id in popped])
+            # Profiles deleted since they were queued are skipped
+            candidates.extend((found[profile_id], score) for score, profile_id in popped if profile_id in found)
+            shown = popped[-1]
+
+        if save_queue(profile, state['version'], entries=queue, shown=shown, refilled_at=refilled_at):
+            return candidates
+    return []
+
+
+def next_candidate(profile, queryset=None):
+    """Pop the next candidate from a user's swipe queue, as (profile, score), or None if there is none."""
+    candidates = next_candidates(profile, queryset=queryset)
+    return candidates[0] if candidates else None
@@ -0,0 +1,63 @@
+"""
+Synthetic profiles for the matching benchmarks.
+
+Profiles get one or two preferred genres and up to four favorite songs from
+a synthetic catalog, with a few very popular songs and genres so that, as on
+the real site, most candidates share something with most users. Only use
+this against a scratch database.
+"""
+import random
+from datetime import date
+
+from django.db import transaction
+
+from .models import Genre, Profile, ProfileGenre, ProfileSong, Song
+
+GENRES = 16
+SONGS = 400
+ARTISTS = 120
+
+
+def populate(count, seed=0, batch_size=5000):
+    """Replace the profiles and the song catalog with `count` synthetic profiles and their taste vectors."""
+    rng = random.Random(seed)
+    with transaction.atomic():
+        Profile.objects.all().delete()
+        Song.objects.all().delete()
+        Genre.objects.all().delete()
+        genres = Genre.objects.bulk_create(Genre(name=f'Genre {i}') for i in range(GENRES))
+        songs = Song.objects.bulk_create(
+            Song(
+                title=f'Song {i}', artist=f'Artist {rng.randrange(ARTISTS)}', genre=rng.choice(genres),
+                release_year=rng.randint(1960, 2024), youtube_url=f'https://www.youtube.com/watch?v={i}',
+            )
+            for i in range(SONGS)
+        )
+        # Popularity falls off with rank, so early genres and songs are much more common
+        genre_weights = [1 / (rank + 1) for rank in range(GENRES)]
+        song_weights = [1 / (rank + 1) for rank in range(SONGS)]
+
+        for start in range(0, count, batch_size):
+            profiles, picks = [], []
+            for i in range(start, min(start + batch_size, count)):
+                profile_genres = set(rng.choices(genres, weights=genre_weights, k=rng.randint(1, 2)))
+                profile_songs = set(rng.choices(songs, weights=song_weights, k=rng.randint(0, 4)))
+                # The same features as matching.taste_features, without a query per profile
+                taste = {f'g{genre.pk}' for genre in profile_genres}
+                taste.update(f's{song.pk}' for song in profile_songs)
+                taste.update(f'a:{song.artist.strip().casefold()}' for song in profile_songs)
+                profiles.append(Profile(
+                    username=f'listener{i}', email=f'listener{i}@example.com',
+                    birth_date=date(rng.randint(1960, 2005), rng.randint(1, 12), rng.randint(1, 28)),
+                    taste=sorted(taste),
+                ))
+                picks.append((profile_genres, profile_songs))
+            Profile.objects.bulk_create(profiles)
+            ProfileGenre.objects.bulk_create(
+                ProfileGenre(profile=profile, genre=genre)
+                for profile, (profile_genres, _) in zip(profiles, picks) for genre in profile_genres
+            )
+            ProfileSong.objects.bulk_create(
+                ProfileSong(profile=profile, song=song)
+                for profile, (_, profile_songs) in zip(profiles, picks) for song in profile_songs
+            )
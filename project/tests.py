@@ -1,3 +1,611 @@
-from django.test import TestCase
+import json
+import random
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from cs412.pagination import bump_table_version, table_version
+
+from . import matching, seen, swipe_queue
+from .forms import SwipeDecisionsForm, SwipeDeckForm
+from .matching import TasteIndex, compatibility
+from .models import Genre, Match, Profile, ProfileGenre, ProfileSong, ShownProfile, Song, SwipeQueue, TasteChange
+
+
+def queued(profile):
+    """Return a user's queued (score, profile id) entries, or None if they have no queue yet."""
+    return SwipeQueue.objects.filter(profile=profile).values_list('entries', flat=True).first()
+
+
+def make_profile(username, taste=(), password=None):
+    """Create a Profile, with a login of the same name if a password is given."""
+    user = User.objects.create_user(username, password=password) if password else None
+    return Profile.objects.create(
+        user=user, username=username, email=f'{username}@example.com',
+        birth_date=date(1990, 1, 1), taste=sorted(taste),
+    )
+
+
+class TasteIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        # Few features, so that many profiles tie on score
+        rng = random.Random(0)
+        features = ['g1', 'g2', 'g3', 's1', 's2', 'a:one', 'a:two']
+        self.tastes = {
+            profile_id: sorted(rng.sample(features, rng.randint(0, 4)))
+            for profile_id in sorted(rng.sample(range(1, 1000), 120))
+        }
+        self.index = TasteIndex(sorted(self.tastes.items()))
+        self.user = ['a:one', 'g1', 'g2', 's1']
+
+    def brute_force(self, exclude=()):
+        """Rank every profile by scoring it in Python."""
+        return [
+            (score, profile_id) for score, profile_id in sorted(
+                ((compatibility(self.user, taste), profile_id) for profile_id, taste in self.tastes.items()
+                 if profile_id not in exclude),
+                key=lambda pair: (-pair[0], pair[1]),
+            )
+        ]
+
+    def test_score_digits_add_up_the_weights(self):
+        digits = self.index.score_digits(self.user)
+        for position, profile_id in enumerate(self.index.ids):
+            score = sum(1 << digit for digit, bitmap in enumerate(digits) if bitmap >> position & 1)
+            self.assertEqual(score, compatibility(self.user, self.tastes[profile_id]))
+
+    def test_rank_matches_brute_force(self):
+        exclude = set(list(self.tastes)[::7])
+        self.assertEqual(self.index.rank(self.user, exclude=exclude, limit=1000), self.brute_force(exclude))
+        self.assertEqual(self.index.rank(self.user, limit=5), self.brute_force()[:5])
+
+    def test_after_cursor_pages_through_the_ranking(self):
+        exclude = set(list(self.tastes)[::5])
+        expected = self.brute_force(exclude)
+        ranked, after = [], None
+        while page := self.index.rank(self.user, exclude=exclude, after=after, limit=7):
+            ranked.extend(page)
+            after = page[-1]
+        self.assertEqual(ranked, expected)
+
+        # A cursor inside a run of ties continues after its id
+        score = expected[10][0]
+        ties = [pair for pair in expected if pair[0] == score]
+        self.assertGreater(len(ties), 2)
+        self.assertEqual(self.index.rank(self.user, exclude=exclude, after=ties[0], limit=2), ties[1:3])
+        # A cursor for a profile that isn't indexed continues from its place
+        self.assertEqual(
+            self.index.rank(self.user, exclude=exclude, after=(score, ties[0][1] + 0.5), limit=1000),
+            [pair for pair in expected if pair > (score, ties[0][1]) and pair[0] == score
+             or pair[0] < score],
+        )
+
+    def test_after_cursor_at_the_ends(self):
+        expected = self.brute_force()
+        # Nobody scores that high, so every candidate comes after
+        self.assertEqual(self.index.rank(self.user, after=(10_000, 0), limit=1000), expected)
+        # Nothing comes after the last candidate, and the caller starts over
+        self.assertEqual(self.index.rank(self.user, after=expected[-1], limit=1000), [])
+
+    def test_update_moves_a_profile_between_features(self):
+        changed, deleted, added = self.index.ids[3], self.index.ids[5], self.index.ids[-1] + 10
+        self.index.update(changed, ['g1', 'g2', 's1'])
+        self.index.update(deleted, None)
+        self.index.update(added, ['a:one'])
+        self.tastes[changed] = ['g1', 'g2', 's1']
+        self.tastes[added] = ['a:one']
+        del self.tastes[deleted]
+        self.assertEqual(self.index.rank(self.user, limit=1000), self.brute_force())
+        # A deleted profile keeps its place in the bit order, with no bits set
+        position = self.index.ids.index(deleted)
+        self.assertFalse(any(bitmap >> position & 1 for bitmap in self.index.postings.values()))
+        self.assertFalse(self.index.everyone >> position & 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TasteIndexSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profiles = [make_profile(f'listener{i}', ['g1'] if i % 2 else ['g2']) for i in range(6)]
+
+    def setUp(self):
+        cache.clear()
+        matching._index = None
+
+    def test_changes_are_applied_in_place(self):
+        index = matching.get_index()
+        user = Profile(pk=0, taste=['g1', 's1'])
+        first, second = self.profiles[0], self.profiles[2]
+        first.taste = ['g1', 's1']
+        first.save()
+        second.delete()
+        newcomer = make_profile('newcomer', ['s1'])
+
+        self.assertIs(matching.get_index(), index)
+        ranked = matching.ranked_candidates(user, limit=10)
+        self.assertEqual(ranked[:2], [(8, first.pk), (6, newcomer.pk)])
+        self.assertNotIn(second.pk, [profile_id for _, profile_id in ranked])
+        self.assertEqual(index.change_id, TasteChange.objects.latest('pk').pk)
+
+    def test_rebuilds_after_falling_behind_the_log(self):
+        index = matching.get_index()
+        self.profiles[0].save()
+        self.profiles[1].save()
+        # Pruned before this worker saw it
+        TasteChange.objects.filter(pk__gt=index.change_id).order_by('pk').first().delete()
+        self.assertIsNot(matching.get_index(), index)
+
+    def test_profile_views_refresh_the_taste(self):
+        genre = Genre.objects.create(name='Rock')
+        other = Genre.objects.create(name='Jazz')
+        song = Song.objects.create(
+            title='Song', artist=' The Band ', genre=genre, release_year=2000,
+            youtube_url='https://www.youtube.com/watch?v=1',
+        )
+        self.client.post(reverse('project:add_profile'), {
+            'username': 'newcomer', 'password1': 'a-long-passphrase', 'password2': 'a-long-passphrase',
+            'email': 'newcomer@example.com', 'birth_date': '1990-01-01', 'bio': '',
+            'genres-TOTAL_FORMS': '2', 'genres-INITIAL_FORMS': '0', 'genres-0-genre': genre.pk,
+            'songs-TOTAL_FORMS': '4', 'songs-INITIAL_FORMS': '0', 'songs-0-song': song.pk,
+        })
+        profile = Profile.objects.get(username='newcomer')
+        self.assertEqual(profile.taste, ['a:the band', f'g{genre.pk}', f's{song.pk}'])
+        # One logged change per edit, applied with the new taste
+        self.assertEqual(TasteChange.objects.filter(profile_id=profile.pk).count(), 1)
+        index = matching.get_index()
+
+        profile_genre = ProfileGenre.objects.get(profile=profile)
+        profile_song = ProfileSong.objects.get(profile=profile)
+        self.client.post(reverse('project:update_profile', args=[profile.pk]), {
+            'username': 'newcomer', 'email': 'newcomer@example.com', 'birth_date': '1990-01-01', 'bio': '',
+            'genres-TOTAL_FORMS': '2', 'genres-INITIAL_FORMS': '1',
+            'genres-0-id': profile_genre.pk, 'genres-0-genre': genre.pk, 'genres-1-genre': other.pk,
+            'songs-TOTAL_FORMS': '1', 'songs-INITIAL_FORMS': '1',
+            'songs-0-id': profile_song.pk, 'songs-0-song': song.pk,
+        })
+        profile.refresh_from_db()
+        self.assertEqual(profile.taste, ['a:the band', f'g{genre.pk}', f'g{other.pk}', f's{song.pk}'])
+        self.assertEqual(TasteChange.objects.filter(profile_id=profile.pk).count(), 2)
+        self.assertIs(matching.get_index(), index)
+        self.assertEqual(set(index.tastes[profile.pk]), set(profile.taste))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+@mock.patch.object(swipe_queue, 'BATCH_SIZE', 10)
+@mock.patch.object(swipe_queue, 'LOW_WATER', 3)
+class SwipeQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tastes = [['g1', 'g2', 's1'], ['g1', 's1'], ['g2'], ['s1', 's2'], []]
+        cls.me = make_profile('me', ['g1', 'g2', 's1'])
+        cls.others = [make_profile(f'listener{i}', tastes[i % len(tastes)]) for i in range(30)]
+
+    def setUp(self):
+        cache.clear()
+        matching._index = None
+        self.ranking = matching.ranked_candidates(self.me, limit=1000)
+
+    def pop(self, count=1):
+        """Pop candidates from the user's queue, as (score, profile id) pairs."""
+        return [(score, profile.pk) for profile, score in swipe_queue.next_candidates(self.me, count)]
+
+    def pop_all(self, count=None):
+        """Pop `count` candidates (a pass through the ranking by default), a batch at a time."""
+        count = len(self.ranking) if count is None else count
+        popped = []
+        while len(popped) < count and (page := self.pop(min(swipe_queue.BATCH_SIZE, count - len(popped)))):
+            popped += page
+        return popped
+
+    def queued(self, profile=None):
+        return queued(profile or self.me)
+
+    def test_pops_the_ranking_in_order(self):
+        popped = []
+        with mock.patch.object(swipe_queue, 'refill', wraps=swipe_queue.refill) as refill:
+            for _ in self.ranking:
+                before = len(self.queued() or [])
+                popped += self.pop()
+                # Topped up only once it runs low
+                self.assertEqual(refill.called, before < swipe_queue.LOW_WATER)
+                self.assertLessEqual(len(self.queued()), swipe_queue.BATCH_SIZE)
+                refill.reset_mock()
+        self.assertEqual(popped, self.ranking)
+        # Nothing was passed on, so the ranking comes round again
+        self.assertEqual(self.pop(), self.ranking[:1])
+
+    def test_pops_several_at_once(self):
+        self.assertEqual(self.pop(4), self.ranking[:4])
+        # More than are left in the queue, which is topped up first
+        self.assertEqual(self.pop(10), self.ranking[4:14])
+
+    def test_dropped_queue_keeps_its_place(self):
+        popped = self.pop(5)
+        swipe_queue.invalidate(self.me.pk)
+        self.assertEqual(self.queued(), [])
+        popped += self.pop_all(len(self.ranking) - 5)
+        self.assertEqual(popped, self.ranking)
+
+    def test_starts_over_when_the_ranking_runs_out(self):
+        self.assertEqual(self.pop_all(), self.ranking)
+        # Passed profiles are left out of the next pass, which takes in new profiles
+        passed = self.ranking[::2]
+        seen.record_passes(self.me, [profile_id for _, profile_id in passed])
+        newcomer = make_profile('newcomer', ['g1', 's1'])
+        score = compatibility(self.me.taste, newcomer.taste)
+        ranking = sorted(
+            [pair for pair in self.ranking if pair not in passed] + [(score, newcomer.pk)],
+            key=lambda pair: (-pair[0], pair[1]),
+        )
+        self.assertEqual(self.pop_all(len(ranking)), ranking)
+        # Until the passes expire
+        ShownProfile.objects.all().delete()
+        bump_table_version(ShownProfile)
+        self.assertEqual(self.pop_all(len(ranking) + len(passed)), sorted(
+            self.ranking + [(score, newcomer.pk)], key=lambda pair: (-pair[0], pair[1]),
+        ))
+
+    def test_skips_deleted_profiles(self):
+        self.pop()
+        Profile.objects.filter(pk__in=[profile_id for _, profile_id in self.queued()[:2]]).delete()
+        self.assertEqual(self.pop(2), self.ranking[3:5])
+
+    def test_matches_take_the_liked_profile_out_of_the_queue(self):
+        self.pop()
+        liked = self.ranking[5][1]
+        before = self.queued()
+        match = Match.objects.create(sender=self.me, receiver_id=liked)
+        self.assertEqual(self.queued(), [entry for entry in before if entry[1] != liked])
+        # The receiver's queue keeps the sender until they like them back
+        other = Profile.objects.get(pk=liked)
+        entries = [[3, self.me.pk], [2, self.others[0].pk]]
+        SwipeQueue.objects.create(profile=other, entries=entries, refilled_at=timezone.now())
+        match.save()
+        self.assertEqual(self.queued(other), entries)
+        match.status = 'accepted'
+        match.save()
+        self.assertEqual(self.queued(other), entries[1:])
+        # Liked profiles aren't queued again
+        self.assertNotIn(liked, [profile_id for _, profile_id in self.pop_all()])
+
+    def test_profile_changes_empty_only_their_own_queue(self):
+        self.pop()
+        self.others[0].save()
+        self.assertNotEqual(self.queued(), [])
+        self.me.save()
+        self.assertEqual(self.queued(), [])
+
+    def test_concurrent_pops_get_different_candidates(self):
+        self.pop()
+        save_queue, raced = swipe_queue.save_queue, []
+
+        def pop_in_between(*args, **kwargs):
+            # Another request pops between this one's read and its write, once
+            if not raced:
+                raced.append(None)
+                raced.extend(self.pop())
+            return save_queue(*args, **kwargs)
+
+        with mock.patch.object(swipe_queue, 'save_queue', side_effect=pop_in_between):
+            popped = self.pop()
+        self.assertEqual(raced[1:], self.ranking[1:2])
+        self.assertEqual(popped, self.ranking[2:3])
+        self.assertEqual(self.pop(), self.ranking[3:4])
+
+    def test_gives_up_after_losing_every_race(self):
+        with mock.patch.object(swipe_queue, 'save_queue', return_value=False) as save_queue:
+            self.assertEqual(self.pop(), [])
+        self.assertEqual(save_queue.call_count, swipe_queue.MAX_ATTEMPTS)
+
+    def test_stale_version_is_not_written(self):
+        self.pop()
+        version = SwipeQueue.objects.get(profile=self.me).version
+        self.assertTrue(swipe_queue.save_queue(self.me, version, entries=[]))
+        self.assertFalse(swipe_queue.save_queue(self.me, version, entries=[[1, self.others[0].pk]]))
+        self.assertFalse(swipe_queue.save_queue(self.me, None, entries=[[1, self.others[0].pk]]))
+        self.assertEqual(self.queued(), [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SwipeApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        genre = Genre.objects.create(name='Rock')
+        cls.song = Song.objects.create(
+            title='Song', artist='Artist', genre=genre, release_year=2000,
+            youtube_url='https://www.youtube.com/watch?v=1',
+        )
+        cls.me = make_profile('me', [f'g{genre.pk}'], password='pw')
+        cls.others = [make_profile(f'listener{i}', [f'g{genre.pk}'] if i < 3 else []) for i in range(6)]
+        ProfileGenre.objects.bulk_create(ProfileGenre(profile=profile, genre=genre) for profile in cls.others)
+        ProfileSong.objects.bulk_create(ProfileSong(profile=profile, song=cls.song) for profile in cls.others)
+
+    def setUp(self):
+        cache.clear()
+        matching._index = None
+        self.client.login(username='me', password='pw')
+
+    def decide(self, likes=(), passes=(), **kwargs):
+        """Post decisions as a JSON body, running the on-commit callbacks."""
+        body = json.dumps({'likes': [getattr(like, 'pk', like) for like in likes],
+                           'passes': [getattr(passed, 'pk', passed) for passed in passes]})
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('project:swipe_decisions'), body, content_type='application/json', **kwargs)
+
+    def test_deck(self):
+        response = self.client.get(reverse('project:swipe_deck'), {'count': 2})
+        cards = response.json()['cards']
+        self.assertEqual([card['id'] for card in cards], [profile.pk for profile in self.others[:2]])
+        self.assertEqual(cards[0], {
+            'id': self.others[0].pk, 'username': 'listener0', 'bio': None, 'compatibility': 2, 'genres': ['Rock'],
+            'songs': [{'id': self.song.pk, 'title': 'Song', 'artist': 'Artist', 'youtube_url': self.song.youtube_url}],
+        })
+        # The rest of the deck, without the cards already served
+        cards = self.client.get(reverse('project:swipe_deck')).json()['cards']
+        self.assertEqual([card['id'] for card in cards], [profile.pk for profile in self.others[2:]])
+
+    def test_deck_count_is_validated(self):
+        for count in [0, SwipeDeckForm.MAX_CARDS + 1, 'many']:
+            response = self.client.get(reverse('project:swipe_deck'), {'count': count})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('count', response.json()['errors'])
+
+    def test_decisions(self):
+        pending = Match.objects.create(sender=self.others[1], receiver=self.me)
+        Match.objects.create(sender=self.me, receiver=self.others[2])
+        likes = [self.others[0], self.others[1], self.others[2], 99999, self.me]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.decide(likes, passes=[self.others[3]])
+        self.assertEqual(response.json(), {
+            'liked': [self.others[0].pk],
+            'matched': [self.others[1].pk],
+            'already_liked': [self.others[2].pk],
+            'passed': [self.others[3].pk],
+            'not_found': [99999, self.me.pk],
+        })
+        self.assertEqual(Match.objects.get(sender=self.me, receiver=self.others[0]).status, 'pending')
+        self.assertEqual(seen.seen_profile_ids(self.me), {self.others[3].pk})
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'accepted')
+        # One bulk insert and one UPDATE, whatever the batch size
+        writes = [query['sql'].split()[0] for query in queries.captured_queries if 'project_match' in query['sql']]
+        self.assertEqual(writes.count('INSERT'), 1)
+        self.assertEqual(writes.count('UPDATE'), 1)
+
+        # Liking again changes nothing
+        response = self.decide([self.others[0], self.others[1]])
+        self.assertEqual(response.json()['liked'], [])
+        self.assertEqual(response.json()['already_liked'], [self.others[0].pk])
+        self.assertEqual(Match.objects.count(), 3)
+
+    def test_deck_cards_come_round_again_unless_passed(self):
+        deck = self.client.get(reverse('project:swipe_deck'), {'count': 6}).json()['cards']
+        self.decide(passes=[deck[0]['id']])
+        cards = self.client.get(reverse('project:swipe_deck'), {'count': 6}).json()['cards']
+        self.assertEqual([card['id'] for card in cards], [card['id'] for card in deck[1:]])
+
+    def test_pass_is_recorded(self):
+        response = self.client.post(reverse('project:pass_profile', args=[self.others[0].pk]))
+        self.assertRedirects(response, reverse('project:swipe'), fetch_redirect_response=False)
+        self.assertEqual(seen.seen_profile_ids(self.me), {self.others[0].pk})
+
+    def test_decisions_as_form_data(self):
+        response = self.client.post(reverse('project:swipe_decisions'), {
+            'likes': json.dumps([self.others[0].pk]), 'passes': '[]',
+        })
+        self.assertEqual(response.json()['liked'], [self.others[0].pk])
+
+    def test_decisions_take_liked_profiles_out_of_queues(self):
+        for profile in [self.me, *self.others]:
+            swipe_queue.next_candidates(profile)
+        Match.objects.create(sender=self.others[1], receiver=self.me)
+        before = {profile.pk: queued(profile) for profile in [self.me, *self.others]}
+        self.client.post(
+            reverse('project:swipe_decisions'), {'likes': json.dumps([self.others[0].pk, self.others[1].pk])},
+        )
+        liked = {self.others[0].pk, self.others[1].pk}
+        self.assertEqual(queued(self.me), [entry for entry in before[self.me.pk] if entry[1] not in liked])
+        # The mutual match drops the user from the other side's queue too
+        self.assertEqual(
+            queued(self.others[1]), [entry for entry in before[self.others[1].pk] if entry[1] != self.me.pk],
+        )
+        for profile in [self.others[0], self.others[2]]:
+            self.assertEqual(queued(profile), before[profile.pk])
+
+    def test_invalid_decisions(self):
+        too_many = list(range(SwipeDecisionsForm.MAX_DECISIONS + 1))
+        for likes, passes in [([self.others[0]], [self.others[0]]), (too_many, []), (['someone'], []), ([True], [])]:
+            response = self.decide(likes, passes)
+            self.assertEqual(response.status_code, 400)
+        for body in ['[1, 2]', '{"likes": [1]', '"likes"']:
+            response = self.client.post(reverse('project:swipe_decisions'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'errors': {'__all__': ['Send a JSON object.']}})
+        self.assertFalse(Match.objects.exists())
+
+    def test_decisions_form(self):
+        form = SwipeDecisionsForm({'likes': [3, 1, 3], 'passes': None})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data, {'likes': [3, 1], 'passes': []})
+        form = SwipeDecisionsForm({'likes': '3'})
+        self.assertEqual(form.errors['likes'], ['Enter a list of profile ids.'])
+
+
+class SeenBitmapTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        for profile_ids in [[], [0], [7, 8], [0, 15, 16, 23, 24], [255, 256, 257], [3, 1_000_003]]:
+            self.assertEqual(seen.decode(seen.encode(profile_ids)), set(profile_ids))
+
+    def test_encode_on_top_of_a_bitmap(self):
+        bitmap = seen.encode([1, 9])
+        self.assertEqual(seen.decode(seen.encode([0, 9, 4000], bitmap)), {0, 1, 9, 4000})
+        self.assertEqual(seen.encode([], bitmap), bitmap)
+        self.assertEqual(len(seen.encode([16])), 3)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SeenProfileTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.me = make_profile('me', ['g1'])
+        cls.others = [make_profile(f'listener{i}', ['g1']) for i in range(6)]
+
+    def setUp(self):
+        cache.clear()
+        matching._index = None
+
+    def seen_ids(self):
+        return seen.seen_profile_ids(self.me)
+
+    @mock.patch.object(seen, 'HEAVY_USER', 3)
+    def test_heavy_users_get_a_cached_bitmap(self):
+        seen.record_passes(self.me, [self.others[0].pk, self.others[1].pk])
+        self.assertEqual(self.seen_ids(), {self.others[0].pk, self.others[1].pk})
+        self.assertIsNone(cache.get(seen.seen_key(self.me.pk)))
+
+        seen.record_passes(self.me, [self.others[2].pk, 99999])
+        expected = {profile.pk for profile in self.others[:3]}
+        self.assertEqual(self.seen_ids(), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.seen_ids(), expected)
+
+        # New passes are OR-ed into the bitmap
+        seen.record_passes(self.me, [self.others[3].pk, self.others[0].pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.seen_ids(), expected | {self.others[3].pk})
+        self.assertEqual(ShownProfile.objects.filter(profile=self.me).count(), 4)
+
+    def test_compact_deletes_expired_passes(self):
+        seen.record_passes(self.me, [profile.pk for profile in self.others])
+        old = [profile.pk for profile in self.others[:4]]
+        ShownProfile.objects.filter(shown_profile__in=old[:2]).update(timestamp=timezone.now() - timedelta(days=91))
+        ShownProfile.objects.filter(shown_profile__in=old[2:]).update(timestamp=timezone.now() - timedelta(days=100))
+        ShownProfile.objects.filter(shown_profile=self.others[4]).update(timestamp=timezone.now() - timedelta(days=89))
+        version = table_version(ShownProfile)
+
+        self.assertEqual(seen.compact(days=90, chunk_size=3), 4)
+        self.assertEqual(self.seen_ids(), {self.others[4].pk, self.others[5].pk})
+        self.assertNotEqual(table_version(ShownProfile), version)
+
+        version = table_version(ShownProfile)
+        self.assertEqual(seen.compact(days=90), 0)
+        self.assertEqual(table_version(ShownProfile), version)
+
+    def test_compact_command(self):
+        seen.record_passes(self.me, [self.others[0].pk])
+        ShownProfile.objects.update(timestamp=timezone.now() - timedelta(days=31))
+        stdout = StringIO()
+        call_command('compact_shown_profiles', days=30, stdout=stdout)
+        self.assertIn('Deleted 1 passes older than 30 days', stdout.getvalue())
+        self.assertFalse(ShownProfile.objects.exists())
+
+    def test_seen_profiles_are_left_out_of_the_queue(self):
+        seen.record_passes(self.me, [self.others[1].pk])
+        popped = [profile.pk for profile, _ in swipe_queue.next_candidates(self.me, 10)]
+        self.assertEqual(popped, [profile.pk for profile in self.others if profile != self.others[1]])
+
+    def test_popped_profiles_are_not_seen_until_passed(self):
+        swipe_queue.next_candidates(self.me, 2)
+        self.assertFalse(ShownProfile.objects.exists())
+        # A refill from the top of the ranking queues them again
+        SwipeQueue.objects.filter(profile=self.me).update(entries=[], shown=None)
+        self.assertEqual(
+            [profile.pk for profile, _ in swipe_queue.next_candidates(self.me, 10)],
+            [profile.pk for profile in self.others],
+        )
+
+    def test_passes_leave_out_existing_profiles_only(self):
+        self.assertEqual(seen.record_passes(self.me, [self.others[0].pk, self.me.pk, 99999]), [self.others[0].pk])
+        self.assertEqual(self.seen_ids(), {self.others[0].pk})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MatchQueryCountTests(TestCase):
+    """The matching views run a fixed number of queries, however long the user's match history."""
+
+    @classmethod
+    def setUpTestData(cls):
+        genre = Genre.objects.create(name='Rock')
+        song = Song.objects.create(
+            title='Song', artist='Artist', genre=genre, release_year=2000,
+            youtube_url='https://www.youtube.com/watch?v=1',
+        )
+        cls.me = make_profile('me', [f'g{genre.pk}'], password='pw')
+        cls.others = [make_profile(f'listener{i}', [f'g{genre.pk}'] if i % 2 else []) for i in range(100)]
+        ProfileGenre.objects.bulk_create(ProfileGenre(profile=profile, genre=genre) for profile in cls.others)
+        ProfileSong.objects.bulk_create(ProfileSong(profile=profile, song=song) for profile in cls.others)
+
+    def setUp(self):
+        self.client.login(username='me', password='pw')
+        self.reset_caches()
+
+    def reset_caches(self):
+        """Empty the swipe queues and rebuild the taste index, so measured requests don't build it."""
+        cache.clear()
+        SwipeQueue.objects.all().delete()
+        matching._index = None
+        matching.get_index()
+
+    def add_history(self, size):
+        """Give the user `size` more accepted matches on each side and `size` more pending likes."""
+        start = Match.objects.filter(sender=self.me).count() // 2
+        others = self.others[3 * start:3 * (start + size)]
+        Match.objects.bulk_create(
+            [Match(sender=self.me, receiver=profile, status='accepted') for profile in others[:size]]
+            + [Match(sender=profile, receiver=self.me, status='accepted') for profile in others[size:2 * size]]
+            + [Match(sender=self.me, receiver=profile, status='pending') for profile in others[2 * size:]]
+        )
+        self.reset_caches()
+
+    def test_swipe(self):
+        for size in [1, 20]:
+            self.add_history(size)
+            # Session, user, profile, queue, matched and seen profiles, taste changes, candidates, genres,
+            # songs, and the new queue's insert in a savepoint
+            with self.assertNumQueries(13):
+                response = self.client.get(reverse('project:swipe'))
+            self.assertNotIn(response.context['profile'].pk, Match.objects.values_list('receiver', flat=True))
+            # Once the queue is filled: session, user, profile, queue, candidate, genres, songs, queue update
+            with self.assertNumQueries(8):
+                response = self.client.get(reverse('project:swipe'))
+            self.assertContains(response, 'Song by Artist')
+
+    def test_create_match(self):
+        for size in [1, 20]:
+            self.add_history(size)
+            liked = self.others[-size]
+            # Session, user, profile, receiver, existing match, insert, the queues holding the receiver
+            with self.assertNumQueries(7):
+                self.client.post(reverse('project:create_match', args=[liked.pk]))
+            self.assertTrue(Match.objects.filter(sender=self.me, receiver=liked, status='pending').exists())
+
+            Match.objects.create(sender=self.others[-size - 1], receiver=self.me)
+            # Session, user, profile, receiver, existing match, update, the queues holding either profile
+            with self.assertNumQueries(7):
+                self.client.post(reverse('project:create_match', args=[self.others[-size - 1].pk]))
+            self.assertEqual(Match.objects.get(sender=self.others[-size - 1], receiver=self.me).status, 'accepted')
+
+    def test_matches_list(self):
+        for size in [1, 20]:
+            self.add_history(size)
+            accepted = Match.objects.filter(status='accepted').count()
+            # Session, user, profile, matches with both of their profiles
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse('project:matches_list'))
+            self.assertEqual(len(response.context['matches']), accepted)
+            self.assertContains(response, 'match-card', count=accepted)
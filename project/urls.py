@@ -10,6 +10,7 @@ URL Structure:
     - Detail views with primary key parameters
     - Authentication routes (/login/, /logout/)
     - Matching system routes (/swipe/, /matches/)
+    - Swipe API routes (/swipe/deck/, /swipe/decisions/)
 
 """
 from django.urls import path
@@ -39,6 +40,8 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(template_name='project/logged_out.html',next_page='project:home'),name='logout'),
     
     path('swipe/', views.SwipeView.as_view(), name='swipe'),
+    path('swipe/deck/', views.SwipeDeckView.as_view(), name='swipe_deck'),
+    path('swipe/decisions/', views.SwipeDecisionsView.as_view(), name='swipe_decisions'),
     path('match/<int:receiver_pk>/', views.CreateMatchView.as_view(), name='create_match'),
     path('pass/<int:profile_pk>/', views.PassProfileView.as_view(), name='pass_profile'),
     path('matches/', views.MatchesListView.as_view(), name='matches_list'),
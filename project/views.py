@@ -9,20 +9,27 @@ Key Features:
     - Profile management (CRUD operations)
     - Song catalog browsing and searching
     - User matching system with swipe functionality
+    - JSON swipe deck and batch like/pass API
     - Genre and song preference management
     - Authentication integration
 """
 
+import json
+
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from django.db import transaction
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
+from django.http import JsonResponse
+
+from cs412.pagination import CachedCountPaginator, count_key, table_version
 
+from . import matching, seen, swipe_queue
 from .models import (
     Profile, 
     Song, 
@@ -36,7 +43,9 @@ from .forms import (
     NewProfileSongFormSet,
     UpdateProfileSongFormSet, 
     SongForm, 
-    SongSearchForm
+    SongSearchForm,
+    SwipeDeckForm,
+    SwipeDecisionsForm
 )
 
 def home(request):
@@ -72,13 +81,22 @@ class SongListView(ListView):
     template_name = 'project/song_list.html'
     context_object_name = 'songs'
     paginate_by = 6
+    paginator_class = CachedCountPaginator
+
+    def get_form(self):
+        """
+        Builds the search form once per request.
+        """
+        if not hasattr(self, 'form'):
+            self.form = SongSearchForm(self.request.GET)
+        return self.form
 
     def get_queryset(self):
         """
         Filters and returns the queryset based on search parameters.
         """
         queryset = Song.objects.all()
-        form = SongSearchForm(self.request.GET)
+        form = self.get_form()
         
         if form.is_valid():
             search_query = form.cleaned_data.get('search_query')
@@ -102,12 +120,23 @@ class SongListView(ListView):
 
         return queryset.order_by('-release_year')
 
+    def get_paginator(self, queryset, per_page, **kwargs):
+        """
+        Caches the song count per search until a song is added, changed or removed.
+        """
+        form = self.get_form()
+        key = count_key('songs', table_version(Song), form.cleaned_data if form.is_valid() else {})
+        return self.paginator_class(queryset, per_page, count_key=key, **kwargs)
+
     def get_context_data(self, **kwargs):
         """
-        Adds the search form to the template context.
+        Adds the search form and the query string without the page number to the template context.
         """
         context = super().get_context_data(**kwargs)
-        context['form'] = SongSearchForm(self.request.GET)
+        context['form'] = self.get_form()
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        context['search_params'] = params.urlencode()
         return context
 
 class ProfileDetailView(DetailView):
@@ -246,11 +275,13 @@ class AddProfileView(CreateView):
                 song_formset.instance = self.object
                 genre_formset.save()
                 song_formset.save()
+                matching.refresh_taste(self.object)
                 
                 login(self.request, user)
                 
                 messages.success(self.request, "Profile created successfully!")
-                return super().form_valid(form)
+                # Not super().form_valid(), which would save the profile a second time
+                return redirect(self.get_success_url())
         except Exception as e:
             messages.error(self.request, f"Error creating profile: {str(e)}")
             return self.form_invalid(form)
@@ -323,6 +354,7 @@ class ProfileUpdateView(LoginRequiredMixin, UpdateView):
                 self.object = form.save()
                 genre_formset.save()
                 song_formset.save()
+                matching.refresh_taste(self.object)
 
                 messages.success(self.request, "Profile updated successfully!")
                 return redirect('project:profile_detail', pk=self.object.pk)
@@ -358,6 +390,18 @@ class ProfileDeleteView(LoginRequiredMixin, DeleteView):
         messages.success(self.request, "Profile deleted successfully!")
         return super().delete(request, *args, **kwargs)
 
+def swipe_profiles():
+    """
+    Returns the profiles to fetch swipe candidates from.
+    
+    Their genres and songs, shown on every card, are prefetched in one
+    query each however many cards are fetched.
+    """
+    return Profile.objects.prefetch_related(
+        Prefetch('profile_genres', queryset=ProfileGenre.objects.select_related('genre')),
+        Prefetch('profile_songs', queryset=ProfileSong.objects.select_related('song')),
+    )
+
 class SwipeView(LoginRequiredMixin, View):
     """
     Implements the profile matching interface.
@@ -371,52 +415,22 @@ class SwipeView(LoginRequiredMixin, View):
         """
         Displays the next potential match to the user.
         
-        Implements complex matching logic:
+        Implements the matching logic:
         1. Excludes already matched profiles
-        2. Excludes previously seen profiles
-        3. Implements pagination through profile list
-        4. Resets to beginning when all profiles are viewed
+        2. Ranks the rest by taste compatibility, most compatible first (see matching.py)
+        3. Excludes profiles the user has passed on (see seen.py)
+        4. Pops the next profile from the user's swipe queue, which holds the
+           next batch of the ranking and is refilled when it runs low
+           (see swipe_queue.py)
         
         """
-        current_profile = request.user.profile
-        last_viewed_id = request.session.get('last_viewed_profile_id', 0)
-        
-        # Get profiles with completed or pending matches
-        matched_profiles = Match.objects.filter(
-            (Q(sender=current_profile) & Q(status='accepted')) |  
-            (Q(receiver=current_profile) & Q(status='accepted')) |  
-            (Q(sender=current_profile) & Q(status='pending'))  
-        ).values_list('sender', 'receiver')
-        
-        # Combine all profiles to exclude
-        matched_ids = set()
-        for sender_id, receiver_id in matched_profiles:
-            matched_ids.add(sender_id)
-            matched_ids.add(receiver_id)
-
-        # Find next potential match
-        potential_matches = Profile.objects.exclude(
-            id__in=matched_ids
-        ).exclude(
-            id=current_profile.id
-        ).filter(
-            id__gt=last_viewed_id
-        ).order_by('id')
-
-        # Reset to beginning if needed
-        if not potential_matches.exists():
-            potential_matches = Profile.objects.exclude(
-                id__in=matched_ids
-            ).exclude(
-                id=current_profile.id
-            ).order_by('id')
-            last_viewed_id = 0
-
-        if potential_matches.exists():
-            profile_to_show = potential_matches.first()
-            request.session['last_viewed_profile_id'] = profile_to_show.id
+        candidate = swipe_queue.next_candidate(request.user.profile, queryset=swipe_profiles())
+
+        if candidate:
+            profile_to_show, score = candidate
             return render(request, 'project/swipe.html', {
-                'profile': profile_to_show
+                'profile': profile_to_show,
+                'compatibility': score,
             })
         else:
             messages.info(request, "No more profiles to show right now!")
@@ -446,14 +460,13 @@ class CreateMatchView(LoginRequiredMixin, View):
             sender_profile = request.user.profile
             receiver_profile = Profile.objects.get(pk=receiver_pk)
             
-            # Check for existing match
-            existing_match = Match.objects.filter(
-                Q(sender=sender_profile, receiver=receiver_profile) |
-                Q(sender=receiver_profile, receiver=sender_profile)
+            # Check for existing match, in either direction
+            existing_match = Match.objects.filter(sender=sender_profile, receiver=receiver_profile).union(
+                Match.objects.filter(sender=receiver_profile, receiver=sender_profile), all=True
             ).first()
             
             if existing_match:
-                if existing_match.sender == receiver_profile:
+                if existing_match.sender_id == receiver_profile.pk:
                     # Convert to mutual match
                     existing_match.status = 'accepted'
                     existing_match.save()
@@ -479,18 +492,149 @@ class PassProfileView(LoginRequiredMixin, View):
     """
     Handles "swipe left" actions when a user passes on a profile.
     
-    Tracks viewed profiles to maintain viewing history and prevent
-    repeated displays of the same profile.
+    Returns the user to the swipe page, which shows the next profile
+    in the compatibility ranking.
     
     Required Authentication: Yes
     """
     def post(self, request, profile_pk):
         """
-        Records a passed profile and moves to the next one.
+        Records the pass and moves on to the next profile.
+        
+        The passed profile is left out of the user's swipe queue until
+        the pass expires (see seen.py).
         """
-        request.session['last_viewed_profile_id'] = profile_pk
+        seen.record_passes(request.user.profile, [profile_pk])
         return redirect('project:swipe')
 
+class SwipeDeckView(LoginRequiredMixin, View):
+    """
+    JSON API returning the next cards of the swipe deck.
+    
+    Lets a client fetch a batch of candidates in one request instead of
+    rendering the swipe page once per profile. Cards are popped from the
+    user's swipe queue like SwipeView's; the ones the client never sends a
+    decision for (see SwipeDecisionsView) come round again with the ranking.
+    
+    Required Authentication: Yes
+    """
+    def get(self, request):
+        """
+        Returns up to `count` cards (20 by default), best first.
+        
+        Each card has the profile's id, username, bio, taste compatibility,
+        favorite genres and favorite songs, with the genres and songs
+        prefetched for the whole deck.
+        """
+        form = SwipeDeckForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        candidates = swipe_queue.next_candidates(
+            request.user.profile, form.cleaned_data['count'], queryset=swipe_profiles()
+        )
+        return JsonResponse({'cards': [self.card(profile, score) for profile, score in candidates]})
+
+    def card(self, profile, score):
+        """
+        Serializes a candidate profile as a deck card.
+        """
+        return {
+            'id': profile.pk,
+            'username': profile.username,
+            'bio': profile.bio,
+            'compatibility': score,
+            'genres': [profile_genre.genre.name for profile_genre in profile.profile_genres.all()],
+            'songs': [
+                {
+                    'id': profile_song.song.pk,
+                    'title': profile_song.song.title,
+                    'artist': profile_song.song.artist,
+                    'youtube_url': profile_song.song.youtube_url,
+                }
+                for profile_song in profile.profile_songs.all()
+            ],
+        }
+
+class SwipeDecisionsView(LoginRequiredMixin, View):
+    """
+    JSON API applying a batch of like and pass decisions.
+    
+    Accepts the profile ids a user liked and passed on, as a JSON body
+    ({"likes": [...], "passes": [...]}) or as form data, and applies them
+    the way CreateMatchView and PassProfileView do for a single profile.
+    Clients send the CSRF token in the X-CSRFToken header.
+    
+    Required Authentication: Yes
+    """
+    def post(self, request):
+        """
+        Applies the decisions in one transaction.
+        
+        Implements the following logic:
+        1. Finds existing matches with every liked profile in one query
+        2. Creates pending matches for new likes with one bulk insert
+        3. Accepts the likes of profiles that already liked the user
+           with one UPDATE
+        4. Records the passes with one bulk insert (see seen.py)
+        5. Takes the liked and passed profiles out of the user's swipe
+           queue, and the user out of their new matches' queues
+        
+        """
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                return JsonResponse({'errors': {'__all__': ['Send a JSON object.']}}, status=400)
+        else:
+            data = request.POST
+        form = SwipeDecisionsForm(data)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        current_profile = request.user.profile
+        likes, passes = form.cleaned_data['likes'], form.cleaned_data['passes']
+        with transaction.atomic():
+            liked = set(Profile.objects.filter(pk__in=likes).exclude(pk=current_profile.pk).values_list('pk', flat=True))
+
+            # Check for existing matches
+            existing_matches = Match.objects.filter(sender=current_profile, receiver__in=liked).values_list(
+                'sender', 'receiver'
+            ).union(
+                Match.objects.filter(sender__in=liked, receiver=current_profile).values_list('sender', 'receiver'),
+                all=True,
+            )
+            already_liked = {receiver_id for sender_id, receiver_id in existing_matches if sender_id == current_profile.pk}
+            mutual = {sender_id for sender_id, receiver_id in existing_matches if receiver_id == current_profile.pk}
+            new_likes = liked - already_liked - mutual
+
+            # Create new pending matches
+            Match.objects.bulk_create(
+                [Match(sender=current_profile, receiver_id=profile_id, status='pending') for profile_id in sorted(new_likes)],
+                ignore_conflicts=True,
+            )
+            # Convert to mutual matches
+            Match.objects.filter(sender__in=mutual, receiver=current_profile).update(status='accepted')
+
+            passed = set(seen.record_passes(current_profile, passes))
+
+            # Bulk writes send no signals, so take the profiles they made ineligible
+            # out of the swipe queues here, in the same transaction
+            swipe_queue.discard(
+                [(current_profile.pk, profile_id) for profile_id in liked | passed]
+                + [(profile_id, current_profile.pk) for profile_id in mutual]
+            )
+
+        return JsonResponse({
+            'liked': sorted(new_likes),
+            'matched': sorted(mutual),
+            'already_liked': sorted(already_liked - mutual),
+            'passed': sorted(passed),
+            'not_found': [profile_id for profile_id in likes + passes if profile_id not in liked | passed],
+        })
+
 class MatchesListView(LoginRequiredMixin, ListView):
     """
     Displays a list of successful matches for the current user.
@@ -506,11 +650,15 @@ class MatchesListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         """
         Retrieves all accepted matches for the current user.
+        
+        The matches on each side are found in their own branch of a UNION,
+        and both profiles of every match are fetched in the same query.
         """
-        return Match.objects.filter(
-            Q(sender=self.request.user.profile, status='accepted') |
-            Q(receiver=self.request.user.profile, status='accepted')
+        current_profile = self.request.user.profile
+        accepted = Match.objects.filter(sender=current_profile, status='accepted').values('pk').union(
+            Match.objects.filter(receiver=current_profile, status='accepted').values('pk'), all=True
         )
+        return Match.objects.filter(pk__in=accepted).select_related('sender', 'receiver').order_by('-created_at')
         
         
 '''
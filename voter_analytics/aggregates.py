@@ -0,0 +1,119 @@
+"""
+Single-pass aggregation over voter data for the analytics charts.
+
+summarize() runs one GROUP BY (birth year, party) query with a conditional
+aggregate testing each election's bit of election_mask, then folds the grouped rows in Python
+into the birth-year histogram, party distribution, per-election participation
+and total that the graphs page needs.
+
+registration_series() does the same for the monthly registration trends,
+reading only the RegistrationMonth buckets.
+"""
+from datetime import date
+
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.lookups import Exact
+
+from .models import ELECTION_BITS, ELECTIONS
+
+
+def election_sums(weight=Value(1)):
+    """Return {election: aggregate} summing `weight` over rows with its bit set."""
+    return {
+        election: Sum(Case(
+            When(Exact(F('election_mask').bitand(bit), bit), then=weight),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        for election, bit in ELECTION_BITS.items()
+    }
+
+
+def summarize(queryset, weight=Value(1)):
+    """
+    Aggregate a filtered queryset into chart data with a single query.
+
+    `queryset` is either a VoterRollup queryset, whose `count` column is
+    passed as the weight (see summarize_rollups), or a Voter queryset,
+    where every row counts once.
+
+    Returns a dict with:
+        birth_years: {year: voters}, sorted by year
+        parties: {party: voters}, largest party first
+        elections: {election field: voters who voted in it}
+        total: number of voters
+    """
+    groups = (
+        queryset
+        .values('birth_year', 'party_affiliation')
+        .annotate(
+            total=Sum(weight),
+            **election_sums(weight),
+        )
+        .order_by()
+    )
+
+    birth_years, parties = {}, {}
+    elections = dict.fromkeys(ELECTIONS, 0)
+    total = 0
+    for group in groups:
+        count = group['total']
+        birth_years[group['birth_year']] = birth_years.get(group['birth_year'], 0) + count
+        parties[group['party_affiliation']] = parties.get(group['party_affiliation'], 0) + count
+        for election in ELECTIONS:
+            elections[election] += group[election]
+        total += count
+
+    return {
+        'birth_years': dict(sorted(birth_years.items())),
+        'parties': dict(sorted(parties.items(), key=lambda item: (-item[1], item[0]))),
+        'elections': elections,
+        'total': total,
+    }
+
+
+def summarize_rollups(queryset):
+    """Summarize a filtered VoterRollup queryset."""
+    return summarize(queryset, weight=F('count'))
+
+
+def summarize_voters(queryset):
+    """Summarize a filtered Voter queryset directly, without the rollup table."""
+    return summarize(queryset)
+
+
+def month_range(first, last):
+    """Return the first day of every month from `first` to `last` inclusive."""
+    months = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        months.append(date(year, month, 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def registration_series(queryset, group_by=None):
+    """
+    Fold a filtered RegistrationMonth queryset into monthly registration counts.
+
+    One query sums the buckets per month (and per `group_by` value, a
+    party_affiliation or precinct_number). Months without registrations
+    inside the range are filled with zeros.
+    """
+    fields = ['month', group_by] if group_by else ['month']
+    rows = list(queryset.values(*fields).annotate(registered=Sum('count')).order_by(*fields))
+    if not rows:
+        return {'months': [], 'series': {}, 'total': 0}
+    months = month_range(rows[0]['month'], rows[-1]['month'])
+    index = {month: i for i, month in enumerate(months)}
+    series = {}
+    for row in rows:
+        name = str(row[group_by]) if group_by else 'All voters'
+        counts = series.setdefault(name, [0] * len(months))
+        counts[index[row['month']]] += row['registered']
+    return {
+        'months': [f'{month:%Y-%m}' for month in months],
+        # Shorter names first so precincts sort numerically
+        'series': dict(sorted(series.items(), key=lambda item: (len(item[0]), item[0]))),
+        'total': sum(row['registered'] for row in rows),
+    }
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class VoterAnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'voter_analytics'
+
+    def ready(self):
+        """Bump the voter data generation whenever rows are saved or migrations run outside a load."""
+        from .cache import track_data_changes
+        track_data_changes(self)
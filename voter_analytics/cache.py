@@ -0,0 +1,171 @@
+"""
+Caching for the voter analytics pages.
+
+The voter data only changes when `manage.py load_voters` runs, so each load
+bumps a generation counter kept in the "versions" cache (shared by the web
+workers and the load command, see cs412/caches.py). Per-process caches
+compare their generation with it and drop everything they hold when the
+voter data has been reloaded. Row edits outside a load (admin or shell
+saves) and migrations bump it too.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_migrate, post_save
+
+from cs412.caches import versions_cache
+
+GENERATION_KEY = 'voter_analytics:generation'
+
+
+def get_generation():
+    """Return the current voter data generation."""
+    return versions_cache().get(GENERATION_KEY, 0)
+
+
+def bump_generation():
+    """Invalidate every cache built from the current voter data."""
+    try:
+        return versions_cache().incr(GENERATION_KEY)
+    except ValueError:
+        # Key missing or expired: start a new generation from a fresh value
+        generation = int(time.time())
+        versions_cache().set(GENERATION_KEY, generation, timeout=None)
+        return generation
+
+
+def track_data_changes(app_config):
+    """
+    Bump the generation after voter data changes made outside load_voters.
+
+    A saved row bumps it once its transaction commits, and a migrate run
+    that applied migrations bumps it when it finishes. Queryset and bulk
+    writes send no signals, so code making them bumps it itself, as
+    load_voters does; deletes are left without a receiver so they stay
+    single queries.
+    """
+    def row_saved(sender, using, **kwargs):
+        transaction.on_commit(bump_generation, using=using)
+
+    def migrated(sender, using, plan=None, **kwargs):
+        if plan and using == DEFAULT_DB_ALIAS:
+            bump_generation()
+
+    # Weak references would drop the closures straight away
+    for model in app_config.get_models():
+        post_save.connect(row_saved, sender=model, weak=False, dispatch_uid=f'voter_analytics:save:{model.__name__}')
+    # Sent once per app per migrate run; listening to this app's is enough
+    post_migrate.connect(migrated, sender=app_config, weak=False, dispatch_uid='voter_analytics:migrate')
+
+
+def per_generation(func):
+    """
+    Cache a function's result in this process until the voter data changes.
+
+    For argument-less lookups such as the filter form's choice lists. The
+    wrapped function gains cache_clear() to drop the stored result.
+    """
+    lock = threading.Lock()
+    state = {}
+
+    @functools.wraps(func)
+    def wrapper():
+        generation = get_generation()
+        with lock:
+            if state.get('generation') == generation:
+                return state['value']
+            value = func()
+            state.update(generation=generation, value=value)
+            return value
+
+    wrapper.cache_clear = state.clear
+    return wrapper
+
+
+def filter_key(cleaned_data):
+    """Normalize VoterFilterForm.cleaned_data into a hashable cache key."""
+    return tuple(sorted(
+        (name, value) for name, value in cleaned_data.items()
+        if value not in (None, '', False)
+    ))
+
+
+class ChartCache:
+    """
+    Process-level LRU cache of rendered chart payloads keyed by filter key.
+
+    Entries are dropped all at once when the voter data generation changes.
+    Hits, misses and the time spent rebuilding entries are counted so the
+    cache can be sized from stats().
+    """
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = None
+        self.hits = self.misses = 0
+        self.rebuild_seconds = self.last_rebuild_seconds = 0.0
+
+    @property
+    def maxsize(self):
+        if self._maxsize is None:
+            return getattr(settings, 'VOTER_CHART_CACHE_SIZE', 64)
+        return self._maxsize
+
+    def get_or_build(self, key, build):
+        """Return the cached payload for key, calling build() on a miss."""
+        generation = get_generation()
+        with self._lock:
+            if generation != self.generation:
+                self._entries.clear()
+                self.generation = generation
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        started = time.perf_counter()
+        payload = build()
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.rebuild_seconds += elapsed
+            self.last_rebuild_seconds = elapsed
+            if generation == self.generation:
+                self._entries[key] = payload
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return payload
+
+    def clear(self):
+        """Drop all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.generation = None
+            self.hits = self.misses = 0
+            self.rebuild_seconds = self.last_rebuild_seconds = 0.0
+
+    def stats(self):
+        """Return usage statistics for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'generation': self.generation,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else None,
+                'avg_rebuild_ms': 1000 * self.rebuild_seconds / self.misses if self.misses else None,
+                'last_rebuild_ms': 1000 * self.last_rebuild_seconds,
+            }
+
+
+chart_cache = ChartCache()
@@ -0,0 +1,68 @@
+"""
+Plotly figure specs for the voter charts, built from plain dicts and lists.
+
+These produce the same JSON figure that plotly.graph_objects would for the
+chart types the graphs page uses, without importing plotly or running its
+property validation on every request. The browser renders them with the
+static plotly.js bundle.
+"""
+
+MARGIN = {'l': 50, 'r': 50, 't': 50, 'b': 50}
+
+
+def bar_chart(x, y, title, xaxis_title, yaxis_title, height=400):
+    """Return a bar chart figure with every bar labelled by its value."""
+    y = list(y)
+    return {
+        'data': [{
+            'type': 'bar',
+            'x': list(x),
+            'y': y,
+            'text': [str(value) for value in y],
+            'textposition': 'auto',
+        }],
+        'layout': {
+            'title': {'text': title},
+            'xaxis': {'title': {'text': xaxis_title}},
+            'yaxis': {'title': {'text': yaxis_title}},
+            'showlegend': False,
+            'height': height,
+            'margin': dict(MARGIN),
+        },
+    }
+
+
+def line_chart(x, series, title, xaxis_title, yaxis_title, height=450):
+    """Return a line chart figure with one trace per {name: y values} series."""
+    x = list(x)
+    return {
+        'data': [
+            {'type': 'scatter', 'mode': 'lines', 'name': str(name), 'x': x, 'y': list(y)}
+            for name, y in series.items()
+        ],
+        'layout': {
+            'title': {'text': title},
+            'xaxis': {'title': {'text': xaxis_title}},
+            'yaxis': {'title': {'text': yaxis_title}},
+            'showlegend': len(series) > 1,
+            'height': height,
+            'margin': dict(MARGIN),
+        },
+    }
+
+
+def pie_chart(labels, values, title, height=500):
+    """Return a pie chart figure with a legend."""
+    return {
+        'data': [{
+            'type': 'pie',
+            'labels': list(labels),
+            'values': list(values),
+        }],
+        'layout': {
+            'title': {'text': title},
+            'showlegend': True,
+            'height': height,
+            'margin': dict(MARGIN),
+        },
+    }
@@ -0,0 +1,141 @@
+"""
+Turnout cohort statistics over the voter snapshot.
+
+Voters are grouped by any combination of dimensions (age band, birth decade,
+party, precinct, voter score and whether they voted in each election), and
+every group gets its size, turnout in each election, score distribution and,
+optionally, retention between two elections: the share of the voters who
+voted in the first who also voted in the second.
+
+Everything is computed from the columnar snapshot (see snapshot.py), which is
+read from the Voter table in one batched pass per voter load. The groups are
+numbered from the combined dimension codes, and one np.bincount over group
+and elections-voted pattern gives every statistic but the score distribution,
+so no Python code runs per voter or per group.
+"""
+from datetime import date
+
+from .models import ELECTION_BITS, ELECTIONS
+from .snapshot import np
+
+# Lower bounds of the age bands, in years
+AGE_BANDS = [18, 25, 35, 45, 55, 65, 75]
+
+DIMENSIONS = ['age_band', 'birth_decade', 'party', 'precinct', 'voter_score', *ELECTIONS]
+
+# Largest cross-tab numbered through a table of every combination of values
+MAX_TABLE = 1 << 22
+
+
+def age_band_labels():
+    """Return the label of every age band, youngest first."""
+    labels = ['under 18']
+    for low, high in zip(AGE_BANDS, AGE_BANDS[1:]):
+        labels.append(f'{low}-{high - 1}')
+    return labels + [f'{AGE_BANDS[-1]}+']
+
+
+def integer_codes(values, step=1):
+    """Return (labels, codes) for integer values, one label per step from the smallest to the largest."""
+    if not len(values):
+        return [], values.astype('intp')
+    low = int(values.min()) // step * step
+    codes = (values.astype('intp') - low) // step
+    return list(range(low, low + step * (int(codes.max()) + 1), step)), codes
+
+
+def dimension(voters, name, selected):
+    """Return (labels, codes): each selected voter's index into labels for one dimension."""
+    if name == 'age_band':
+        # Look each birth year's band up in a table rather than comparing every voter's age
+        years, codes = integer_codes(voters.birth_year[selected])
+        bands = np.digitize(date.today().year - np.array(years), AGE_BANDS)
+        return age_band_labels(), bands[codes]
+    if name == 'party':
+        # Renumber the snapshot's party codes in alphabetical order
+        parties = sorted(voters.parties)
+        rank = np.array([parties.index(party) for party in voters.parties], dtype='intp')
+        return parties, rank[voters.party[selected]]
+    if name in ELECTION_BITS:
+        return [False, True], ((voters.election_mask[selected] & ELECTION_BITS[name]) != 0).astype('intp')
+    if name == 'birth_decade':
+        return integer_codes(voters.birth_year[selected], step=10)
+    return integer_codes(getattr(voters, name)[selected])
+
+
+def number_groups(codes, shape):
+    """
+    Number the distinct combinations of dimension codes from 0.
+
+    Returns (cells, group): the flat index of each combination present and
+    every voter's group number. Small cross-tabs are numbered by counting
+    into a table of every combination, large ones by sorting.
+    """
+    flat = np.ravel_multi_index(codes, shape)
+    combinations = int(np.prod(shape))
+    if combinations > MAX_TABLE:
+        return np.unique(flat, return_inverse=True)
+    cells = np.flatnonzero(np.bincount(flat, minlength=combinations))
+    table = np.zeros(combinations, dtype='intp')
+    table[cells] = np.arange(len(cells))
+    return cells, table[flat]
+
+
+def cohort_stats(voters, cleaned_data, by=(), retention=None):
+    """
+    Group the voters matching VoterFilterForm data by the `by` dimensions.
+
+    `retention` is an optional (from election, to election) pair. Returns
+    the total and the non-empty groups, in dimension order, as columns: one
+    list per dimension and statistic with an entry per group.
+    """
+    selected = voters.select(cleaned_data)
+    masks = voters.election_mask[selected].astype('intp')
+    scores = voters.voter_score[selected].astype('intp')
+
+    labels, codes = [], []
+    for name in by:
+        dimension_labels, dimension_codes = dimension(voters, name, selected)
+        labels.append(dimension_labels)
+        codes.append(dimension_codes)
+    shape = [len(dimension_labels) for dimension_labels in labels]
+    if not len(masks):
+        cells = group = np.zeros(0, dtype='intp')
+    elif by:
+        cells, group = number_groups(codes, shape)
+    else:
+        cells, group = np.zeros(1, dtype='intp'), np.zeros(len(masks), dtype='intp')
+    count = len(cells)
+
+    # Voters per group and combination of elections voted in; every
+    # statistic but the score distribution is a sum over its columns
+    patterns = 1 << len(ELECTIONS)
+    by_pattern = np.bincount(group * patterns + masks, minlength=count * patterns).reshape(count, patterns)
+    pattern = np.arange(patterns)
+    sizes = by_pattern.sum(axis=1)
+    levels = len(ELECTIONS) + 1
+    score_counts = np.bincount(group * levels + scores, minlength=count * levels).reshape(count, levels)
+
+    cell_codes = np.unravel_index(cells, shape) if by and count else [cells] * len(by)
+    columns = {
+        name: np.array(labels[d], dtype=object)[cell_codes[d]].tolist()
+        for d, name in enumerate(by)
+    }
+    columns['voters'] = sizes.tolist()
+    columns['turnout'] = {
+        election: np.round(by_pattern[:, (pattern & bit) != 0].sum(axis=1) / sizes, 4).tolist()
+        for election, bit in ELECTION_BITS.items()
+    }
+    columns['score_distribution'] = score_counts.tolist()
+    if retention:
+        first, both = ELECTION_BITS[retention[0]], ELECTION_BITS[retention[0]] | ELECTION_BITS[retention[1]]
+        voted_first = by_pattern[:, (pattern & first) != 0].sum(axis=1)
+        voted_both = by_pattern[:, (pattern & both) == both].sum(axis=1)
+        share = np.divide(voted_both, voted_first, out=np.full(count, np.nan), where=voted_first > 0)
+        columns['retention'] = [None if np.isnan(value) else value for value in np.round(share, 4).tolist()]
+    return {
+        'dimensions': list(by),
+        'retention': list(retention) if retention else None,
+        'total': int(np.count_nonzero(selected)),
+        'cells': columns,
+    }
@@ -0,0 +1,61 @@
+"""
+Streaming export of filtered voter lists as CSV or NDJSON.
+
+Rows are fetched from the database cursor with values_list().iterator() and
+written out a chunk at a time, so memory use does not depend on how many
+voters are exported.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from .models import ELECTION_BITS
+
+# Voter columns in export order; the election_mask is expanded into one
+# true/false column per election after them
+FIELDS = [
+    'id', 'last_name', 'first_name',
+    'street_number', 'street_name', 'apartment_number', 'zip_code',
+    'date_of_birth', 'date_of_registration', 'party_affiliation', 'precinct_number',
+    'voter_score',
+]
+HEADER = [*FIELDS, *ELECTION_BITS]
+
+CHUNK_SIZE = 2000
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Yield a tuple of HEADER values for every voter in the queryset."""
+    rows = queryset.values_list(*FIELDS, 'election_mask').iterator(chunk_size=chunk_size)
+    bits = list(ELECTION_BITS.values())
+    for *values, mask in rows:
+        yield (*values, *[bool(mask & bit) for bit in bits])
+
+
+def stream_csv(rows, chunk_size=CHUNK_SIZE):
+    """Yield CSV text for the header and rows, chunk_size rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    yield buffer.getvalue()
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(rows, chunk_size=CHUNK_SIZE):
+    """Yield one JSON object per line for the rows, chunk_size rows at a time."""
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield ''.join(json.dumps(dict(zip(HEADER, row)), default=str) + '\n' for row in chunk)
+
+
+# format name -> (content type, streaming function)
+FORMATS = {
+    'csv': ('text/csv', stream_csv),
+    'ndjson': ('application/x-ndjson', stream_ndjson),
+}
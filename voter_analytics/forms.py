@@ -1,14 +1,26 @@
 from django import forms
-from .models import Voter
+from .cache import per_generation
+from .cohorts import DIMENSIONS
+from .models import ELECTION_LABELS, ELECTIONS, VoterRollup, voted_in
+from .search import WORD_RE, filter_tags, search_voters
 from datetime import datetime
 from django.db import ProgrammingError
 
+@per_generation
+def party_choices():
+    """Parties present in the voter data, read from the small rollup table."""
+    return [('', 'All Parties')] + list(
+        VoterRollup.objects.values_list('party_affiliation', 'party_affiliation')
+        .distinct().order_by('party_affiliation')
+    )
+
+
 class VoterFilterForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Get party choices dynamically, handle case where table doesn't exist yet
+        # Party choices are cached until the next voter load; handle case where table doesn't exist yet
         try:
-            PARTY_CHOICES = [('', 'All Parties')] + list(Voter.objects.values_list('party_affiliation', 'party_affiliation').distinct())
+            PARTY_CHOICES = party_choices()
         except ProgrammingError:
             PARTY_CHOICES = [('', 'All Parties')]
         self.fields['party_affiliation'].choices = PARTY_CHOICES
@@ -23,12 +35,116 @@ class VoterFilterForm(forms.Form):
     max_birth_year = forms.ChoiceField(choices=YEAR_CHOICES, required=False)
     
     # Voter score dropdown
-    SCORE_CHOICES = [('', 'Any')] + [(str(i), str(i)) for i in range(6)]  # 0 to 5
+    SCORE_CHOICES = [('', 'Any')] + [(str(i), str(i)) for i in range(len(ELECTIONS) + 1)]
     voter_score = forms.ChoiceField(choices=SCORE_CHOICES, required=False)
-    
-    # Election participation checkboxes
-    v20state = forms.BooleanField(required=False, label='2020 State Election')
-    v21town = forms.BooleanField(required=False, label='2021 Town Election')
-    v21primary = forms.BooleanField(required=False, label='2021 Primary')
-    v22general = forms.BooleanField(required=False, label='2022 General')
-    v23town = forms.BooleanField(required=False, label='2023 Town Election')
\ No newline at end of file
+
+    def filter_queryset(self, queryset):
+        """Apply the submitted filters to a Voter or VoterRollup queryset."""
+        if not self.is_valid():
+            return queryset
+
+        if party := self.cleaned_data.get('party_affiliation'):
+            queryset = queryset.filter(party_affiliation=party)
+
+        # Year filters use the stored, indexed birth_year column
+        if min_year := self.cleaned_data.get('min_birth_year'):
+            queryset = queryset.filter(birth_year__gte=int(min_year))
+
+        if max_year := self.cleaned_data.get('max_birth_year'):
+            queryset = queryset.filter(birth_year__lte=int(max_year))
+
+        if score := self.cleaned_data.get('voter_score'):
+            queryset = queryset.filter(voter_score=int(score))
+
+        # Checked elections must all be set in the mask, one term per election
+        # so each can be answered from its partial index
+        for election in ELECTIONS:
+            if self.cleaned_data.get(election):
+                queryset = queryset.filter(voted_in(election))
+
+        return queryset
+
+
+# Election participation checkboxes, one per election bit; added to the
+# class once rather than on every instantiation
+VoterFilterForm.base_fields.update(
+    (election, forms.BooleanField(required=False, label=label))
+    for election, label in ELECTION_LABELS.items()
+)
+
+
+class VoterSearchForm(VoterFilterForm):
+    """VoterFilterForm plus a name/address search, for Voter querysets only."""
+    q = forms.CharField(required=False, max_length=100, label='Search name or address')
+
+    field_order = ['q']
+
+    def clean_q(self):
+        """Keep only the words searched for, so equivalent searches share cached counts."""
+        return ' '.join(WORD_RE.findall(self.cleaned_data['q'])).lower()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.is_valid() and (text := self.cleaned_data.get('q')):
+            queryset = search_voters(queryset, text, filter_tags(self.cleaned_data))
+        return queryset
+
+
+class CohortForm(VoterFilterForm):
+    """VoterFilterForm plus the cohort dimensions to group by and two elections to measure retention between."""
+    ELECTION_CHOICES = [('', 'None')] + list(ELECTION_LABELS.items())
+
+    by = forms.MultipleChoiceField(choices=[(name, name) for name in DIMENSIONS], required=False)
+    retention_from = forms.ChoiceField(choices=ELECTION_CHOICES, required=False)
+    retention_to = forms.ChoiceField(choices=ELECTION_CHOICES, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if bool(cleaned_data.get('retention_from')) != bool(cleaned_data.get('retention_to')):
+            raise forms.ValidationError('Retention needs both a first and a second election.')
+        return cleaned_data
+
+    @property
+    def retention(self):
+        """The (from, to) elections to measure retention between, or None."""
+        if self.cleaned_data.get('retention_from'):
+            return (self.cleaned_data['retention_from'], self.cleaned_data['retention_to'])
+        return None
+
+
+class RegistrationTrendForm(forms.Form):
+    """Month range, party and precinct filters for the registration trends, plus how to split them."""
+    GROUP_CHOICES = [
+        ('', 'All voters'),
+        ('party_affiliation', 'Party'),
+        ('precinct_number', 'Precinct'),
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        try:
+            self.fields['party_affiliation'].choices = party_choices()
+        except ProgrammingError:
+            self.fields['party_affiliation'].choices = [('', 'All Parties')]
+
+    start = forms.DateField(required=False, input_formats=['%Y-%m'], label='From month',
+                            widget=forms.DateInput(attrs={'type': 'month'}))
+    end = forms.DateField(required=False, input_formats=['%Y-%m'], label='To month',
+                          widget=forms.DateInput(attrs={'type': 'month'}))
+    party_affiliation = forms.ChoiceField(choices=[], required=False)
+    precinct_number = forms.IntegerField(required=False, min_value=1)
+    group_by = forms.ChoiceField(choices=GROUP_CHOICES, required=False, label='Split by')
+
+    def filter_queryset(self, queryset):
+        """Apply the submitted filters to a RegistrationMonth queryset."""
+        if not self.is_valid():
+            return queryset
+        if start := self.cleaned_data.get('start'):
+            queryset = queryset.filter(month__gte=start)
+        if end := self.cleaned_data.get('end'):
+            queryset = queryset.filter(month__lte=end)
+        if party := self.cleaned_data.get('party_affiliation'):
+            queryset = queryset.filter(party_affiliation=party)
+        if precinct := self.cleaned_data.get('precinct_number'):
+            queryset = queryset.filter(precinct_number=precinct)
+        return queryset
@@ -0,0 +1,111 @@
+"""
+Time an analytics query against the main database and the replica under write load.
+
+Runs in a scratch copy of the database and fills it with synthetic voters,
+then writes it out twice to temporary files: once as a stand-in for the main
+database and once as the replica, opened the way the "analytics" alias opens
+it. The graphs page's GROUP BY over the Voter table is timed on each, first
+idle and then while another thread keeps committing small write transactions
+to the main database, as sign-ups, likes and posts do.
+
+Usage:
+    python manage.py benchmark_analytics_replica [--rows 200000] [--queries 30]
+"""
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+
+from voter_analytics.aggregates import election_sums
+from voter_analytics.models import Voter
+from voter_analytics.replica import refresh_replica
+from voter_analytics.synthetic import populate
+
+
+def write_load(path, stop):
+    """Commit small transactions to the database at `path` until `stop` is set."""
+    writer = sqlite3.connect(path, timeout=30, isolation_level=None)
+    writer.execute('CREATE TABLE IF NOT EXISTS benchmark_writes (id INTEGER PRIMARY KEY, payload TEXT)')
+    while not stop.is_set():
+        writer.execute('BEGIN IMMEDIATE')
+        writer.executemany('INSERT INTO benchmark_writes (payload) VALUES (?)', [('x' * 200,)] * 50)
+        writer.execute('COMMIT')
+    writer.close()
+
+
+class Command(BaseCommand):
+    help = 'Compare analytics query latency on the main database and the replica under write load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200_000, help='Synthetic voters to generate.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--queries', type=int, default=30, help='Queries timed per measurement.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The analytics replica needs SQLite.')
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            populate(options['rows'], seed=options['seed'])
+            queryset = (
+                Voter.objects.filter(party_affiliation='D')
+                .values('birth_year', 'party_affiliation')
+                .annotate(total=Count('id'), **election_sums())
+                .order_by()
+            )
+            sql, params = queryset.query.sql_with_params()
+            # Django's placeholders are %s; the sqlite3 module's are ?
+            sql = sql.replace('%s', '?')
+            with tempfile.TemporaryDirectory() as directory:
+                main = f'{directory}/main.sqlite3'
+                replica = f'{directory}/replica.sqlite3'
+                for path in [main, replica]:
+                    with override_settings(VOTER_REPLICA_PATH=path):
+                        refresh_replica()
+                self.run(main, replica, sql, params, options['queries'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, main, replica, sql, params, queries):
+        analytics = settings.DATABASES['analytics']
+        replica_uri = f"file:{replica}?{analytics['NAME'].partition('?')[2]}"
+
+        def timings(uri):
+            reader = sqlite3.connect(uri, uri=True, timeout=30)
+            if uri == replica_uri:
+                reader.execute(analytics['OPTIONS']['init_command'])
+            reader.execute(sql, params).fetchall()
+            result = []
+            for _ in range(queries):
+                started = time.perf_counter()
+                reader.execute(sql, params).fetchall()
+                result.append(1000 * (time.perf_counter() - started))
+            reader.close()
+            return result
+
+        self.stdout.write(f"{'database':<10} {'writes':<7} {'median ms':>10} {'p95 ms':>8} {'max ms':>8}")
+        for label, uri in [('main', f'file:{main}'), ('replica', replica_uri)]:
+            for writing in [False, True]:
+                stop = threading.Event()
+                writer = threading.Thread(target=write_load, args=(main, stop))
+                if writing:
+                    writer.start()
+                try:
+                    result = sorted(timings(uri))
+                finally:
+                    stop.set()
+                    if writing:
+                        writer.join()
+                p95 = result[int(0.95 * (len(result) - 1))]
+                self.stdout.write(
+                    f"{label:<10} {'yes' if writing else 'no':<7} "
+                    f"{statistics.median(result):10.1f} {p95:8.1f} {result[-1]:8.1f}"
+                )
@@ -0,0 +1,71 @@
+"""
+Time precinct walk lists read from the Household table against grouping voters.
+
+Runs in a scratch copy of the database, fills it with synthetic voters (which
+also builds the Household table) and, for a few precincts, times the first
+page of the household walk list view next to the GROUP BY over the Voter
+table's addresses it replaces.
+
+Usage:
+    python manage.py benchmark_households [--rows 1000000] [--repeat 5]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import RequestFactory
+from django.urls import reverse
+
+from voter_analytics.models import Household, Voter
+from voter_analytics.synthetic import populate
+from voter_analytics.views import HouseholdListView
+
+PRECINCTS = [1, 16, 32]
+
+
+def best_of(func, repeat):
+    """Return func()'s fastest run in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(1000 * (time.perf_counter() - started))
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Compare household walk list timings with grouping the Voter table in a scratch database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic voters to generate.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per timing; the fastest is reported.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            populate(options['rows'], seed=options['seed'])
+            rebuild_ms = best_of(Household.rebuild, 1)
+            self.stdout.write(
+                f"{options['rows']:,} voters in {Household.objects.count():,} households; "
+                f"Household table rebuilt in {rebuild_ms:.0f} ms."
+            )
+            self.run(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, repeat):
+        view = HouseholdListView.as_view()
+        self.stdout.write(f"{'precinct':>8} {'walk list ms':>13} {'group by ms':>12}")
+        for precinct in PRECINCTS:
+            request = RequestFactory().get(reverse('households', args=[precinct]))
+            walk_list = lambda: view(request, precinct=precinct).render()
+            # The same first page computed from the Voter table without the index
+            group_by = lambda: list(
+                Voter.objects.filter(precinct_number=precinct)
+                .values('zip_code', 'street_name', 'street_number', 'apartment_number')
+                .annotate(members=Count('id'), total_score=Sum('voter_score'))
+                .order_by('zip_code', 'street_name', 'street_number', 'apartment_number')[:HouseholdListView.paginate_by]
+            )
+            self.stdout.write(f'{precinct:>8} {best_of(walk_list, repeat):13.1f} {best_of(group_by, repeat):12.1f}')
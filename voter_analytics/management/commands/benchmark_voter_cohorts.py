@@ -0,0 +1,93 @@
+"""
+Time cohort statistics over synthetic voters, up to a 10-way cross-tab.
+
+Runs in a scratch copy of the database, fills it with synthetic voters, reads
+them into a snapshot in one batched pass and times cohort_stats() for a range
+of groupings, ending with every dimension at once. The party x voter score
+counts are checked against a GROUP BY over the Voter table.
+
+Usage:
+    python manage.py benchmark_voter_cohorts [--rows 1000000] [--repeat 5]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from voter_analytics import snapshot
+from voter_analytics.cohorts import DIMENSIONS, cohort_stats
+from voter_analytics.models import Voter
+from voter_analytics.synthetic import populate
+
+GROUPINGS = [
+    [],
+    ['age_band', 'party'],
+    ['precinct', 'voter_score'],
+    ['age_band', 'party', 'precinct'],
+    DIMENSIONS,
+]
+RETENTION = ('v21town', 'v23town')
+# A full cross-tab of a million voters should stay well inside this
+TARGET_MS = 1000
+
+
+def best_of(func, repeat):
+    """Return func()'s result and its fastest run in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(1000 * (time.perf_counter() - started))
+    return result, min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Time cohort statistics, up to a cross-tab over every dimension, in a scratch database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic voters to generate.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per timing; the fastest is reported.')
+
+    def handle(self, *args, **options):
+        if not snapshot.available():
+            raise CommandError('NumPy is required for cohort statistics.')
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            populate(options['rows'], seed=options['seed'])
+            voters, build_ms = best_of(snapshot.VoterSnapshot.build, 1)
+            self.stdout.write(f"Read {len(voters):,} voters into the snapshot in {build_ms:.0f} ms.")
+            self.check_counts(voters)
+            self.run(voters, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def check_counts(self, voters):
+        """Compare a two-way cross-tab with the same GROUP BY in SQL."""
+        stats = cohort_stats(voters, {}, by=['party', 'voter_score'])
+        cells = stats['cells']
+        counts = dict(zip(zip(cells['party'], cells['voter_score']), cells['voters']))
+        expected = {
+            (row['party_affiliation'], row['voter_score']): row['n']
+            for row in Voter.objects.values('party_affiliation', 'voter_score').annotate(n=Count('id')).order_by()
+        }
+        if counts != expected:
+            raise CommandError('Cohort counts differ from the Voter table.')
+
+    def run(self, voters, repeat):
+        slow = []
+        self.stdout.write(f"{'dimensions':>10} {'filters':<8} {'cells':>8} {'ms':>8}")
+        for by in GROUPINGS:
+            for label, cleaned_data in {'-': {}, 'party': {'party_affiliation': 'D'}}.items():
+                stats, elapsed = best_of(lambda: cohort_stats(voters, cleaned_data, by, RETENTION), repeat)
+                cells = len(stats['cells']['voters'])
+                self.stdout.write(f'{len(by):>10} {label:<8} {cells:>8,} {elapsed:8.1f}')
+                if elapsed > TARGET_MS:
+                    slow.append(f"{'x'.join(by) or 'total'} {label}")
+
+        if slow:
+            self.stdout.write(self.style.ERROR(f'{len(slow)} cross-tabs took over {TARGET_MS} ms: {", ".join(slow)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Every cross-tab finished within {TARGET_MS} ms.'))
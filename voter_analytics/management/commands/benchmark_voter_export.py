@@ -0,0 +1,85 @@
+"""
+Measure the memory used by the streaming voter export as the export grows.
+
+Runs in a scratch copy of the database, fills it with synthetic voters for
+each requested size and exports every voter through the export view in each
+format, reading the streamed response the way a WSGI server would. For each
+run the peak resident set size above the starting RSS is reported (Linux
+only, using /proc/self/clear_refs to reset the high-water mark), next to the
+same export built as a single string, as a non-streaming response would be.
+
+Usage:
+    python manage.py benchmark_voter_export [--rows 1000 10000 100000 1000000]
+"""
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import reverse
+
+from voter_analytics.export import FORMATS
+from voter_analytics.synthetic import populate
+from voter_analytics.views import export_voters
+
+PROC_STATUS = Path('/proc/self/status')
+CLEAR_REFS = Path('/proc/self/clear_refs')
+
+
+def memory_kb(field):
+    """Return a memory figure such as VmRSS or VmHWM from /proc, in kB."""
+    for line in PROC_STATUS.read_text().splitlines():
+        if line.startswith(f'{field}:'):
+            return int(line.split()[1])
+    raise CommandError(f'{field} is missing from {PROC_STATUS}.')
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS (VmHWM) to the current RSS."""
+    CLEAR_REFS.write_text('5')
+
+
+class Command(BaseCommand):
+    help = 'Report peak RSS of the streaming voter export for growing synthetic voter tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000],
+                            help='Synthetic voter counts to export.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not (PROC_STATUS.exists() and CLEAR_REFS.exists()):
+            raise CommandError('Peak RSS is read from /proc, which needs Linux.')
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"{'rows':>10} {'format':<7} {'output MB':>10} {'seconds':>8} "
+                              f"{'streamed peak MB':>17} {'in-memory peak MB':>18}")
+            for rows in options['rows']:
+                populate(rows, seed=options['seed'])
+                for output in FORMATS:
+                    self.run(rows, output)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def export(self, output, consume):
+        """Export every voter, returning consume()'s result, seconds and peak RSS growth in MB."""
+        request = RequestFactory().get(reverse('voter_export'), {'output': output})
+        baseline = memory_kb('VmRSS')
+        reset_peak_rss()
+        started = time.perf_counter()
+        response = export_voters(request)
+        result = consume(response.streaming_content)
+        elapsed = time.perf_counter() - started
+        peak = (memory_kb('VmHWM') - baseline) / 1024
+        response.close()
+        return result, elapsed, peak
+
+    def run(self, rows, output):
+        # Stream chunks out without keeping them, like a WSGI server
+        size, elapsed, streamed_peak = self.export(output, lambda chunks: sum(len(chunk) for chunk in chunks))
+        # The same export held in memory at once
+        _, _, buffered_peak = self.export(output, lambda chunks: len(b''.join(chunks)))
+        self.stdout.write(f'{rows:>10,} {output:<7} {size / 2**20:10.1f} {elapsed:8.2f} '
+                          f'{streamed_peak:17.1f} {buffered_peak:18.1f}')
@@ -0,0 +1,105 @@
+"""
+Benchmark every VoterFilterForm combination against synthetic voters.
+
+Runs in a scratch copy of the database (the same one the test runner would
+create), fills it with synthetic voters and, for each of the 2^9 filter
+combinations, times the first voter list page and the matching count, and
+prints the indexes SQLite chose. Any full table scan is reported at the end.
+
+Usage:
+    python manage.py benchmark_voter_filters [--rows 1000000] [--plans]
+"""
+import re
+import time
+from itertools import combinations
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from voter_analytics.forms import VoterFilterForm
+from voter_analytics.models import ELECTIONS, Voter
+from voter_analytics.synthetic import populate
+from voter_analytics.views import VoterListView
+
+# Value used for each filter when it is part of a combination
+FILTER_VALUES = {
+    'party_affiliation': 'R',
+    'min_birth_year': '1950',
+    'max_birth_year': '1990',
+    'voter_score': '3',
+    **{election: 'on' for election in ELECTIONS},
+}
+
+SHORT_NAMES = {
+    'party_affiliation': 'party',
+    'min_birth_year': 'min_year',
+    'max_birth_year': 'max_year',
+    'voter_score': 'score',
+}
+
+INDEX_RE = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+FULL_SCAN_RE = re.compile(rf'SCAN {Voter._meta.db_table}$', re.MULTILINE)
+
+
+def filter_combinations():
+    """Yield every subset of the VoterFilterForm filters as GET-style data."""
+    names = list(FILTER_VALUES)
+    for size in range(len(names) + 1):
+        for combo in combinations(names, size):
+            yield {name: FILTER_VALUES[name] for name in combo}
+
+
+def timed(func):
+    """Run func() and return its result and the elapsed milliseconds."""
+    started = time.perf_counter()
+    result = func()
+    return result, 1000 * (time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = 'Time every VoterFilterForm combination against synthetic voters in a scratch database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic voters to generate.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--plans', action='store_true', help='Print the full query plans.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write('Query plans are only parsed for SQLite; timings are still reported.')
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            _, elapsed = timed(lambda: populate(options['rows'], seed=options['seed']))
+            self.stdout.write(f"Generated {options['rows']:,} synthetic voters in {elapsed / 1000:.1f}s.")
+            self.run(options['plans'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, show_plans):
+        full_scans = []
+        self.stdout.write(f"{'filters':<55} {'page ms':>8} {'count ms':>9} {'rows':>9}  indexes")
+        for data in filter_combinations():
+            queryset = VoterFilterForm(data).filter_queryset(Voter.objects.all())
+            page = queryset.order_by(*VoterListView.ordering)[:VoterListView.paginate_by + 1]
+
+            _, page_ms = timed(lambda: list(page))
+            count, count_ms = timed(queryset.count)
+            # The count only needs primary keys, like SELECT COUNT(*) does
+            plans = [page.explain(), queryset.order_by().values('pk').explain()]
+
+            label = '+'.join(SHORT_NAMES.get(name, name) for name in data) or '(no filters)'
+            indexes = sorted({name for plan in plans for name in INDEX_RE.findall(plan)})
+            self.stdout.write(f"{label:<55} {page_ms:8.1f} {count_ms:9.1f} {count:9,}  {', '.join(indexes)}")
+            if show_plans:
+                for plan in plans:
+                    self.stdout.write('    ' + plan.replace('\n', '\n    '))
+            if any(FULL_SCAN_RE.search(plan) for plan in plans):
+                full_scans.append(label)
+
+        if full_scans:
+            self.stdout.write(self.style.ERROR(f'{len(full_scans)} combinations scan the whole voter table:'))
+            for label in full_scans:
+                self.stdout.write(f'    {label}')
+        else:
+            self.stdout.write(self.style.SUCCESS('Every filter combination uses an index.'))
@@ -0,0 +1,78 @@
+"""
+Time voter list searches against synthetic voters.
+
+Runs in a scratch copy of the database, fills it with synthetic voters (which
+also builds the FTS5 search index) and times the first voter list page for a
+range of search terms, alone and combined with the other filters.
+
+Usage:
+    python manage.py benchmark_voter_search [--rows 1000000] [--repeat 5] [--plans]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from voter_analytics.forms import VoterSearchForm
+from voter_analytics.models import Voter
+from voter_analytics.synthetic import populate
+from voter_analytics.views import VoterListView
+
+SEARCHES = ['smi', 'smith12', 'wei chen', 'mary walnut', 'beacon 02459', 'wei', 'zzz', 'j']
+FILTERS = {
+    '': {},
+    'party': {'party_affiliation': 'R'},
+    'score+elections': {'voter_score': '3', 'v20state': 'on', 'v22general': 'on'},
+    'years': {'min_birth_year': '1950', 'max_birth_year': '1990'},
+}
+# Searches on every keystroke should come back within this
+TARGET_MS = 10
+
+
+class Command(BaseCommand):
+    help = 'Time voter name/address searches against synthetic voters in a scratch database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic voters to generate.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per search; the fastest is reported.')
+        parser.add_argument('--plans', action='store_true', help='Print the query plans.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            started = time.perf_counter()
+            populate(options['rows'], seed=options['seed'])
+            self.stdout.write(f"Generated {options['rows']:,} synthetic voters in {time.perf_counter() - started:.1f}s.")
+            self.run(options['repeat'], options['plans'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, repeat, show_plans):
+        slow = []
+        self.stdout.write(f"{'search':<14} {'filters':<16} {'page ms':>8} {'rows':>5}")
+        for text in SEARCHES:
+            for label, filters in FILTERS.items():
+                form = VoterSearchForm({'q': text, **filters})
+                if not form.is_valid():
+                    raise CommandError(f'Invalid search {text!r} {filters}: {form.errors}')
+                queryset = form.filter_queryset(Voter.objects.all())
+                ordering = VoterListView().get_keyset_fields(queryset)
+                page = queryset.order_by(*ordering)[:VoterListView.paginate_by + 1]
+
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    rows = len(page.all())
+                    timings.append(1000 * (time.perf_counter() - started))
+                best = min(timings)
+                self.stdout.write(f'{text:<14} {label or "-":<16} {best:8.1f} {rows:5}')
+                if show_plans:
+                    self.stdout.write('    ' + page.explain().replace('\n', '\n    '))
+                if best > TARGET_MS:
+                    slow.append(f'{text} {label}'.strip())
+
+        if slow:
+            self.stdout.write(self.style.ERROR(f'{len(slow)} searches took over {TARGET_MS} ms: {", ".join(slow)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Every search returned its first page within {TARGET_MS} ms.'))
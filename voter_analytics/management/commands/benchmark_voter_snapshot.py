@@ -0,0 +1,116 @@
+"""
+Benchmark the voter graphs computed through the ORM against the NumPy snapshot.
+
+Runs in a scratch copy of the database, fills it with synthetic voters for
+each requested size and times every chart of the graphs page three ways: SQL
+over the Voter table, SQL over the VoterRollup table the page uses by
+default, and vectorized masks over the columnar snapshot. Each is timed for
+a few filter sets and the results are checked against each other.
+
+Usage:
+    python manage.py benchmark_voter_snapshot [--rows 100000 1000000] [--repeat 5]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Sum, Value
+
+from voter_analytics import snapshot
+from voter_analytics.aggregates import election_sums
+from voter_analytics.forms import VoterFilterForm
+from voter_analytics.models import Voter, VoterRollup
+from voter_analytics.synthetic import populate
+
+FILTER_SETS = {
+    '(no filters)': {},
+    'party': {'party_affiliation': 'D'},
+    'years+score': {'min_birth_year': '1950', 'max_birth_year': '1990', 'voter_score': '2'},
+    'party+elections': {'party_affiliation': 'R', 'v20state': 'on', 'v22general': 'on'},
+}
+
+
+def orm_charts(queryset, weight):
+    """Return a function per chart computing it with one SQL query, each row counting `weight`."""
+    return {
+        'birth_year': lambda: {
+            row['birth_year']: row['n']
+            for row in queryset.values('birth_year').annotate(n=Sum(weight)).order_by('birth_year')
+        },
+        'party': lambda: {
+            row['party_affiliation']: row['n']
+            for row in queryset.values('party_affiliation').annotate(n=Sum(weight)).order_by('-n', 'party_affiliation')
+        },
+        'elections': lambda: queryset.aggregate(**election_sums(weight)),
+    }
+
+
+def snapshot_charts(voters, cleaned_data):
+    """Return a function per chart computing it from the snapshot."""
+    return {
+        'birth_year': lambda: voters.birth_year_counts(voters.select(cleaned_data)),
+        'party': lambda: voters.party_counts(voters.select(cleaned_data)),
+        'elections': lambda: voters.election_counts(voters.select(cleaned_data)),
+    }
+
+
+def best_of(func, repeat):
+    """Return func()'s result and its fastest run in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(1000 * (time.perf_counter() - started))
+    return result, min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Compare ORM and NumPy snapshot timings for every voter graph in a scratch database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000],
+                            help='Synthetic voter counts to benchmark.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per timing; the fastest is reported.')
+
+    def handle(self, *args, **options):
+        if not snapshot.available():
+            raise CommandError('NumPy is required for the voter snapshot.')
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for rows in options['rows']:
+                self.run(rows, options['seed'], options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, rows, seed, repeat):
+        _, populate_ms = best_of(lambda: populate(rows, seed=seed), 1)
+        voters, build_ms = best_of(snapshot.VoterSnapshot.build, 1)
+        megabytes = sum(getattr(voters, name).nbytes for name in snapshot.COLUMNS) / 2**20
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{rows:,} voters'))
+        self.stdout.write(
+            f'Generated in {populate_ms / 1000:.1f}s; snapshot built in {build_ms:.0f} ms ({megabytes:.1f} MB).'
+        )
+        self.stdout.write(f"{'filters':<18} {'chart':<11} {'voter ms':>9} {'rollup ms':>10} {'snapshot ms':>12} {'speedup':>8}")
+
+        for label, data in FILTER_SETS.items():
+            form = VoterFilterForm(data)
+            if not form.is_valid():
+                raise CommandError(f'Invalid filters {data}: {form.errors}')
+            paths = {
+                'voter': orm_charts(form.filter_queryset(Voter.objects.all()), Value(1)),
+                'rollup': orm_charts(form.filter_queryset(VoterRollup.objects.all()), F('count')),
+                'snapshot': snapshot_charts(voters, form.cleaned_data),
+            }
+            for chart in paths['snapshot']:
+                results, timings = {}, {}
+                for path, charts in paths.items():
+                    results[path], timings[path] = best_of(charts[chart], repeat)
+                if not results['voter'] == results['rollup'] == results['snapshot']:
+                    raise CommandError(f'{chart} chart differs between paths for {label}.')
+                fastest_sql = min(timings['voter'], timings['rollup'])
+                self.stdout.write(
+                    f"{label:<18} {chart:<11} {timings['voter']:9.1f} {timings['rollup']:10.1f} "
+                    f"{timings['snapshot']:12.2f} {fastest_sql / timings['snapshot']:7.1f}x"
+                )
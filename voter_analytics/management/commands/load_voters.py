@@ -0,0 +1,269 @@
+"""
+Bulk load the Newton voter file into the Voter table.
+
+The CSV is streamed in fixed-size chunks and every chunk is written with a
+single bulk_create, all inside one transaction, instead of one INSERT per row.
+
+With --incremental the table is not wiped: rows are matched to existing
+voters on their natural key (name, date of birth, address) and a hash of the
+remaining fields, so unchanged voters keep their row and primary key, changed
+voters are updated in batches, new voters are inserted and voters missing from
+the file are deleted. As with duplicate rows in the file, the first voter
+stored under a natural key is kept and any others are deleted.
+
+The monthly RegistrationMonth counts behind the registration trends are
+rebuilt by a full load, while an incremental load only adjusts the buckets of
+the voters it inserts, updates or deletes. Either way the VoterRollup table
+behind the graphs page, the Household table behind the precinct walk lists
+and the voter search index are rebuilt at the end, the cached analytics of every web worker are
+invalidated and, when NumPy is installed, a columnar snapshot of the new data
+is written for the workers.
+
+The read-only analytics replica (see voter_analytics/replica.py) is copied
+from the main database once the load commits and has bumped the generation,
+so the workers read the main database until the copy is in place.
+
+Usage:
+    python manage.py load_voters [newton_voters.csv] [--batch-size 5000] [--incremental]
+"""
+import csv
+import hashlib
+import time
+from collections import Counter
+from datetime import date
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from voter_analytics import replica, snapshot
+from voter_analytics.cache import bump_generation
+from voter_analytics.search import rebuild_search_index
+from voter_analytics.models import (
+    ELECTION_BITS, ELECTIONS, NATURAL_KEY, TRACKED_FIELDS, VALID_PARTIES, Household, RegistrationMonth, Voter,
+    VoterRollup,
+    household_key,
+)
+
+# CSV header for each Voter field
+COLUMNS = {
+    'first_name': 'First Name',
+    'last_name': 'Last Name',
+    'street_number': 'Residential Address - Street Number',
+    'street_name': 'Residential Address - Street Name',
+    'apartment_number': 'Residential Address - Apartment Number',
+    'zip_code': 'Residential Address - Zip Code',
+    'date_of_birth': 'Date of Birth',
+    'date_of_registration': 'Date of Registration',
+    'party_affiliation': 'Party Affiliation',
+    'precinct_number': 'Precinct Number',
+    **{election: election for election in ELECTIONS},
+}
+
+
+def read_chunks(reader, size):
+    """Yield lists of at most `size` raw rows from a csv reader."""
+    while chunk := list(islice(reader, size)):
+        yield chunk
+
+
+def natural_key(voter):
+    """Return the tuple identifying a voter across reloads."""
+    return tuple(getattr(voter, field) for field in NATURAL_KEY)
+
+
+def row_hash(voter):
+    """Return a short fingerprint of the fields that can change for a voter."""
+    values = '\x1f'.join(str(getattr(voter, field)) for field in TRACKED_FIELDS)
+    return hashlib.blake2b(values.encode(), digest_size=16).hexdigest()
+
+
+def make_row_parser(header):
+    """Return a function turning a raw CSV row (a list) into a Voter."""
+    try:
+        index = {field: header.index(column) for field, column in COLUMNS.items()}
+    except ValueError as e:
+        raise CommandError(f"Voter file is missing a column: {e}")
+
+    first, last = index['first_name'], index['last_name']
+    number, street = index['street_number'], index['street_name']
+    apartment, zip_code = index['apartment_number'], index['zip_code']
+    dob, registered = index['date_of_birth'], index['date_of_registration']
+    party, precinct = index['party_affiliation'], index['precinct_number']
+    elections = [(index[election], bit) for election, bit in ELECTION_BITS.items()]
+    parse_date = date.fromisoformat
+
+    def parse(row):
+        votes = [bit for i, bit in elections if row[i].strip().upper() == 'TRUE']
+        # Map non-listed parties to 'O' (Other)
+        party_code = row[party].strip()
+        if party_code not in VALID_PARTIES:
+            party_code = 'O'
+        birth_date = parse_date(row[dob].strip())
+        address = (row[number].strip(), row[street].strip(), row[apartment].strip() or None, row[zip_code].strip())
+        voter = Voter(
+            first_name=row[first].strip(),
+            last_name=row[last].strip(),
+            street_number=address[0],
+            street_name=address[1],
+            apartment_number=address[2],
+            zip_code=address[3],
+            date_of_birth=birth_date,
+            date_of_registration=parse_date(row[registered].strip()),
+            party_affiliation=party_code,
+            precinct_number=int(row[precinct]),
+            election_mask=sum(votes),
+            voter_score=len(votes),
+            birth_year=birth_date.year,
+            household_key=household_key(*address),
+        )
+        voter.row_hash = row_hash(voter)
+        return voter
+
+    return parse
+
+
+class Command(BaseCommand):
+    help = 'Load voter records from the Newton voter CSV file using batched inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', nargs='?', default='newton_voters.csv')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of CSV rows parsed and inserted per chunk (default: 5000).',
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Update the existing table in place instead of deleting and reinserting every voter.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer.')
+
+        try:
+            f = open(options['filename'], 'r', encoding='utf-8', newline='')
+        except OSError as e:
+            raise CommandError(f"Could not open voter file: {e}")
+
+        started = time.perf_counter()
+        with f, transaction.atomic():
+            reader = csv.reader(f)
+            parse = make_row_parser(next(reader, []))
+            if options['incremental']:
+                counts = self.upsert(reader, parse, batch_size)
+                months = RegistrationMonth.apply_changes(self.registration_changes)
+            else:
+                deleted, _ = Voter.objects.all().delete()
+                counts = {'deleted': deleted, **self.load(reader, parse, batch_size)}
+                months = RegistrationMonth.rebuild()
+            rollups = VoterRollup.rebuild()
+            households = Household.rebuild()
+            rebuild_search_index()
+        if connection.vendor == 'sqlite':
+            # Refresh planner statistics so filters pick the right index
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        # Drop cached analytics built from the previous data in every worker
+        generation = bump_generation()
+        replica_size = replica.refresh_replica(generation) if replica.enabled() else None
+        if snapshot.available():
+            snapshot.write_snapshot(generation)
+        elapsed = time.perf_counter() - started
+
+        if skipped := counts.pop('skipped'):
+            self.stderr.write(f'Skipped {skipped} unparseable or duplicate rows.')
+        processed = sum(counts.values()) - counts['deleted']
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(', '.join(f'{name.capitalize()}: {count}' for name, count in counts.items()))
+        self.stdout.write(f'Rebuilt {rollups} voter rollup rows and {households} households.')
+        self.stdout.write(f"{'Adjusted' if options['incremental'] else 'Rebuilt'} {months} registration month buckets.")
+        if replica_size is not None:
+            self.stdout.write(f'Wrote the {replica_size / 2**20:,.1f} MB analytics replica.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. Processed {processed} Voter records in {elapsed:.1f}s ({rate:,.0f} rows/sec).'
+        ))
+
+    def parse_chunks(self, reader, parse, batch_size):
+        """Yield lists of parsed Voters, counting rows that fail to parse."""
+        for chunk in read_chunks(reader, batch_size):
+            voters = []
+            for row in chunk:
+                try:
+                    voters.append(parse(row))
+                except (ValueError, IndexError) as e:
+                    self.skipped += 1
+                    if self.verbosity > 1:
+                        self.stderr.write(f"Error processing row {row}: {e}")
+            yield voters
+
+    def load(self, reader, parse, batch_size):
+        """Insert every row of the CSV chunk by chunk."""
+        self.skipped = created = 0
+        for voters in self.parse_chunks(reader, parse, batch_size):
+            Voter.objects.bulk_create(voters, batch_size=batch_size)
+            created += len(voters)
+            if self.verbosity > 1:
+                self.stdout.write(f"Processed {created} records...")
+        return {'inserted': created, 'skipped': self.skipped}
+
+    def upsert(self, reader, parse, batch_size):
+        """Apply only the differences between the CSV and the current table."""
+        self.skipped = 0
+        counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+        # Registration bucket -> net change in voters, for RegistrationMonth
+        self.registration_changes = changes = Counter()
+        bucket = RegistrationMonth.bucket
+
+        # natural key -> [(pk, row_hash, registration bucket)] for every voter currently stored. A full
+        # load keeps duplicate rows, so one key can have several voters, oldest first
+        existing = {}
+        for pk, stored_hash, registered, party, precinct, *key in (
+            Voter.objects.order_by('pk').values_list(
+                'pk', 'row_hash', 'date_of_registration', 'party_affiliation', 'precinct_number', *NATURAL_KEY,
+            ).iterator(chunk_size=batch_size)
+        ):
+            existing.setdefault(tuple(key), []).append((pk, stored_hash, bucket(registered, party, precinct)))
+
+        seen = set()
+        for voters in self.parse_chunks(reader, parse, batch_size):
+            to_insert, to_update = [], []
+            for voter in voters:
+                key = natural_key(voter)
+                if key in seen:
+                    # Duplicate rows for one voter: the first occurrence wins
+                    self.skipped += 1
+                    continue
+                seen.add(key)
+                match, *duplicates = existing.pop(key, None) or [None]
+                if duplicates:
+                    # Like a duplicate row, the first voter stored wins; the others are deleted below
+                    existing[key] = duplicates
+                if match is None:
+                    to_insert.append(voter)
+                    changes[bucket(voter.date_of_registration, voter.party_affiliation, voter.precinct_number)] += 1
+                elif match[1] == voter.row_hash:
+                    counts['unchanged'] += 1
+                else:
+                    voter.pk = match[0]
+                    to_update.append(voter)
+                    changes[match[2]] -= 1
+                    changes[bucket(voter.date_of_registration, voter.party_affiliation, voter.precinct_number)] += 1
+            Voter.objects.bulk_create(to_insert, batch_size=batch_size)
+            Voter.objects.bulk_update(to_update, [*TRACKED_FIELDS, 'row_hash'], batch_size=batch_size)
+            counts['inserted'] += len(to_insert)
+            counts['updated'] += len(to_update)
+
+        # Whatever was not matched is no longer in the voter file, or duplicates a matched voter
+        stale = []
+        for voters in existing.values():
+            for pk, _, registered_bucket in voters:
+                stale.append(pk)
+                changes[registered_bucket] -= 1
+        for start in range(0, len(stale), batch_size):
+            Voter.objects.filter(pk__in=stale[start:start + batch_size]).delete()
+        counts['deleted'] = len(stale)
+        counts['skipped'] = self.skipped
+        return counts
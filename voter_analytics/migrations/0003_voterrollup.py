@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0002_voter_row_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoterRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('birth_year', models.IntegerField()),
+                ('party_affiliation', models.CharField(max_length=50)),
+                ('voter_score', models.IntegerField()),
+                ('v20state', models.BooleanField(default=False)),
+                ('v21town', models.BooleanField(default=False)),
+                ('v21primary', models.BooleanField(default=False)),
+                ('v22general', models.BooleanField(default=False)),
+                ('v23town', models.BooleanField(default=False)),
+                ('count', models.IntegerField()),
+            ],
+        ),
+    ]
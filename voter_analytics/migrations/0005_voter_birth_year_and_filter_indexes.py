@@ -0,0 +1,62 @@
+# Generated by Django 5.1.3 on 2026-10-18 11:49
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractYear
+
+
+def fill_birth_year(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    Voter.objects.update(birth_year=ExtractYear('date_of_birth'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0004_voter_name_order_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voter',
+            name='birth_year',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_birth_year, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='voter',
+            name='birth_year',
+            field=models.IntegerField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['party_affiliation', 'voter_score', 'birth_year'], name='voter_party_score_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['voter_score', 'birth_year'], name='voter_score_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['birth_year'], name='voter_birth_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(('v20state', True)), fields=['birth_year', 'v20state'], name='voter_v20state_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(('v21town', True)), fields=['birth_year', 'v21town'], name='voter_v21town_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(('v21primary', True)), fields=['birth_year', 'v21primary'], name='voter_v21primary_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(('v22general', True)), fields=['birth_year', 'v22general'], name='voter_v22general_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(('v23town', True)), fields=['birth_year', 'v23town'], name='voter_v23town_year_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:01
+
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+# Bit order of the election columns being folded into election_mask
+ELECTIONS = ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']
+
+
+def fill_election_mask(apps, schema_editor):
+    mask = sum(
+        Case(When(**{election: True}, then=Value(1 << i)), default=Value(0))
+        for i, election in enumerate(ELECTIONS)
+    )
+    for model in ['Voter', 'VoterRollup']:
+        apps.get_model('voter_analytics', model).objects.update(election_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0005_voter_birth_year_and_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voter',
+            name='election_mask',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='voterrollup',
+            name='election_mask',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_election_mask, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='voter',
+            name='voter_v20state_year_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='voter',
+            name='voter_v21town_year_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='voter',
+            name='voter_v21primary_year_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='voter',
+            name='voter_v22general_year_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='voter',
+            name='voter_v23town_year_idx',
+        ),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v20state',
+        ),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v21primary',
+        ),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v21town',
+        ),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v22general',
+        ),
+        migrations.RemoveField(
+            model_name='voter',
+            name='v23town',
+        ),
+        migrations.RemoveField(
+            model_name='voterrollup',
+            name='v20state',
+        ),
+        migrations.RemoveField(
+            model_name='voterrollup',
+            name='v21primary',
+        ),
+        migrations.RemoveField(
+            model_name='voterrollup',
+            name='v21town',
+        ),
+        migrations.RemoveField(
+            model_name='voterrollup',
+            name='v22general',
+        ),
+        migrations.RemoveField(
+            model_name='voterrollup',
+            name='v23town',
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['election_mask', 'birth_year'], name='voter_election_year_idx'),
+        ),
+    ]
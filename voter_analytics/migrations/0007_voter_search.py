@@ -0,0 +1,61 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:26
+
+import voter_analytics.models
+from django.db import migrations, models
+
+SEARCH_TABLE = 'voter_analytics_voter_search'
+ELECTIONS = ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other databases search with istartswith filters.
+    # load_voters rebuilds the table after every load (see voter_analytics.search).
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    columns = 'first_name, last_name, street_name, zip_code'
+    tags = " || ".join([
+        "'party' || party_affiliation",
+        "' score' || voter_score",
+        *[f"CASE WHEN election_mask & {1 << i} THEN ' {election}' ELSE '' END" for i, election in enumerate(ELECTIONS)],
+    ])
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        f"voter_id UNINDEXED, {columns}, tags, prefix='1 2 3 4 5 6 7 8')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {SEARCH_TABLE}(rowid, voter_id, {columns}, tags) "
+        f"SELECT ROW_NUMBER() OVER (ORDER BY last_name, first_name, id), id, {columns}, {tags} "
+        "FROM voter_analytics_voter"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0006_voter_election_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoterSearch',
+            fields=[
+                ('position', models.IntegerField(db_column='rowid', primary_key=True, serialize=False)),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('street_name', models.CharField(max_length=100)),
+                ('zip_code', models.CharField(max_length=10)),
+                ('tags', models.TextField()),
+                ('document', voter_analytics.models.SearchDocumentField(db_column='voter_analytics_voter_search')),
+            ],
+            options={
+                'db_table': 'voter_analytics_voter_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
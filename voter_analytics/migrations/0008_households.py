@@ -0,0 +1,69 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:49
+
+import re
+
+from django.db import migrations, models
+
+# Copy of voter_analytics.models.household_key as of this migration
+STREET_SUFFIXES = {
+    'STREET': 'ST', 'AVENUE': 'AVE', 'ROAD': 'RD', 'DRIVE': 'DR', 'LANE': 'LN',
+    'PLACE': 'PL', 'COURT': 'CT', 'TERRACE': 'TER', 'CIRCLE': 'CIR', 'PARKWAY': 'PKWY',
+}
+
+
+def _address_words(value):
+    return re.sub(r'[^\w\s]', ' ', value or '').upper().split()
+
+
+def household_key(street_number, street_name, apartment_number, zip_code):
+    street = [STREET_SUFFIXES.get(word, word) for word in _address_words(street_name)]
+    number = ''.join(_address_words(street_number))
+    digits = re.match(r'\d*', number).group()
+    unit = ''.join(word for word in _address_words(apartment_number) if word not in ('APT', 'UNIT'))
+    return '|'.join([zip_code.strip()[:5], ' '.join(street), digits.zfill(6) + number[len(digits):], unit])
+
+
+def fill_household_key(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    batch = []
+    fields = ['street_number', 'street_name', 'apartment_number', 'zip_code']
+    for voter in Voter.objects.only('pk', *fields).iterator(chunk_size=5000):
+        voter.household_key = household_key(*(getattr(voter, field) for field in fields))
+        batch.append(voter)
+        if len(batch) >= 5000:
+            Voter.objects.bulk_update(batch, ['household_key'])
+            batch = []
+    Voter.objects.bulk_update(batch, ['household_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0007_voter_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voter',
+            name='household_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=160),
+        ),
+        migrations.RunPython(fill_household_key, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Household',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=160, unique=True)),
+                ('precinct_number', models.IntegerField()),
+                ('street_number', models.CharField(max_length=20)),
+                ('street_name', models.CharField(max_length=100)),
+                ('apartment_number', models.CharField(blank=True, max_length=20, null=True)),
+                ('zip_code', models.CharField(max_length=10)),
+                ('members', models.IntegerField()),
+                ('total_score', models.IntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['precinct_number', 'key'], name='household_precinct_key_idx')],
+            },
+        ),
+    ]
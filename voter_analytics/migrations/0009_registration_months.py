@@ -0,0 +1,41 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:00
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def fill_registration_months(apps, schema_editor):
+    Voter = apps.get_model('voter_analytics', 'Voter')
+    RegistrationMonth = apps.get_model('voter_analytics', 'RegistrationMonth')
+    groups = (
+        Voter.objects
+        .values('party_affiliation', 'precinct_number', month=TruncMonth('date_of_registration'))
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    RegistrationMonth.objects.bulk_create(RegistrationMonth(**group) for group in groups)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0008_households'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('party_affiliation', models.CharField(max_length=50)),
+                ('precinct_number', models.IntegerField()),
+                ('count', models.IntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('month', 'party_affiliation', 'precinct_number'), name='registration_month_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(fill_registration_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:24
+
+import django.db.models.expressions
+import django.db.models.lookups
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voter_analytics', '0010_versions_cache_table'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='voter',
+            name='voter_election_year_idx',
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(django.db.models.lookups.Exact(django.db.models.expressions.CombinedExpression(models.F('election_mask'), '&', models.Value(1)), 1)), fields=['birth_year', 'election_mask'], name='voter_v20state_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(django.db.models.lookups.Exact(django.db.models.expressions.CombinedExpression(models.F('election_mask'), '&', models.Value(2)), 2)), fields=['birth_year', 'election_mask'], name='voter_v21town_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(django.db.models.lookups.Exact(django.db.models.expressions.CombinedExpression(models.F('election_mask'), '&', models.Value(4)), 4)), fields=['birth_year', 'election_mask'], name='voter_v21primary_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(django.db.models.lookups.Exact(django.db.models.expressions.CombinedExpression(models.F('election_mask'), '&', models.Value(8)), 8)), fields=['birth_year', 'election_mask'], name='voter_v22general_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(django.db.models.lookups.Exact(django.db.models.expressions.CombinedExpression(models.F('election_mask'), '&', models.Value(16)), 16)), fields=['birth_year', 'election_mask'], name='voter_v23town_year_idx'),
+        ),
+    ]
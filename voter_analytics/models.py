@@ -1,7 +1,90 @@
 # In voter_analytics/models.py:
-from django.db import models
+import re
+
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Lookup
+from django.db.models.functions import TruncMonth
 from datetime import datetime
 
+# Define valid party affiliations
+VALID_PARTIES = {
+    'D': 'Democratic',
+    'R': 'Republican',
+    'CC': 'Constitution Party',
+    'L': 'Libertarian Party',
+    'T': 'Tea Party',
+    'O': 'Other',
+    'G': 'Green Party',
+    'J': 'Independent Party',
+    'Q': 'Reform Party',
+    'FF': 'Freedom Party',
+    'U': 'Unafiliated'
+}
+
+# Elections in the voting history, keyed by their voter file column. Each
+# one is a bit of Voter.election_mask, in this order, so adding an election
+# only means appending it here and to ELECTION_CHART_LABELS.
+ELECTION_LABELS = {
+    'v20state': '2020 State Election',
+    'v21town': '2021 Town Election',
+    'v21primary': '2021 Primary',
+    'v22general': '2022 General',
+    'v23town': '2023 Town Election',
+}
+# Shorter names for the participation chart's x axis
+ELECTION_CHART_LABELS = {
+    'v20state': '2020 State',
+    'v21town': '2021 Town',
+    'v21primary': '2021 Primary',
+    'v22general': '2022 General',
+    'v23town': '2023 Town',
+}
+ELECTIONS = list(ELECTION_LABELS)
+ELECTION_BITS = {election: 1 << i for i, election in enumerate(ELECTIONS)}
+
+
+def voted_in(election):
+    """Return the (election_mask & bit) = bit condition of an election, as its partial index states it."""
+    bit = ELECTION_BITS[election]
+    return models.lookups.Exact(F('election_mask').bitand(bit), bit)
+
+
+# Fields identifying the same voter across reloads of the voter file
+NATURAL_KEY = [
+    'last_name', 'first_name', 'date_of_birth',
+    'street_number', 'street_name', 'apartment_number', 'zip_code',
+]
+
+# Fields that may change between reloads for the same voter
+TRACKED_FIELDS = ['date_of_registration', 'party_affiliation', 'precinct_number', 'election_mask', 'voter_score']
+
+# Common street suffixes, abbreviated the way the voter file mostly writes them
+STREET_SUFFIXES = {
+    'STREET': 'ST', 'AVENUE': 'AVE', 'ROAD': 'RD', 'DRIVE': 'DR', 'LANE': 'LN',
+    'PLACE': 'PL', 'COURT': 'CT', 'TERRACE': 'TER', 'CIRCLE': 'CIR', 'PARKWAY': 'PKWY',
+}
+
+
+def _address_words(value):
+    """Uppercase words of an address part, without punctuation."""
+    return re.sub(r'[^\w\s]', ' ', value or '').upper().split()
+
+
+def household_key(street_number, street_name, apartment_number, zip_code):
+    """
+    Normalize an address into the key shared by everyone living there.
+
+    The key reads zip|street|house number|unit with the house number
+    zero-padded, so sorting households by key walks each street in house
+    number order.
+    """
+    street = [STREET_SUFFIXES.get(word, word) for word in _address_words(street_name)]
+    number = ''.join(_address_words(street_number))
+    digits = re.match(r'\d*', number).group()
+    unit = ''.join(word for word in _address_words(apartment_number) if word not in ('APT', 'UNIT'))
+    return '|'.join([zip_code.strip()[:5], ' '.join(street), digits.zfill(6) + number[len(digits):], unit])
+
+
 class Voter(models.Model):
     """
     Store/represent data for a registered voter in Newton, MA.
@@ -22,123 +105,284 @@ class Voter(models.Model):
     party_affiliation = models.CharField(max_length=50)
     precinct_number = models.IntegerField()
     
-    # Voting History
-    v20state = models.BooleanField(default=False)
-    v21town = models.BooleanField(default=False)
-    v21primary = models.BooleanField(default=False)
-    v22general = models.BooleanField(default=False)
-    v23town = models.BooleanField(default=False)
-    
-    # Derived Field
+    # Voting History: one ELECTION_BITS bit per election voted in. The
+    # v20state ... v23town attributes read and set single bits.
+    election_mask = models.IntegerField(default=0)
+
+    # Derived Fields
     voter_score = models.IntegerField()
+    # Stored so year filters can use an index instead of wrapping
+    # date_of_birth in a function; kept in step by save() and load_voters
+    birth_year = models.IntegerField(editable=False)
+
+    # Normalized address shared by a household (see household_key)
+    household_key = models.CharField(max_length=160, default='', editable=False, db_index=True)
+
+    # Fingerprint of the non-key fields, used to skip unchanged rows on reload
+    row_hash = models.CharField(max_length=32, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the voter list seeks on this ordering
+            models.Index(fields=['last_name', 'first_name', 'id'], name='voter_name_order_idx'),
+            # VoterFilterForm combinations: equality filters lead, the
+            # birth year range comes last
+            models.Index(fields=['party_affiliation', 'voter_score', 'birth_year'], name='voter_party_score_year_idx'),
+            models.Index(fields=['voter_score', 'birth_year'], name='voter_score_year_idx'),
+            models.Index(fields=['birth_year'], name='voter_birth_year_idx'),
+            # One partial index per election: each checked election is its
+            # own voted_in() term, so SQLite can pick the rarest election's
+            # index, seek the birth year range in it and test the other
+            # bits without touching the table
+            *[
+                models.Index(
+                    fields=['birth_year', 'election_mask'], condition=models.Q(voted_in(election)),
+                    name=f'voter_{election}_year_idx',
+                )
+                for election in ELECTIONS
+            ],
+        ]
 
     def __str__(self):
         """Return a string representation of this voter."""
         return f"{self.first_name} {self.last_name} - {self.street_name}"
 
+    def save(self, *args, **kwargs):
+        """Keep the derived birth_year and household_key in step with the voter's details."""
+        self.birth_year = self.date_of_birth.year
+        self.household_key = household_key(self.street_number, self.street_name, self.apartment_number, self.zip_code)
+        super().save(*args, **kwargs)
 
-def load_data():
-    """Function to load voter data records from CSV file into Django model instances."""
-    # First, delete existing records to prevent duplicates
-    Voter.objects.all().delete()
-    print("Deleted existing records.")
-    
-    import csv
-    from datetime import datetime
-    
-    # Define valid party affiliations
-    VALID_PARTIES = {
-        'D': 'Democratic',
-        'R': 'Republican',
-        'CC': 'Constitution Party',
-        'L': 'Libertarian Party',
-        'T': 'Tea Party',
-        'O': 'Other',
-        'G': 'Green Party',
-        'J': 'Independent Party',
-        'Q': 'Reform Party',
-        'FF': 'Freedom Party',
-        'U': 'Unafiliated'
-    }
-    
-    filename = 'newton_voters.csv'
-    count = 0
-    print("Starting to load data...")
-    
-    with open(filename, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        print("CSV Headers:", reader.fieldnames)
-        
-        for row in reader:
-            try:
-                # Debug print first row
-                if count == 0:
-                    print("First row data:", row)
-                
-                # Convert date strings to datetime objects
-                dob = datetime.strptime(row['Date of Birth'], '%Y-%m-%d').date()
-                reg_date = datetime.strptime(row['Date of Registration'], '%Y-%m-%d').date()
-                
-                # Convert election participation to boolean values
-                v20state = str(row['v20state']).strip().upper() == 'TRUE'
-                v21town = str(row['v21town']).strip().upper() == 'TRUE'
-                v21primary = str(row['v21primary']).strip().upper() == 'TRUE'
-                v22general = str(row['v22general']).strip().upper() == 'TRUE'
-                v23town = str(row['v23town']).strip().upper() == 'TRUE'
-                
-                # Debug print for first row
-                if count == 0:
-                    print("Parsed election data for first row:")
-                    print(f"v20state: {row['v20state']} -> {v20state}")
-                    print(f"v21town: {row['v21town']} -> {v21town}")
-                    print(f"v21primary: {row['v21primary']} -> {v21primary}")
-                    print(f"v22general: {row['v22general']} -> {v22general}")
-                    print(f"v23town: {row['v23town']} -> {v23town}")
-                
-                # Calculate voter score
-                calculated_score = sum([v20state, v21town, v21primary, v22general, v23town])
-                provided_score = int(row['voter_score']) if 'voter_score' in row else calculated_score
-                
-                if count == 0:
-                    print(f"Calculated score: {calculated_score}, Provided score: {provided_score}")
-                
-                # Handle party affiliation - map non-listed parties to 'O' (Other)
-                party = row['Party Affiliation'].strip()
-                if party not in VALID_PARTIES:
-                    party = 'O'
-                
-                voter = Voter(
-                    first_name=row['First Name'].strip(),
-                    last_name=row['Last Name'].strip(),
-                    street_number=row['Residential Address - Street Number'].strip(),
-                    street_name=row['Residential Address - Street Name'].strip(),
-                    apartment_number=row['Residential Address - Apartment Number'].strip() if row['Residential Address - Apartment Number'] else None,
-                    zip_code=row['Residential Address - Zip Code'].strip(),
-                    date_of_birth=dob,
-                    date_of_registration=reg_date,
-                    party_affiliation=party,
-                    precinct_number=int(row['Precinct Number']),
-                    
-                    # Store boolean values for election participation
-                    v20state=v20state,
-                    v21town=v21town,
-                    v21primary=v21primary,
-                    v22general=v22general,
-                    v23town=v23town,
-                    
-                    # Use calculated score
-                    voter_score=calculated_score
-                )
-                
-                voter.save()
-                count += 1
-                
-                if count % 1000 == 0:
-                    print(f"Processed {count} records...")
-                    
-            except Exception as e:
-                print(f"Error processing row: {row}")
-                print(f"Error message: {str(e)}")
-                continue
-    
-    print(f'Done. Created {count} Voter records.')
\ No newline at end of file
+    @property
+    def voting_history(self):
+        """Return (election label, voted) pairs in election order."""
+        return [(label, bool(self.election_mask & ELECTION_BITS[election]))
+                for election, label in ELECTION_LABELS.items()]
+
+
+def _election_flag(bit):
+    """Return a boolean property reading and writing one election_mask bit."""
+    def get(self):
+        return bool(self.election_mask & bit)
+
+    def set(self, voted):
+        self.election_mask = self.election_mask | bit if voted else self.election_mask & ~bit
+
+    return property(get, set)
+
+
+# Voter(v20state=True) and voter.v20state keep working on top of the mask
+for _election, _bit in ELECTION_BITS.items():
+    setattr(Voter, _election, _election_flag(_bit))
+
+
+class VoterRollup(models.Model):
+    """
+    Precomputed voter counts for every combination of the graph filters.
+
+    Rebuilt at the end of each voter load so the graphs page can sum a few
+    thousand rollup rows instead of scanning the Voter table.
+    """
+    birth_year = models.IntegerField()
+    party_affiliation = models.CharField(max_length=50)
+    voter_score = models.IntegerField()
+    election_mask = models.IntegerField(default=0)
+
+    count = models.IntegerField()
+
+    def __str__(self):
+        """Return a string representation of this rollup row."""
+        return f"{self.birth_year} {self.party_affiliation} score {self.voter_score}: {self.count}"
+
+    @classmethod
+    def rebuild(cls):
+        """Replace all rollup rows with fresh counts from the Voter table."""
+        groups = (
+            Voter.objects
+            .values('birth_year', 'party_affiliation', 'voter_score', 'election_mask')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        with transaction.atomic():
+            cls.objects.all().delete()
+            rollups = cls.objects.bulk_create(cls(**group) for group in groups)
+        return len(rollups)
+
+
+class RegistrationMonth(models.Model):
+    """
+    Voters registered in each month, by party and precinct.
+
+    A full voter load rebuilds it; an incremental load only adjusts the
+    buckets of the voters it inserts, updates or deletes (see apply_changes),
+    so registration trends never read the Voter table.
+    """
+    # First day of the month
+    month = models.DateField()
+    party_affiliation = models.CharField(max_length=50)
+    precinct_number = models.IntegerField()
+
+    count = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'party_affiliation', 'precinct_number'], name='registration_month_bucket_unique',
+            ),
+        ]
+
+    def __str__(self):
+        """Return a string representation of this registration bucket."""
+        return f"{self.month:%Y-%m} {self.party_affiliation} precinct {self.precinct_number}: {self.count}"
+
+    @staticmethod
+    def bucket(date_of_registration, party_affiliation, precinct_number):
+        """Return the (month, party, precinct) bucket a voter is counted in."""
+        return (date_of_registration.replace(day=1), party_affiliation, precinct_number)
+
+    @classmethod
+    def rebuild(cls):
+        """Replace all buckets with fresh counts from the Voter table."""
+        groups = (
+            Voter.objects
+            .values('party_affiliation', 'precinct_number', month=TruncMonth('date_of_registration'))
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        with transaction.atomic():
+            cls.objects.all().delete()
+            buckets = cls.objects.bulk_create(cls(**group) for group in groups)
+        return len(buckets)
+
+    @classmethod
+    def apply_changes(cls, changes):
+        """
+        Add a {bucket: change in voters} mapping to the stored counts.
+
+        Only the months named in `changes` are read; buckets left empty are
+        deleted. Returns the number of buckets changed.
+        """
+        changes = {bucket: change for bucket, change in changes.items() if change}
+        if not changes:
+            return 0
+        with transaction.atomic():
+            stored = {
+                cls.bucket(row.month, row.party_affiliation, row.precinct_number): row
+                for row in cls.objects.filter(month__in={month for month, _, _ in changes})
+            }
+            to_create, to_update, to_delete = [], [], []
+            for (month, party, precinct), change in changes.items():
+                row = stored.get((month, party, precinct))
+                if row is None:
+                    to_create.append(cls(month=month, party_affiliation=party, precinct_number=precinct, count=change))
+                elif row.count + change > 0:
+                    row.count += change
+                    to_update.append(row)
+                else:
+                    to_delete.append(row.pk)
+            cls.objects.bulk_create(to_create)
+            cls.objects.bulk_update(to_update, ['count'])
+            cls.objects.filter(pk__in=to_delete).delete()
+        return len(changes)
+
+
+class Household(models.Model):
+    """
+    Everyone registered at one address, with their combined turnout.
+
+    Rebuilt at the end of each voter load so precinct walk lists can page
+    through households in street order without grouping the Voter table.
+    """
+    key = models.CharField(max_length=160, unique=True)
+    precinct_number = models.IntegerField()
+    street_number = models.CharField(max_length=20)
+    street_name = models.CharField(max_length=100)
+    apartment_number = models.CharField(max_length=20, null=True, blank=True)
+    zip_code = models.CharField(max_length=10)
+    members = models.IntegerField()
+    # Elections voted in, summed over the members
+    total_score = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            # Walk lists page through a precinct in key (street) order
+            models.Index(fields=['precinct_number', 'key'], name='household_precinct_key_idx'),
+        ]
+
+    def __str__(self):
+        """Return a string representation of this household."""
+        return f"{self.street_number} {self.street_name} ({self.members} voters)"
+
+    @property
+    def turnout(self):
+        """Share of the possible votes the members cast, from 0 to 1."""
+        return self.total_score / (self.members * len(ELECTIONS))
+
+    @classmethod
+    def rebuild(cls):
+        """Replace all households with one INSERT ... SELECT over the Voter table."""
+        quote = connection.ops.quote_name
+        columns = ['key', 'precinct_number', 'street_number', 'street_name', 'apartment_number',
+                   'zip_code', 'members', 'total_score']
+        sql = (
+            f"INSERT INTO {quote(cls._meta.db_table)} ({', '.join(map(quote, columns))}) "
+            f"SELECT household_key, MIN(precinct_number), MIN(street_number), MIN(street_name), "
+            f"MIN(apartment_number), MIN(zip_code), COUNT(*), SUM(voter_score) "
+            f"FROM {quote(Voter._meta.db_table)} GROUP BY household_key"
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cls.objects.all().delete()
+            cursor.execute(sql)
+            return cursor.rowcount
+
+
+class SearchDocumentField(models.TextField):
+    """The hidden column of an FTS5 table that full-text queries MATCH against."""
+
+
+@SearchDocumentField.register_lookup
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class VoterSearch(models.Model):
+    """
+    A voter's row in the SQLite FTS5 search index over names and addresses.
+
+    The table is created by migration and rebuilt by load_voters (see
+    search.py). Its rowid is the voter's position in name order, so search
+    results come out of the index already sorted like the voter list.
+    """
+    position = models.IntegerField(primary_key=True, db_column='rowid')
+    voter = models.OneToOneField(Voter, on_delete=models.DO_NOTHING, related_name='search_entry', db_constraint=False)
+    first_name = models.CharField(max_length=100)
+    last_name = models.CharField(max_length=100)
+    street_name = models.CharField(max_length=100)
+    zip_code = models.CharField(max_length=10)
+    # Party, score and election tokens for the equality filters
+    tags = models.TextField()
+    # Named after the table, as FTS5 requires for matching every column
+    document = SearchDocumentField(db_column='voter_analytics_voter_search')
+
+    class Meta:
+        managed = False
+        db_table = 'voter_analytics_voter_search'
+
+    def __str__(self):
+        """Return a string representation of this index row."""
+        return f"{self.position}: {self.last_name}, {self.first_name}"
+
+
+def load_data(filename='newton_voters.csv'):
+    """Function to load voter data records from CSV file into Django model instances.
+
+    Kept for use from the Django shell; the work is done by the bulk
+    `manage.py load_voters` command.
+    """
+    from django.core.management import call_command
+    call_command('load_voters', filename)
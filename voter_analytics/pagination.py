@@ -0,0 +1,150 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of LIMIT/OFFSET, each page seeks past the sort key of the last row of
+the previous page, so with an index on the ordering columns page 1,000 costs
+the same as page 1. Cursors are opaque URL-safe tokens holding that sort key.
+"""
+import base64
+import json
+from functools import cached_property
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404
+
+from cs412.pagination import COUNT_TIMEOUT, cached_count
+
+
+def encode_cursor(values):
+    """Encode a row's sort key as a URL-safe token."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, length):
+    """Decode a cursor token back into a sort key, or raise Http404."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise Http404("Invalid page cursor.")
+    if not isinstance(values, list) or len(values) != length:
+        raise Http404("Invalid page cursor.")
+    return values
+
+
+def seek(fields, values, forward=True):
+    """
+    Build the filter selecting rows strictly after (or before) a sort key.
+
+    For fields (a, b, c) this is the expanded row comparison
+    a > A OR (a = A AND b > B) OR (a = A AND b = B AND c > C),
+    with an extra a >= A so the database can range-scan the index.
+    """
+    op = 'gt' if forward else 'lt'
+    condition = Q()
+    for i, field in enumerate(fields):
+        equal = {f: v for f, v in zip(fields[:i], values[:i])}
+        condition |= Q(**equal, **{f'{field}__{op}': values[i]})
+    bound = 'gte' if forward else 'lte'
+    return Q(**{f'{fields[0]}__{bound}': values[0]}) & condition
+
+
+class KeysetPage:
+    """One page of results with cursors to the neighbouring pages."""
+
+    def __init__(self, object_list, fields, has_next, has_previous):
+        self.object_list = object_list
+        self.fields = fields
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _cursor(self, obj):
+        return encode_cursor([getattr(obj, field) for field in self.fields])
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self._cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self._cursor(self.object_list[0])
+        return None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking on a unique, ascending ordering.
+
+    `fields` must end with a unique column (normally 'id') so every row has a
+    distinct sort key, and should match an index on the table. With a
+    `count_key` (see cs412.pagination.count_key) the count is kept in the
+    cache, and a first page holding every row stores it without counting.
+    """
+
+    def __init__(self, queryset, fields, per_page, count_key=None):
+        self.queryset = queryset
+        self.fields = list(fields)
+        self.per_page = per_page
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        """Total number of rows; only computed when asked for."""
+        if self.count_key is None:
+            return self.queryset.count()
+        return cached_count(self.queryset, self.count_key)
+
+    @property
+    def known_count(self):
+        """The total number of rows if it is cached, otherwise None."""
+        if 'count' in self.__dict__:
+            return self.count
+        if self.count_key is not None:
+            return cache.get(self.count_key)
+        return None
+
+    def page(self, after=None, before=None):
+        """Return the page following the `after` cursor or preceding `before`."""
+        queryset = self.queryset.order_by(*self.fields)
+        if before:
+            values = decode_cursor(before, len(self.fields))
+            queryset = queryset.filter(seek(self.fields, values, forward=False))
+            queryset = queryset.order_by(*[f'-{field}' for field in self.fields])
+        elif after:
+            values = decode_cursor(after, len(self.fields))
+            queryset = queryset.filter(seek(self.fields, values))
+
+        # Fetch one extra row to learn whether another page follows
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if not (after or before or has_more):
+            # The first page holds every row, so this is the count
+            self.count = len(rows)
+            if self.count_key is not None:
+                cache.set(self.count_key, self.count, timeout=COUNT_TIMEOUT)
+
+        if before:
+            rows.reverse()
+            return KeysetPage(rows, self.fields, has_next=bool(rows), has_previous=has_more)
+        return KeysetPage(rows, self.fields, has_next=has_more, has_previous=bool(after))
@@ -0,0 +1,93 @@
+"""
+Read-only replica of the database for the voter analytics.
+
+The voter data only changes when `manage.py load_voters` runs, but the main
+SQLite file also takes the project and mini_fb writes, and an analytics query
+waits whenever one of them holds the write lock. After every load the whole
+database is copied with SQLite's backup API into a temporary file, which then
+replaces VOTER_REPLICA_PATH in one rename, so a reader sees either the old
+copy or the new one and never a half-written file.
+
+The "analytics" database alias opens the replica read-only with immutable=1,
+telling SQLite the file never changes so it takes no locks, and with a large
+mmap_size so its pages are read straight from the OS page cache, which every
+web worker shares. Connections are reopened per request (CONN_MAX_AGE), so
+they pick up a new replica on the next request after a load.
+
+Each copy records the voter data generation it was taken at (see cache.py)
+next to the generation itself in the "versions" cache. AnalyticsReplicaRouter
+(see routers.py) sends voter_analytics reads to the replica only while the
+two match and VOTER_ANALYTICS_REPLICA is on, and reads the main database
+otherwise: after row edits and migrations, which bump the generation, until
+the next load copies the replica again. The router also reads the main
+database inside a transaction on it, which reads its own writes. A scratch
+database created by a benchmark command has a cache table of its own with
+no copy recorded, so it is never answered from the real replica either.
+"""
+import os
+import sqlite3
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.transaction import TransactionManagementError
+
+from cs412.caches import versions_cache
+
+from .cache import GENERATION_KEY
+
+REPLICA_ALIAS = 'analytics'
+REPLICA_GENERATION_KEY = 'voter_analytics:replica_generation'
+
+
+def enabled():
+    """Return whether voter_analytics reads go to the replica when it exists."""
+    return (
+        getattr(settings, 'VOTER_ANALYTICS_REPLICA', False)
+        and REPLICA_ALIAS in settings.DATABASES
+        and connections[DEFAULT_DB_ALIAS].vendor == 'sqlite'
+    )
+
+
+def replica_path():
+    """Return the replica's SQLite file."""
+    return Path(getattr(settings, 'VOTER_REPLICA_PATH', settings.BASE_DIR / 'analytics_replica.sqlite3'))
+
+
+def available():
+    """Return whether voter_analytics reads can be answered from the replica, which needs it to be current."""
+    if not enabled():
+        return False
+    # One cache lookup, without touching the replica file
+    generations = versions_cache().get_many([GENERATION_KEY, REPLICA_GENERATION_KEY])
+    return generations.get(REPLICA_GENERATION_KEY) == generations.get(GENERATION_KEY, 0)
+
+
+def refresh_replica(generation=None):
+    """
+    Copy the main database into a new replica file and swap it in; returns the new file's size in bytes.
+
+    The router only reads the copy once it is recorded as taken at the
+    current voter data `generation`.
+    """
+    path = replica_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{path.name}.tmp')
+    tmp.unlink(missing_ok=True)
+    source = connections[DEFAULT_DB_ALIAS]
+    if source.in_atomic_block:
+        # The backup would wait forever on this connection's own uncommitted writes
+        raise TransactionManagementError('The analytics replica can only be copied outside a transaction.')
+    source.ensure_connection()
+    target = sqlite3.connect(tmp)
+    try:
+        source.connection.backup(target)
+        # A WAL copy could not be opened read-only without its -shm file
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+    # Readers that still have the old file open keep reading it until they close
+    os.replace(tmp, path)
+    if generation is not None:
+        versions_cache().set(REPLICA_GENERATION_KEY, generation, timeout=None)
+    return path.stat().st_size
@@ -0,0 +1,36 @@
+"""
+Database routers for voter_analytics.
+
+AnalyticsReplicaRouter sends voter_analytics reads to the read-only replica
+written by load_voters while it is current (see replica.py).
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import replica
+
+
+class AnalyticsReplicaRouter:
+    """Read voter_analytics models from the replica; write everything to the main database."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'voter_analytics':
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Inside a transaction (load_voters, row edits, migrations) read what it wrote
+            return None
+        return replica.REPLICA_ALIAS if replica.available() else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS if model._meta.app_label == 'voter_analytics' else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the main database, so rows from either relate
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, replica.REPLICA_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica.REPLICA_ALIAS:
+            # Replaced whole by refresh_replica, never migrated
+            return False
+        return None
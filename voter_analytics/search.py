@@ -0,0 +1,105 @@
+"""
+Full-text search over voter names and addresses.
+
+On SQLite the voters are indexed in an FTS5 table (the unmanaged VoterSearch
+model, created by migration 0007) over first name, last name, street name and
+zip code, with prefix indexes so every word typed matches as a prefix: "smi
+wal" finds Smith on Walnut St. Prefixes of up to 8 characters are indexed;
+longer ones still work but make FTS5 merge every matching term first. load_voters rebuilds the table after every
+load, numbering the rows in voter list order (last name, first name, id), so
+a search reads matches from the index already sorted and stops after a page
+instead of collecting and sorting every match.
+
+The index also has a tags column with one token per value of the equality
+filters (party, voter score, each election voted in), so a search combined
+with those filters is narrowed inside the index rather than by checking
+every matching voter row.
+
+Other databases fall back to istartswith filters.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import ELECTION_BITS, ELECTIONS, Voter, VoterSearch
+
+SEARCH_FIELDS = ['first_name', 'last_name', 'street_name', 'zip_code']
+
+WORD_RE = re.compile(r'\w+')
+
+
+def has_search_index():
+    """Return whether the database supports the FTS5 search index."""
+    return connection.vendor == 'sqlite'
+
+
+def filter_tags(cleaned_data):
+    """Return the tags column tokens for VoterFilterForm's equality filters."""
+    tags = []
+    if party := cleaned_data.get('party_affiliation'):
+        tags.append(f'party{party}')
+    if score := cleaned_data.get('voter_score'):
+        tags.append(f'score{score}')
+    tags.extend(election for election in ELECTIONS if cleaned_data.get(election))
+    return tags
+
+
+def match_expression(words, tags=()):
+    """Build an FTS5 query matching every word as a prefix and every tag exactly."""
+    # Quoting each word keeps FTS5 operators and punctuation out of the query
+    columns = ' '.join(SEARCH_FIELDS)
+    return ' AND '.join([
+        *[f'{{{columns}}} : "{word}"*' for word in words],
+        *[f'tags : "{tag}"' for tag in tags],
+    ])
+
+
+def search_voters(queryset, text, tags=()):
+    """
+    Filter a Voter queryset to voters matching every word of `text`.
+
+    `tags` (see filter_tags) repeat filters already applied to the queryset
+    so the index can skip voters they exclude. With the search index the
+    result is annotated with search_rank, the voter's position in name
+    order, to page through the matches by.
+    """
+    words = WORD_RE.findall(text)
+    if not words:
+        return queryset
+    if not has_search_index():
+        for word in words:
+            queryset = queryset.filter(reduce(or_, (Q(**{f'{field}__istartswith': word}) for field in SEARCH_FIELDS)))
+        return queryset
+    return (
+        queryset
+        .filter(search_entry__document__match=match_expression(words, tags))
+        .annotate(search_rank=F('search_entry__position'))
+    )
+
+
+def rebuild_search_index():
+    """Replace the search index with the current voters, numbered in name order."""
+    if not has_search_index():
+        return
+    table = connection.ops.quote_name(VoterSearch._meta.db_table)
+    columns = ', '.join(SEARCH_FIELDS)
+    tags = " || ".join([
+        "'party' || party_affiliation",
+        "' score' || voter_score",
+        *[f"CASE WHEN election_mask & {bit} THEN ' {election}' ELSE '' END" for election, bit in ELECTION_BITS.items()],
+    ])
+    with connection.cursor() as cursor:
+        # Recreating the table is much faster than deleting every row from it
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5("
+            f"voter_id UNINDEXED, {columns}, tags, prefix='1 2 3 4 5 6 7 8')"
+        )
+        cursor.execute(
+            f'INSERT INTO {table}(rowid, voter_id, {columns}, tags) '
+            f'SELECT ROW_NUMBER() OVER (ORDER BY last_name, first_name, id), id, {columns}, {tags} '
+            f'FROM {connection.ops.quote_name(Voter._meta.db_table)}'
+        )
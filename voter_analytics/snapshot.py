@@ -0,0 +1,209 @@
+"""
+Columnar, NumPy-backed snapshot of the Voter table.
+
+The voter data only changes when `manage.py load_voters` runs, so the columns
+the analytics need (birth year, party, precinct, score and election mask) can
+be held as typed arrays and filtered with vectorized boolean masks instead of
+SQL. load_voters writes one snapshot per voter data generation to
+VOTER_SNAPSHOT_DIR as .npy files; each web worker memory-maps the one for the
+current generation, so workers share the pages through the OS page cache.
+Without a file for the current generation the worker builds its own copy
+from the database.
+
+NumPy is a deployment dependency (see the Pipfile), but the code does not
+require it: without it available() is False and get_snapshot() returns None,
+so callers fall back to the ORM and the cohort statistics endpoint answers
+501.
+"""
+import json
+import os
+import shutil
+import threading
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+
+from .cache import get_generation
+from .models import ELECTION_BITS, Voter
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - e.g. a checkout without the Pipfile's packages
+    np = None
+
+# Snapshot column -> (Voter field, array dtype)
+COLUMNS = {
+    'birth_year': ('birth_year', 'int16'),
+    'party': ('party_affiliation', 'uint8'),
+    'precinct': ('precinct_number', 'int16'),
+    'voter_score': ('voter_score', 'int8'),
+    'election_mask': ('election_mask', 'uint32'),
+}
+
+CHUNK_SIZE = 100_000
+
+
+def available():
+    """Return whether NumPy is installed."""
+    return np is not None
+
+
+def snapshot_dir():
+    """Return the directory holding one snapshot subdirectory per generation."""
+    return Path(getattr(settings, 'VOTER_SNAPSHOT_DIR', settings.BASE_DIR / 'voter_snapshot'))
+
+
+class VoterSnapshot:
+    """Typed arrays of the Voter columns the analytics filter and count on."""
+
+    def __init__(self, generation, parties, columns):
+        self.generation = generation
+        # Party codes index into this list; party arrays hold the codes
+        self.parties = list(parties)
+        self.party_codes = {party: code for code, party in enumerate(self.parties)}
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.birth_year)
+
+    @classmethod
+    def build(cls, generation=None):
+        """Read the Voter table into a new snapshot."""
+        fields = [field for field, _ in COLUMNS.values()]
+        rows = Voter.objects.order_by().values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+        parties = {}
+        chunks = {name: [] for name in COLUMNS}
+        while chunk := list(islice(rows, CHUNK_SIZE)):
+            values = dict(zip(COLUMNS, zip(*chunk)))
+            values['party'] = [parties.setdefault(party, len(parties)) for party in values['party']]
+            for name, (_, dtype) in COLUMNS.items():
+                chunks[name].append(np.array(values[name], dtype=dtype))
+        columns = {
+            name: np.concatenate(arrays) if arrays else np.empty(0, dtype=COLUMNS[name][1])
+            for name, arrays in chunks.items()
+        }
+        return cls(generation, parties, columns)
+
+    @classmethod
+    def load(cls, path, generation=None):
+        """Memory-map a snapshot written by save()."""
+        path = Path(path)
+        parties = json.loads((path / 'parties.json').read_text())
+        columns = {name: np.load(path / f'{name}.npy', mmap_mode='r') for name in COLUMNS}
+        return cls(generation, parties, columns)
+
+    def save(self, path):
+        """Write the snapshot to a new directory, replacing it atomically."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.tmp-{os.getpid()}')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        (tmp / 'parties.json').write_text(json.dumps(self.parties))
+        for name in COLUMNS:
+            np.save(tmp / f'{name}.npy', getattr(self, name))
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # Another process already wrote this generation
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def select(self, cleaned_data):
+        """Return a boolean mask of the voters matching VoterFilterForm data."""
+        selected = np.ones(len(self), dtype=bool)
+        if party := cleaned_data.get('party_affiliation'):
+            if party not in self.party_codes:
+                return np.zeros(len(self), dtype=bool)
+            selected &= self.party == self.party_codes[party]
+        if min_year := cleaned_data.get('min_birth_year'):
+            selected &= self.birth_year >= int(min_year)
+        if max_year := cleaned_data.get('max_birth_year'):
+            selected &= self.birth_year <= int(max_year)
+        if score := cleaned_data.get('voter_score'):
+            selected &= self.voter_score == int(score)
+        bits = sum(bit for election, bit in ELECTION_BITS.items() if cleaned_data.get(election))
+        if bits:
+            selected &= (self.election_mask & bits) == bits
+        return selected
+
+    def birth_year_counts(self, selected):
+        """Return {birth year: voters} for the selected voters, sorted by year."""
+        years = self.birth_year[selected]
+        if not len(years):
+            return {}
+        low = int(years.min())
+        counts = np.bincount(years - low)
+        return {low + int(i): int(counts[i]) for i in np.flatnonzero(counts)}
+
+    def party_counts(self, selected):
+        """Return {party: voters} for the selected voters, largest party first."""
+        counts = np.bincount(self.party[selected], minlength=len(self.parties))
+        parties = {self.parties[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+        return dict(sorted(parties.items(), key=lambda item: (-item[1], item[0])))
+
+    def election_counts(self, selected):
+        """Return {election: voters who voted in it} for the selected voters."""
+        masks = self.election_mask[selected]
+        return {election: int(np.count_nonzero(masks & bit)) for election, bit in ELECTION_BITS.items()}
+
+    def crosstab(self, rows, columns, selected=None):
+        """
+        Count the selected voters for every pair of values of two columns.
+
+        Returns (row values, column values, counts) where counts[i, j] is the
+        number of voters with the i-th row value and j-th column value.
+        """
+        a, b = getattr(self, rows), getattr(self, columns)
+        if selected is not None:
+            a, b = a[selected], b[selected]
+        row_values, row_index = np.unique(a, return_inverse=True)
+        column_values, column_index = np.unique(b, return_inverse=True)
+        counts = np.bincount(
+            row_index * len(column_values) + column_index,
+            minlength=len(row_values) * len(column_values),
+        ).reshape(len(row_values), len(column_values))
+        return row_values, column_values, counts
+
+    def summarize(self, cleaned_data):
+        """Return the same summary as aggregates.summarize() for VoterFilterForm data."""
+        selected = self.select(cleaned_data)
+        return {
+            'birth_years': self.birth_year_counts(selected),
+            'parties': self.party_counts(selected),
+            'elections': self.election_counts(selected),
+            'total': int(np.count_nonzero(selected)),
+        }
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def write_snapshot(generation):
+    """Build a snapshot of the current voter data and save it for `generation`."""
+    snapshot = VoterSnapshot.build(generation)
+    snapshot.save(snapshot_dir() / str(generation))
+    # Older generations are no longer read; workers still mapping them keep
+    # their open files until they reload
+    for path in snapshot_dir().iterdir():
+        if path.name != str(generation) and not path.name.startswith(f'{generation}.tmp'):
+            shutil.rmtree(path, ignore_errors=True)
+    return snapshot
+
+
+def get_snapshot():
+    """Return this worker's snapshot of the current voter data, or None without NumPy."""
+    global _snapshot
+    if np is None:
+        return None
+    generation = get_generation()
+    with _lock:
+        if _snapshot is None or _snapshot.generation != generation:
+            path = snapshot_dir() / str(generation)
+            if path.is_dir():
+                _snapshot = VoterSnapshot.load(path, generation)
+            else:
+                _snapshot = VoterSnapshot.build(generation)
+        return _snapshot
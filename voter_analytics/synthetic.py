@@ -0,0 +1,87 @@
+"""
+Synthetic voter data for the voter_analytics benchmarks.
+
+Rows roughly follow the shape of the Newton voter file (party mix, ages,
+turnout) and are written with raw executemany batches, so a million voters
+can be generated in seconds. Only use this against a scratch database.
+"""
+import random
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import ELECTION_BITS, ELECTIONS, Household, RegistrationMonth, Voter, VoterRollup, household_key
+from .search import rebuild_search_index
+
+PARTY_WEIGHTS = {'U': 55, 'D': 33, 'R': 9, 'L': 1, 'G': 1, 'O': 1}
+# Share of voters who took part in each election
+TURNOUT = dict(zip(ELECTIONS, [0.75, 0.35, 0.15, 0.6, 0.3]))
+
+FIRST_NAMES = ['JAMES', 'MARY', 'JOHN', 'PATRICIA', 'ROBERT', 'JENNIFER', 'MICHAEL', 'LINDA',
+               'DAVID', 'ELIZABETH', 'WEI', 'PRIYA', 'CARLOS', 'SOFIA', 'AHMED', 'YUKI']
+LAST_NAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'GARCIA', 'MILLER', 'DAVIS',
+              'CHEN', 'PATEL', 'KIM', 'NGUYEN', 'COHEN', 'OBRIEN', 'MURPHY', 'ROSSI']
+STREETS = ['WALNUT ST', 'BEACON ST', 'CENTRE ST', 'COMMONWEALTH AVE', 'WASHINGTON ST',
+           'HIGHLAND AVE', 'CHESTNUT ST', 'LOWELL AVE', 'BOYLSTON ST', 'ADAMS ST']
+ZIP_CODES = ['02458', '02459', '02460', '02461', '02462', '02464', '02465', '02466', '02467', '02468']
+
+
+def synthetic_rows(count, seed=0):
+    """Yield dicts of Voter column values for `count` synthetic voters."""
+    rng = random.Random(seed)
+    parties = rng.choices(list(PARTY_WEIGHTS), weights=PARTY_WEIGHTS.values(), k=count)
+    for i in range(count):
+        born = date(rng.randint(1925, 2005), rng.randint(1, 12), rng.randint(1, 28))
+        registered = date(rng.randint(max(born.year + 18, 1960), 2023), rng.randint(1, 12), rng.randint(1, 28))
+        votes = [ELECTION_BITS[election] for election, share in TURNOUT.items() if rng.random() < share]
+        address = (str(rng.randint(1, 400)), rng.choice(STREETS),
+                   rng.choice([None, None, None, '1', '2', '3B']), rng.choice(ZIP_CODES))
+        yield {
+            'first_name': rng.choice(FIRST_NAMES),
+            # Suffix keeps surnames varied enough to look like a real roll
+            'last_name': f'{rng.choice(LAST_NAMES)}{i % 997}',
+            'street_number': address[0],
+            'street_name': address[1],
+            'apartment_number': address[2],
+            'zip_code': address[3],
+            'date_of_birth': born,
+            'date_of_registration': registered,
+            'party_affiliation': parties[i],
+            # Precincts are geographic, so everyone at an address shares one
+            'precinct_number': 1 + (STREETS.index(address[1]) * len(ZIP_CODES) + ZIP_CODES.index(address[3])) % 32,
+            'election_mask': sum(votes),
+            'voter_score': len(votes),
+            'birth_year': born.year,
+            'household_key': household_key(*address),
+            'row_hash': '',
+        }
+
+
+def populate(count, seed=0, batch_size=20000):
+    """Replace the Voter table with `count` synthetic voters and rebuild the derived tables."""
+    fields = [field for field in Voter._meta.concrete_fields if not field.primary_key]
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f'INSERT INTO {connection.ops.quote_name(Voter._meta.db_table)} ({columns}) VALUES ({placeholders})'
+
+    def prepare(value):
+        # Dates go in as ISO strings, like Django stores them
+        return value.isoformat() if isinstance(value, date) else value
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        Voter.objects.all().delete()
+        batch = []
+        for row in synthetic_rows(count, seed):
+            batch.append(tuple(prepare(row[field.attname]) for field in fields))
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+        VoterRollup.rebuild()
+        RegistrationMonth.rebuild()
+        Household.rebuild()
+        rebuild_search_index()
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
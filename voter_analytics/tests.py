@@ -0,0 +1,740 @@
+import csv
+import importlib
+import io
+import json
+import sqlite3
+import tempfile
+import types
+import unittest
+import unittest.mock
+from datetime import date
+
+import plotly.graph_objects as go
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import Http404
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.transaction import TransactionManagementError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cs412.pagination import CachedCountPaginator, bump_table_version, table_version
+
+from .aggregates import summarize_rollups, summarize_voters
+from . import cohorts, replica, snapshot
+from .cache import bump_generation, chart_cache, get_generation
+from .forms import VoterFilterForm, party_choices
+from .pagination import KeysetPaginator, encode_cursor
+from .search import rebuild_search_index
+from .models import ELECTION_BITS, ELECTIONS, Household, RegistrationMonth, Voter, VoterRollup, household_key
+from .routers import AnalyticsReplicaRouter
+from .views import VoterGraphsView
+
+
+def election_mask_of(**votes):
+    """Return the election_mask of a voter who voted in the elections given as True."""
+    return sum(bit for election, bit in ELECTION_BITS.items() if votes.get(election))
+
+
+def make_voter(**fields):
+    """Create a Voter with sensible defaults for any field not given."""
+    votes = {election: fields.pop(election, False) for election in ELECTIONS}
+    defaults = {
+        'first_name': 'Pat',
+        'last_name': 'Smith',
+        'street_number': '1',
+        'street_name': 'WALNUT ST',
+        'zip_code': '02459',
+        'date_of_birth': date(1980, 1, 1),
+        'date_of_registration': date(2000, 1, 1),
+        'party_affiliation': 'D',
+        'precinct_number': 1,
+        'voter_score': sum(votes.values()),
+    }
+    return Voter.objects.create(**{**defaults, **votes, **fields})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class VoterGraphsViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        make_voter(date_of_birth=date(1950, 5, 1), party_affiliation='R', v20state=True)
+        make_voter(date_of_birth=date(1950, 6, 1), party_affiliation='D', v20state=True, v23town=True)
+        make_voter(date_of_birth=date(1990, 1, 1), party_affiliation='D', v22general=True)
+        make_voter(date_of_birth=date(2000, 1, 1), party_affiliation='U')
+        VoterRollup.rebuild()
+
+    def setUp(self):
+        chart_cache.clear()
+        party_choices.cache_clear()
+
+    def test_rollup_summary_matches_voter_table(self):
+        self.assertEqual(
+            summarize_rollups(VoterRollup.objects.all()),
+            summarize_voters(Voter.objects.all()),
+        )
+
+    def test_summary_contents(self):
+        summary = summarize_rollups(VoterRollup.objects.filter(party_affiliation='D'))
+        self.assertEqual(summary['total'], 2)
+        self.assertEqual(summary['birth_years'], {1950: 1, 1990: 1})
+        self.assertEqual(summary['parties'], {'D': 2})
+        self.assertEqual(summary['elections'], {
+            'v20state': 1, 'v21town': 0, 'v21primary': 0, 'v22general': 1, 'v23town': 1,
+        })
+
+    def test_graphs_query_budget(self):
+        # One query for the form's party choices, one for all chart data
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('graphs'))
+        self.assertNotIn('error', response.context)
+        # Party choices stay cached across requests and filter combinations
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('graphs'), {'party_affiliation': 'D', 'min_birth_year': '1950', 'v20state': 'on'},
+            )
+        self.assertNotIn('error', response.context)
+
+    def test_graphs_cache(self):
+        params = {'party_affiliation': 'D'}
+        self.client.get(reverse('graphs'), params)
+        # Cached graphs and party choices need no queries at all
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('graphs'), params)
+        self.assertEqual(response.context['voter_count'], 2)
+        self.assertEqual(chart_cache.stats()['hits'], 1)
+
+        # A voter load invalidates every cached graph and the party choices
+        bump_generation()
+        with self.assertNumQueries(2):
+            self.client.get(reverse('graphs'), params)
+
+    def test_graphs_filtered_count(self):
+        response = self.client.get(reverse('graphs'), {'max_birth_year': '1960', 'v20state': 'on'})
+        self.assertEqual(response.context['voter_count'], 2)
+
+    def test_election_filters_require_every_checked_election(self):
+        response = self.client.get(reverse('graphs'), {'v20state': 'on', 'v23town': 'on'})
+        self.assertEqual(response.context['voter_count'], 1)
+        response = self.client.get(reverse('voters'), {'v20state': 'on', 'v23town': 'on'})
+        self.assertEqual([voter.party_affiliation for voter in response.context['voters']], ['D'])
+
+    def test_voter_list_builds_form_once(self):
+        # Party choices come from the cache; only the page of voters is queried
+        self.client.get(reverse('voters'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('voters'), {'party_affiliation': 'D'})
+        self.assertEqual(len(response.context['voters']), 2)
+
+
+class VoterExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        VoterGraphsViewTests.setUpTestData()
+
+    def setUp(self):
+        party_choices.cache_clear()
+
+    def export(self, **params):
+        response = self.client.get(reverse('voter_export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export(output='csv', party_affiliation='D'))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['date_of_birth'], '1950-06-01')
+        self.assertEqual([rows[0][election] for election in ELECTIONS], ['True', 'False', 'False', 'False', 'True'])
+
+    def test_ndjson(self):
+        lines = self.export(output='ndjson', v20state='on').splitlines()
+        voters = [json.loads(line) for line in lines]
+        self.assertEqual(sorted(voter['party_affiliation'] for voter in voters), ['D', 'R'])
+        self.assertTrue(all(voter['v20state'] for voter in voters))
+
+    def test_rejects_bad_requests(self):
+        for params in [{'output': 'xml'}, {'voter_score': '99'}]:
+            response = self.client.get(reverse('voter_export'), params)
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class VoterSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        make_voter(first_name='Ann', last_name='Smith', street_name='WALNUT ST', party_affiliation='R')
+        make_voter(first_name='Bob', last_name='Smithers', street_name='BEACON ST', v20state=True)
+        make_voter(first_name='Cal', last_name='Jones', street_name='WALNUT ST', zip_code='02460')
+        make_voter(first_name='Dee', last_name='Smith', street_name='CENTRE ST', v20state=True)
+        VoterRollup.rebuild()
+        rebuild_search_index()
+
+    def setUp(self):
+        cache.clear()
+        party_choices.cache_clear()
+
+    def search(self, **params):
+        response = self.client.get(reverse('voters'), params)
+        return [voter.first_name for voter in response.context['voters']]
+
+    def test_prefix_match_in_name_order(self):
+        self.assertEqual(self.search(q='smi'), ['Ann', 'Dee', 'Bob'])
+        self.assertEqual(self.search(q='wal smi'), ['Ann'])
+        self.assertEqual(self.search(q='0246'), ['Cal'])
+        self.assertEqual(self.search(q='"smi*" OR'), [])
+
+    def test_combines_with_filters(self):
+        self.assertEqual(self.search(q='smi', v20state='on'), ['Dee', 'Bob'])
+        self.assertEqual(self.search(q='smi', party_affiliation='R'), ['Ann'])
+        self.assertEqual(self.search(q='smi', party_affiliation='R', v20state='on'), [])
+
+    @unittest.mock.patch('voter_analytics.views.VoterListView.paginate_by', 2)
+    def test_pagination(self):
+        response = self.client.get(reverse('voters'), {'q': 'smi'})
+        page = response.context['page_obj']
+        self.assertEqual([voter.first_name for voter in page], ['Ann', 'Dee'])
+        self.assertEqual(self.search(q='smi', after=page.next_cursor), ['Bob'])
+
+
+class ElectionFilterIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Most voters turned out in 2022, few in the 2021 primary
+        Voter.objects.bulk_create(
+            Voter(
+                first_name='Pat', last_name=f'Smith{i}', street_number='1', street_name='WALNUT ST', zip_code='02459',
+                date_of_birth=date(1940 + i % 60, 1, 1), birth_year=1940 + i % 60, date_of_registration=date(2000, 1, 1),
+                party_affiliation='D', precinct_number=1, voter_score=0,
+                election_mask=election_mask_of(v22general=True, v21primary=i % 20 == 0),
+            )
+            for i in range(600)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def filtered(self, **data):
+        return VoterFilterForm(data).filter_queryset(Voter.objects.all())
+
+    def test_checked_elections_must_all_be_voted_in(self):
+        voters = self.filtered(v21primary='on', v22general='on')
+        self.assertEqual(voters.count(), 30)
+        self.assertFalse(self.filtered(v21primary='on', v20state='on').exists())
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_rarest_election_is_answered_from_its_partial_index(self):
+        plan = self.filtered(v21primary='on', v22general='on', min_birth_year='1960', max_birth_year='1970').explain()
+        self.assertIn('voter_v21primary_year_idx (birth_year>? AND birth_year<?)', plan)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachedCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['Ann', 'Bob', 'Cal', 'Dee', 'Eve']:
+            make_voter(first_name=name, party_affiliation='R' if name == 'Eve' else 'D')
+        VoterRollup.rebuild()
+
+    def setUp(self):
+        cache.clear()
+        party_choices.cache_clear()
+
+    @unittest.mock.patch('voter_analytics.views.VoterListView.paginate_by', 2)
+    def test_voter_count_is_cached_until_the_next_load(self):
+        response = self.client.get(reverse('voters'), {'party_affiliation': 'D'})
+        self.assertIsNone(response.context['voter_count'])
+        self.client.get(reverse('voters'), {'party_affiliation': 'D', 'count': '1'})
+        # Later pages show the cached count without counting again
+        after = response.context['page_obj'].next_cursor
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('voters'), {'party_affiliation': 'D', 'after': after})
+        self.assertEqual(response.context['voter_count'], 4)
+
+        bump_generation()
+        response = self.client.get(reverse('voters'), {'party_affiliation': 'D'})
+        self.assertIsNone(response.context['voter_count'])
+
+    @unittest.mock.patch('voter_analytics.views.VoterListView.paginate_by', 2)
+    def test_uncounted_total_is_only_bounded_on_the_first_page(self):
+        response = self.client.get(reverse('voters'), {'party_affiliation': 'D'})
+        self.assertContains(response, 'More than 2 matching voters')
+        response = self.client.get(
+            reverse('voters'), {'party_affiliation': 'D', 'after': response.context['page_obj'].next_cursor},
+        )
+        self.assertNotContains(response, 'More than')
+        self.assertContains(response, 'Count matching voters')
+
+    def test_single_page_gives_the_count(self):
+        response = self.client.get(reverse('voters'), {'party_affiliation': 'R'})
+        self.assertEqual(response.context['voter_count'], 1)
+
+    def test_paginator_falls_back_to_at_least(self):
+        voters = Voter.objects.order_by('first_name')
+        paginator = CachedCountPaginator(voters, 2, count_key='test-count')
+        with self.assertNumQueries(1):
+            page = paginator.page(1)
+        self.assertEqual([voter.first_name for voter in page], ['Ann', 'Bob'])
+        self.assertTrue(page.has_next())
+        self.assertFalse(paginator.exact)
+        self.assertEqual(paginator.num_pages, 2)
+
+        # Reaching the last page reveals, and caches, the exact count
+        paginator = CachedCountPaginator(voters, 2, count_key='test-count')
+        self.assertEqual([voter.first_name for voter in paginator.page(3)], ['Eve'])
+        self.assertTrue(paginator.exact)
+        paginator = CachedCountPaginator(voters, 2, count_key='test-count')
+        with self.assertNumQueries(0):
+            self.assertEqual((paginator.count, paginator.num_pages), (5, 3))
+
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 10}},
+        'versions': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache_versions'},
+    })
+    def test_versions_survive_culling_of_the_default_cache(self):
+        generation = bump_generation()
+        version = bump_table_version(Voter)
+        for i in range(100):
+            cache.set(f'filler-{i}', i)
+        self.assertEqual(get_generation(), generation)
+        self.assertEqual(table_version(Voter), version)
+
+    def test_migration_creates_the_versions_table(self):
+        migration = importlib.import_module('voter_analytics.migrations.0010_versions_cache_table')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE cache_versions')
+        migration.create_cache_table(None, types.SimpleNamespace(connection=connection))
+        self.assertIn('cache_versions', connection.introspection.table_names())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class KeysetPaginatorTests(TestCase):
+    fields = ['last_name', 'first_name', 'id']
+
+    @classmethod
+    def setUpTestData(cls):
+        # Ties on last name, and on both names, so every sort field decides some order
+        for last_name, first_name in [('Smith', 'Ann'), ('Adams', 'Bob'), ('Smith', 'Ann'), ('Young', 'Cal'),
+                                      ('Smith', 'Dee'), ('Adams', 'Bob'), ('Brown', 'Eve')]:
+            make_voter(last_name=last_name, first_name=first_name, party_affiliation='D')
+        make_voter(last_name='Zhou', party_affiliation='R')
+        VoterRollup.rebuild()
+
+    def setUp(self):
+        cache.clear()
+        party_choices.cache_clear()
+
+    def pk_list(self, page):
+        return [voter.pk for voter in page]
+
+    def test_pages_forward_and_back(self):
+        expected = list(Voter.objects.order_by(*self.fields).values_list('pk', flat=True))
+        paginator = KeysetPaginator(Voter.objects.all(), self.fields, 3)
+        first = paginator.page()
+        self.assertEqual(self.pk_list(first), expected[:3])
+        self.assertEqual((first.has_next(), first.has_previous(), first.previous_cursor), (True, False, None))
+        middle = paginator.page(after=first.next_cursor)
+        self.assertEqual(self.pk_list(middle), expected[3:6])
+        self.assertEqual((middle.has_next(), middle.has_previous()), (True, True))
+        last = paginator.page(after=middle.next_cursor)
+        self.assertEqual(self.pk_list(last), expected[6:])
+        self.assertEqual((last.has_next(), last.has_previous(), last.next_cursor), (False, True, None))
+
+        # Back again, each page in ascending order
+        back = paginator.page(before=last.previous_cursor)
+        self.assertEqual(self.pk_list(back), expected[3:6])
+        self.assertEqual((back.has_next(), back.has_previous()), (True, True))
+        back = paginator.page(before=back.previous_cursor)
+        self.assertEqual(self.pk_list(back), expected[:3])
+        self.assertEqual((back.has_next(), back.has_previous()), (True, False))
+        # Nothing comes before the first row
+        first_voter = Voter.objects.get(pk=expected[0])
+        empty = paginator.page(before=encode_cursor([first_voter.last_name, first_voter.first_name, first_voter.pk]))
+        self.assertEqual((len(empty), empty.has_next(), empty.has_previous()), (0, False, False))
+
+    def test_first_page_with_every_row_stores_the_count(self):
+        paginator = KeysetPaginator(Voter.objects.filter(party_affiliation='D'), self.fields, 10, count_key='test-count')
+        self.assertIsNone(paginator.known_count)
+        page = paginator.page()
+        self.assertFalse(page.has_other_pages())
+        self.assertEqual(cache.get('test-count'), 7)
+        with self.assertNumQueries(0):
+            self.assertEqual(KeysetPaginator(Voter.objects.all(), self.fields, 10, count_key='test-count').known_count, 7)
+
+    def test_invalid_cursors(self):
+        paginator = KeysetPaginator(Voter.objects.all(), self.fields, 3)
+        for cursor in ['!!!', 'bm90IGpzb24', encode_cursor({'last_name': 'Smith'}), encode_cursor(['Smith', 1])]:
+            for direction in ['after', 'before']:
+                with self.assertRaises(Http404):
+                    paginator.page(**{direction: cursor})
+        self.assertEqual(self.client.get(reverse('voters'), {'after': 'bm90IGpzb24'}).status_code, 404)
+
+    @unittest.mock.patch('voter_analytics.views.VoterListView.paginate_by', 3)
+    def test_links_keep_the_filters(self):
+        response = self.client.get(reverse('voters'), {'party_affiliation': 'D', 'count': '1'})
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'href="?party_affiliation=D&after={next_cursor}"')
+
+        response = self.client.get(reverse('voters'), {'party_affiliation': 'D', 'after': next_cursor})
+        page = response.context['page_obj']
+        self.assertContains(response, f'href="?party_affiliation=D&before={page.previous_cursor}"')
+        self.assertContains(response, f'href="?party_affiliation=D&after={page.next_cursor}"')
+        self.assertNotIn('Zhou', [voter.last_name for voter in page])
+
+
+class HouseholdTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        make_voter(first_name='Ann', street_number='12', street_name='Walnut Street', v20state=True, v21town=True)
+        make_voter(first_name='Bob', street_number='12', street_name='WALNUT ST.', v20state=True)
+        make_voter(first_name='Cal', street_number='9', street_name='WALNUT ST', apartment_number='Apt 2')
+        make_voter(first_name='Dee', street_number='9', street_name='WALNUT ST', apartment_number='2', zip_code='02459-1234')
+        make_voter(first_name='Eve', street_number='100', street_name='WALNUT ST', precinct_number=2)
+        Household.rebuild()
+
+    def test_household_key_normalizes_addresses(self):
+        self.assertEqual(household_key('12a', 'walnut street', 'Unit 3', '02459'), '02459|WALNUT ST|000012A|3')
+        self.assertEqual(household_key('12', 'Walnut St.', None, '02459 '), '02459|WALNUT ST|000012|')
+
+    def test_rebuild_groups_voters_by_address(self):
+        households = {(h.street_number, h.apartment_number): (h.members, h.total_score) for h in Household.objects.all()}
+        self.assertEqual(households, {('12', None): (2, 3), ('9', '2'): (2, 0), ('100', None): (1, 0)})
+
+    def test_walk_list_in_street_order(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('households', args=[1]))
+        households = response.context['households']
+        self.assertEqual([h.street_number for h in households], ['9', '12'])
+        self.assertEqual([v.first_name for v in households[1].voters], ['Ann', 'Bob'])
+        self.assertEqual(households[1].turnout, 3 / (2 * len(ELECTIONS)))
+
+
+class AnalyticsReplicaTests(TransactionTestCase):
+    # The backup only sees committed data, so these tests can't run inside a transaction
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = f'{tmp.name}/replica.sqlite3'
+        settings = self.settings(
+            VOTER_ANALYTICS_REPLICA=True, VOTER_REPLICA_PATH=self.path,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+
+    def replica_voters(self):
+        with sqlite3.connect(f'file:{self.path}?mode=ro&immutable=1', uri=True) as replica_db:
+            return replica_db.execute('SELECT first_name FROM voter_analytics_voter ORDER BY id').fetchall()
+
+    def test_refresh_replaces_read_only_copy(self):
+        make_voter(first_name='Ann')
+        replica.refresh_replica()
+        self.assertEqual(self.replica_voters(), [('Ann',)])
+
+        make_voter(first_name='Bob')
+        replica.refresh_replica()
+        self.assertEqual(self.replica_voters(), [('Ann',), ('Bob',)])
+        with self.assertRaises(sqlite3.OperationalError):
+            with sqlite3.connect(f'file:{self.path}?mode=ro', uri=True) as replica_db:
+                replica_db.execute('DELETE FROM voter_analytics_voter')
+
+        with transaction.atomic(), self.assertRaises(TransactionManagementError):
+            replica.refresh_replica()
+
+    def test_router_reads_analytics_from_replica(self):
+        router = AnalyticsReplicaRouter()
+        self.assertIsNone(router.db_for_read(Voter))
+        replica.refresh_replica(get_generation())
+        self.assertEqual(router.db_for_read(Voter), 'analytics')
+        self.assertIsNone(router.db_for_read(User))
+        self.assertEqual(router.db_for_write(Voter), 'default')
+        with transaction.atomic():
+            self.assertIsNone(router.db_for_read(Voter))
+        self.assertFalse(router.allow_migrate('analytics', 'voter_analytics'))
+        # One cache lookup per read, without opening or statting the replica
+        with unittest.mock.patch('pathlib.Path.stat') as stat, self.assertNumQueries(0):
+            router.db_for_read(Voter)
+        stat.assert_not_called()
+
+    def test_router_reads_main_database_until_the_replica_is_current(self):
+        router = AnalyticsReplicaRouter()
+        replica.refresh_replica(bump_generation())
+        self.assertEqual(router.db_for_read(Voter), 'analytics')
+
+        # A saved row bumps the generation once it commits
+        make_voter(first_name='Ann')
+        self.assertIsNone(router.db_for_read(Voter))
+        self.assertEqual(Voter.objects.get().first_name, 'Ann')
+        replica.refresh_replica(get_generation())
+        self.assertEqual(router.db_for_read(Voter), 'analytics')
+
+        # As does a migrate run that applied migrations, but not one with nothing to do
+        call_command('migrate', verbosity=0)
+        self.assertEqual(router.db_for_read(Voter), 'analytics')
+        call_command('migrate', 'voter_analytics', '0009', verbosity=0)
+        self.addCleanup(call_command, 'migrate', 'voter_analytics', verbosity=0)
+        self.assertIsNone(router.db_for_read(Voter))
+
+    def test_router_ignores_copies_not_recorded_as_current(self):
+        # Benchmark commands copy a scratch database without recording a generation,
+        # and a scratch database's own cache has none recorded
+        replica.refresh_replica()
+        self.assertIsNone(AnalyticsReplicaRouter().db_for_read(Voter))
+        replica.refresh_replica(get_generation())
+        cache.clear()
+        self.assertIsNone(AnalyticsReplicaRouter().db_for_read(Voter))
+
+
+VOTER_CSV_HEADER = [
+    'Last Name', 'First Name', 'Residential Address - Street Number', 'Residential Address - Street Name',
+    'Residential Address - Apartment Number', 'Residential Address - Zip Code', 'Date of Birth',
+    'Date of Registration', 'Party Affiliation', 'Precinct Number', *ELECTIONS,
+]
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RegistrationTrendTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        make_voter(date_of_registration=date(2000, 1, 5), party_affiliation='D')
+        make_voter(date_of_registration=date(2000, 1, 20), party_affiliation='R')
+        make_voter(date_of_registration=date(2000, 3, 1), party_affiliation='D', precinct_number=2)
+        VoterRollup.rebuild()
+        RegistrationMonth.rebuild()
+
+    def setUp(self):
+        chart_cache.clear()
+        party_choices.cache_clear()
+
+    def trends(self, **params):
+        response = self.client.get(reverse('registration_trends'), params)
+        return response.json()
+
+    def test_monthly_series_never_reads_voters(self):
+        with CaptureQueriesContext(connection) as queries:
+            trends = self.trends()
+        self.assertNotIn('"voter_analytics_voter"', ' '.join(query['sql'] for query in queries))
+        self.assertEqual(trends, {
+            'months': ['2000-01', '2000-02', '2000-03'],
+            'series': {'All voters': [2, 0, 1]},
+            'total': 3,
+        })
+
+    def test_filters_and_grouping(self):
+        self.assertEqual(self.trends(group_by='party_affiliation')['series'], {'D': [1, 0, 1], 'R': [1, 0, 0]})
+        self.assertEqual(self.trends(start='2000-02', precinct_number='2')['series'], {'All voters': [1]})
+        self.assertEqual(self.trends(end='1999-12')['months'], [])
+        self.assertEqual(self.client.get(reverse('registration_trends'), {'start': 'soon'}).status_code, 400)
+
+    def test_chart_page(self):
+        response = self.client.get(reverse('registration_graphs'), {'group_by': 'precinct_number'})
+        self.assertEqual([trace['name'] for trace in response.context['registration_graph']['data']], ['1', '2'])
+
+    def test_incremental_load_adjusts_buckets(self):
+        rows = [
+            ['Smith', 'Ann', '1', 'WALNUT ST', '', '02459', '1980-01-01', '2001-05-02', 'D', '1', *['TRUE'] * 5],
+            ['Jones', 'Bob', '2', 'WALNUT ST', '', '02459', '1970-01-01', '2001-05-09', 'R', '1', *['FALSE'] * 5],
+            ['Chen', 'Cal', '3', 'BEACON ST', '', '02460', '1990-01-01', '2002-07-01', 'U', '3', *['FALSE'] * 5],
+        ]
+        with tempfile.TemporaryDirectory() as tmp, self.settings(VOTER_SNAPSHOT_DIR=tmp, VOTER_ANALYTICS_REPLICA=False):
+            def load(rows, *args):
+                path = f'{tmp}/voters.csv'
+                with open(path, 'w', newline='') as f:
+                    csv.writer(f).writerows([VOTER_CSV_HEADER, *rows])
+                call_command('load_voters', path, *args, stdout=io.StringIO())
+
+            load(rows)
+            # Bob re-registers as unenrolled, Cal moves away and Dee arrives
+            rows[1][7:9] = ['2003-01-15', 'U']
+            rows[2] = ['Lee', 'Dee', '4', 'CENTRE ST', '', '02459', '1985-01-01', '2001-05-30', 'D', '1', *['FALSE'] * 5]
+            load(rows, '--incremental')
+
+        buckets = lambda: sorted(RegistrationMonth.objects.values_list('month', 'party_affiliation', 'precinct_number', 'count'))
+        adjusted = buckets()
+        self.assertEqual(adjusted, [
+            (date(2001, 5, 1), 'D', 1, 2),
+            (date(2003, 1, 1), 'U', 1, 1),
+        ])
+        RegistrationMonth.rebuild()
+        self.assertEqual(buckets(), adjusted)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class LoadVotersTests(TestCase):
+
+    def load(self, rows, *args):
+        """Run load_voters on a CSV of the given rows, returning what it printed."""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp, self.settings(VOTER_SNAPSHOT_DIR=tmp, VOTER_ANALYTICS_REPLICA=False):
+            path = f'{tmp}/voters.csv'
+            with open(path, 'w', newline='') as f:
+                csv.writer(f).writerows([VOTER_CSV_HEADER, *rows])
+            call_command('load_voters', path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_incremental_load_after_a_full_load(self):
+        ann = ['Smith', 'Ann', '1', 'WALNUT ST', '', '02459', '1980-01-01', '2001-05-02', 'D', '1', *['TRUE'] * 5]
+        bob = ['Jones', 'Bob', '2', 'WALNUT ST', '', '02459', '1970-01-01', '2001-05-09', 'R', '1', *['FALSE'] * 5]
+        cal = ['Chen', 'Cal', '3', 'BEACON ST', '', '02460', '1990-01-01', '2002-07-01', 'U', '3', *['FALSE'] * 5]
+        # A full load keeps Ann's duplicate row
+        stdout, _ = self.load([ann, bob, cal, ann])
+        self.assertIn('Inserted: 4', stdout)
+        first_ann, duplicate_ann = Voter.objects.filter(first_name='Ann').order_by('pk').values_list('pk', flat=True)
+        bob_pk = Voter.objects.get(first_name='Bob').pk
+
+        # Bob changes party, Cal moves away and Dee arrives
+        bob[8] = 'U'
+        dee = ['Lee', 'Dee', '4', 'CENTRE ST', '', '02459', '1985-01-01', '2001-05-30', 'D', '1', *['FALSE'] * 5]
+        stdout, stderr = self.load([ann, bob, dee, ann], '--incremental')
+        self.assertIn('Inserted: 1, Updated: 1, Deleted: 2, Unchanged: 1', stdout)
+        self.assertIn('Skipped 1 unparseable or duplicate rows.', stderr)
+        self.assertEqual(Voter.objects.get(first_name='Ann').pk, first_ann)
+        self.assertFalse(Voter.objects.filter(pk=duplicate_ann).exists())
+        self.assertEqual(Voter.objects.get(pk=bob_pk).party_affiliation, 'U')
+        self.assertEqual(sorted(Voter.objects.values_list('first_name', flat=True)), ['Ann', 'Bob', 'Dee'])
+        self.assertEqual(RegistrationMonth.objects.aggregate(total=Sum('count'))['total'], 3)
+
+        # Nothing left to change
+        stdout, _ = self.load([ann, bob, dee], '--incremental')
+        self.assertIn('Inserted: 0, Updated: 0, Deleted: 0, Unchanged: 3', stdout)
+
+
+@unittest.skipUnless(snapshot.available(), 'NumPy is not installed')
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class VoterSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        VoterGraphsViewTests.setUpTestData()
+
+    def setUp(self):
+        chart_cache.clear()
+        party_choices.cache_clear()
+
+    def test_summary_matches_orm(self):
+        voters = snapshot.VoterSnapshot.build()
+        for data in [{}, {'party_affiliation': 'D'}, {'max_birth_year': '1960', 'v20state': True},
+                     {'voter_score': '2', 'v23town': True}]:
+            form = VoterFilterForm(data)
+            self.assertTrue(form.is_valid())
+            self.assertEqual(
+                voters.summarize(form.cleaned_data),
+                summarize_voters(form.filter_queryset(Voter.objects.all())),
+            )
+        self.assertEqual(voters.summarize({'party_affiliation': 'G'})['total'], 0)
+
+    def test_save_and_load(self):
+        voters = snapshot.VoterSnapshot.build()
+        with tempfile.TemporaryDirectory() as tmp:
+            voters.save(f'{tmp}/1')
+            loaded = snapshot.VoterSnapshot.load(f'{tmp}/1')
+            self.assertEqual(loaded.summarize({}), voters.summarize({}))
+
+    def test_crosstab(self):
+        parties, years, counts = snapshot.VoterSnapshot.build().crosstab('party', 'birth_year')
+        self.assertEqual(list(years), [1950, 1990, 2000])
+        self.assertEqual(counts.sum(), 4)
+
+    def test_graphs_from_snapshot(self):
+        with self.settings(VOTER_GRAPHS_SNAPSHOT=True):
+            response = self.client.get(reverse('graphs'), {'max_birth_year': '1960', 'v20state': 'on'})
+        self.assertNotIn('error', response.context)
+        self.assertEqual(response.context['voter_count'], 2)
+
+
+@unittest.skipUnless(snapshot.available(), 'NumPy is not installed')
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CohortStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        VoterGraphsViewTests.setUpTestData()
+
+    def setUp(self):
+        party_choices.cache_clear()
+
+    def test_crosstab_with_retention(self):
+        stats = cohorts.cohort_stats(snapshot.VoterSnapshot.build(), {}, ['party', 'v20state'], ('v20state', 'v23town'))
+        cells = stats['cells']
+        self.assertEqual(stats['total'], 4)
+        self.assertEqual(list(zip(cells['party'], cells['v20state'])),
+                         [('D', False), ('D', True), ('R', True), ('U', False)])
+        self.assertEqual(cells['voters'], [1, 1, 1, 1])
+        self.assertEqual(cells['turnout']['v23town'], [0.0, 1.0, 0.0, 0.0])
+        self.assertEqual(cells['retention'], [None, 1.0, 0.0, None])
+
+    def test_sorted_numbering_matches_table(self):
+        voters = snapshot.VoterSnapshot.build()
+        by = ['birth_decade', 'party', 'voter_score']
+        with unittest.mock.patch.object(cohorts, 'MAX_TABLE', 0):
+            sorted_stats = cohorts.cohort_stats(voters, {}, by)
+        self.assertEqual(sorted_stats, cohorts.cohort_stats(voters, {}, by))
+
+    def test_endpoint_takes_voter_filters(self):
+        response = self.client.get(reverse('cohort_stats'), {'max_birth_year': '1960', 'by': 'birth_decade'})
+        cells = response.json()['cells']
+        self.assertEqual(cells['birth_decade'], [1950])
+        self.assertEqual(cells['voters'], [2])
+        self.assertEqual(cells['turnout']['v23town'], [0.5])
+        self.assertEqual(cells['score_distribution'], [[0, 1, 1, 0, 0, 0]])
+
+        response = self.client.get(reverse('cohort_stats'), {'retention_from': 'v21town'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ChartSpecTests(SimpleTestCase):
+    """The hand-built chart specs must match what plotly.graph_objects produces."""
+
+    summary = {
+        'birth_years': {1950: 2, 1990: 1},
+        'parties': {'D': 2, 'R': 1},
+        'elections': {'v20state': 2, 'v21town': 0, 'v21primary': 0, 'v22general': 1, 'v23town': 1},
+        'total': 3,
+    }
+
+    def plotly_figure(self, trace, **layout):
+        """Build a figure the way the views did with plotly.graph_objects."""
+        fig = go.Figure(data=[trace])
+        fig.update_layout(margin=dict(l=50, r=50, t=50, b=50), **layout)
+        figure = fig.to_dict()
+        # The Python-side default template is not part of the chart spec
+        figure['layout'].pop('template', None)
+        return figure
+
+    def test_birth_year_histogram(self):
+        expected = self.plotly_figure(
+            go.Bar(x=[1950, 1990], y=[2, 1], text=[2, 1], textposition='auto'),
+            title='Voter Distribution by Birth Year', xaxis_title='Birth Year',
+            yaxis_title='Number of Voters', showlegend=False, height=400,
+        )
+        self.assertEqual(VoterGraphsView().create_birth_year_histogram(self.summary), expected)
+
+    def test_party_pie_chart(self):
+        expected = self.plotly_figure(
+            go.Pie(labels=['D', 'R'], values=[2, 1]),
+            title='Voter Distribution by Party Affiliation', height=500, showlegend=True,
+        )
+        self.assertEqual(VoterGraphsView().create_party_pie_chart(self.summary), expected)
+
+    def test_election_histogram(self):
+        counts = [2, 0, 0, 1, 1]
+        expected = self.plotly_figure(
+            go.Bar(
+                x=['2020 State', '2021 Town', '2021 Primary', '2022 General', '2023 Town'],
+                y=counts, text=counts, textposition='auto',
+            ),
+            title='Voter Participation by Election', xaxis_title='Election',
+            yaxis_title='Number of Voters', showlegend=False, height=400,
+        )
+        self.assertEqual(VoterGraphsView().create_election_histogram(self.summary), expected)
@@ -5,6 +5,12 @@ from . import views
 urlpatterns = [
     path('', views.VoterListView.as_view(), name='voters'),
     path('voter/<int:pk>', views.VoterDetailView.as_view(), name='voter'),
+    path('precinct/<int:precinct>/households/', views.HouseholdListView.as_view(), name='households'),
     path('graphs/', views.VoterGraphsView.as_view(), name='graphs'),
+    path('graphs/registrations/', views.RegistrationTrendsView.as_view(), name='registration_graphs'),
+    path('graphs/registrations/data/', views.registration_trends_data, name='registration_trends'),
+    path('graphs/cohorts/', views.cohort_stats, name='cohort_stats'),
+    path('graphs/cache/', views.chart_cache_stats, name='graphs_cache_stats'),
+    path('export/', views.export_voters, name='voter_export'),
     
 ]
\ No newline at end of file
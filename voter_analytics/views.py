@@ -1,53 +1,72 @@
-from datetime import datetime
-from django.db.models import Q, Case, When, Value, Count
-from django.db.models.functions import ExtractYear
+from django.conf import settings
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.views.generic import ListView, DetailView
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from .forms import VoterFilterForm
-from .models import Voter
+from cs412.pagination import count_key
+from . import charts, cohorts, export, snapshot
+from .aggregates import registration_series, summarize_rollups
+from .cache import chart_cache, filter_key, get_generation
+from .forms import CohortForm, RegistrationTrendForm, VoterFilterForm, VoterSearchForm
+from .models import ELECTION_CHART_LABELS, Household, RegistrationMonth, Voter, VoterRollup
+from .pagination import KeysetPaginator
 
-class VoterListView(ListView):
-    """View to display voter listing with filters"""
+class VoterFilterMixin:
+    """Build the filter form once per request and filter the queryset with it"""
+    form_class = VoterFilterForm
+
+    def get_form(self):
+        if not hasattr(self, 'form'):
+            self.form = self.form_class(self.request.GET)
+        return self.form
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return self.get_form().filter_queryset(queryset)
+
+class VoterListView(VoterFilterMixin, ListView):
+    """View to display voter listing with filters, paged with keyset cursors"""
     template_name = 'voter_analytics/voter_list.html'
     model = Voter
+    form_class = VoterSearchForm
     context_object_name = 'voters'
     paginate_by = 100
+    # Unique ordering backed by the voter_name_order_idx index
+    ordering = ['last_name', 'first_name', 'id']
+
+    def get_keyset_fields(self, queryset):
+        """Return the unique ordering to page through the queryset by"""
+        # Search results page through the search index's copy of this ordering
+        if 'search_rank' in queryset.query.annotations:
+            return ['search_rank']
+        return self.ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        """Seek to the page after/before the cursor instead of using OFFSET"""
+        form = self.get_form()
+        # Counts are cached per filter combination until the next voter load
+        key = count_key('voters', get_generation(), form.cleaned_data if form.is_valid() else {})
+        paginator = KeysetPaginator(queryset, self.get_keyset_fields(queryset), page_size, count_key=key)
+        page = paginator.page(
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return (paginator, page, page.object_list, page.has_other_pages())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['form'] = VoterFilterForm(self.request.GET)
-        return context
+        context['form'] = self.get_form()
 
-    def get_queryset(self):
-        queryset = super().get_queryset().order_by('last_name', 'first_name')
-        
-        # Get filter parameters from GET request
-        party = self.request.GET.get('party_affiliation')
-        min_year = self.request.GET.get('min_birth_year')
-        max_year = self.request.GET.get('max_birth_year')
-        score = self.request.GET.get('voter_score')
-        
-        # Apply filters if they exist
-        if party:
-            queryset = queryset.filter(party_affiliation=party)
-            
-        if min_year:
-            queryset = queryset.filter(date_of_birth__year__gte=int(min_year))
-            
-        if max_year:
-            queryset = queryset.filter(date_of_birth__year__lte=int(max_year))
-            
-        if score:
-            queryset = queryset.filter(voter_score=int(score))
-            
-        # Check election participation filters
-        elections = ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']
-        for election in elections:
-            if self.request.GET.get(election):
-                queryset = queryset.filter(**{election: True})
-                
-        return queryset
+        # Filter parameters to carry over into the next/previous links
+        params = self.request.GET.copy()
+        for key in ('after', 'before', 'page', 'count'):
+            params.pop(key, None)
+        context['filter_params'] = params.urlencode()
+
+        # Counting every matching voter is optional, since it scans them all,
+        # but a count cached by an earlier request is always shown
+        paginator = context['paginator']
+        context['voter_count'] = paginator.count if self.request.GET.get('count') else paginator.known_count
+        return context
 
 class VoterDetailView(DetailView):
     """View to display details of a single voter"""
@@ -63,147 +82,182 @@ class VoterDetailView(DetailView):
         context['map_url'] = f"https://www.google.com/maps/search/?api=1&query={address}"
         return context
 
-class VoterGraphsView(ListView):
-    """View to display voter analytics graphs"""
+class HouseholdListView(ListView):
+    """View to display a precinct's walk list, one household per address in street order"""
+    template_name = 'voter_analytics/households.html'
+    model = Household
+    context_object_name = 'households'
+    paginate_by = 50
+    # Unique ordering backed by the household_precinct_key_idx index
+    ordering = ['key']
+
+    def get_queryset(self):
+        return super().get_queryset().filter(precinct_number=self.kwargs['precinct'])
+
+    def paginate_queryset(self, queryset, page_size):
+        """Seek to the page after/before the cursor instead of using OFFSET"""
+        paginator = KeysetPaginator(queryset, self.ordering, page_size)
+        page = paginator.page(
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['precinct'] = self.kwargs['precinct']
+        # Every member of the page's households in one query on household_key
+        households = {household.key: household for household in context['households']}
+        for household in households.values():
+            household.voters = []
+        voters = (
+            Voter.objects.filter(household_key__in=households)
+            .only('household_key', 'first_name', 'last_name', 'party_affiliation')
+            .order_by('household_key', 'last_name', 'first_name')
+        )
+        for voter in voters:
+            households[voter.household_key].voters.append(voter)
+        return context
+
+class VoterGraphsView(VoterFilterMixin, ListView):
+    """View to display voter analytics graphs, answered from the VoterRollup table"""
     template_name = 'voter_analytics/graphs.html'
-    model = Voter
-    context_object_name = 'voters'
+    model = VoterRollup
+    context_object_name = 'rollups'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         try:
-            # Get filtered queryset
-            queryset = self.get_queryset()
-            
             # Add filter form to context
-            context['form'] = VoterFilterForm(self.request.GET)
-            
-            # Create graphs
-            context['birth_year_graph'] = self.create_birth_year_histogram(queryset)
-            context['party_graph'] = self.create_party_pie_chart(queryset)
-            context['election_graph'] = self.create_election_histogram(queryset)
+            form = context['form'] = self.get_form()
             
-            # Add summary statistics
-            context['voter_count'] = queryset.count()
+            # Graphs and summary statistics, cached per filter combination
+            key = filter_key(form.cleaned_data) if form.is_valid() else ()
+            context.update(chart_cache.get_or_build(key, self.build_graphs))
             
         except Exception as e:
             context['error'] = f"Error generating graphs: {str(e)}"
         
         return context
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        form = VoterFilterForm(self.request.GET)
-        
-        if form.is_valid():
-            if party := form.cleaned_data.get('party_affiliation'):
-                queryset = queryset.filter(party_affiliation=party)
-                
-            if min_year := form.cleaned_data.get('min_birth_year'):
-                queryset = queryset.filter(date_of_birth__year__gte=int(min_year))
-                
-            if max_year := form.cleaned_data.get('max_birth_year'):
-                queryset = queryset.filter(date_of_birth__year__lte=int(max_year))
-                
-            if score := form.cleaned_data.get('voter_score'):
-                queryset = queryset.filter(voter_score=int(score))
-                
-            # Election participation filters
-            for election in ['v20state', 'v21town', 'v21primary', 'v22general', 'v23town']:
-                if form.cleaned_data.get(election):
-                    queryset = queryset.filter(**{election: True})
-        
-        return queryset
+    def build_graphs(self):
+        """Aggregate the filtered voters and build every graph"""
+        if settings.VOTER_GRAPHS_SNAPSHOT and (voter_snapshot := snapshot.get_snapshot()):
+            summary = voter_snapshot.summarize(self.form.cleaned_data if self.form.is_valid() else {})
+        else:
+            # A single query over the filtered rollup rows
+            summary = summarize_rollups(self.object_list)
+        return {
+            'birth_year_graph': self.create_birth_year_histogram(summary),
+            'party_graph': self.create_party_pie_chart(summary),
+            'election_graph': self.create_election_histogram(summary),
+            'voter_count': summary['total'],
+        }
 
-    def create_birth_year_histogram(self, queryset):
+    def create_birth_year_histogram(self, summary):
         """Create simple histogram of voter birth years"""
-        birth_years = (
-            queryset
-            .annotate(birth_year=ExtractYear('date_of_birth'))
-            .values('birth_year')
-            .annotate(count=Count('id'))
-            .order_by('birth_year')
-        )
-        
-        fig = go.Figure(data=[
-            go.Bar(
-                x=[year['birth_year'] for year in birth_years],
-                y=[year['count'] for year in birth_years],
-                text=[year['count'] for year in birth_years],
-                textposition='auto',
-            )
-        ])
-        
-        fig.update_layout(
+        birth_years = summary['birth_years']
+        return charts.bar_chart(
+            x=birth_years.keys(),
+            y=birth_years.values(),
             title='Voter Distribution by Birth Year',
             xaxis_title='Birth Year',
             yaxis_title='Number of Voters',
-            showlegend=False,
-            height=400,
-            margin=dict(l=50, r=50, t=50, b=50)
         )
-        
-        return fig.to_html(full_html=False)
 
-    def create_party_pie_chart(self, queryset):
+    def create_party_pie_chart(self, summary):
         """Create simple pie chart of party affiliations"""
-        party_counts = (
-            queryset
-            .values('party_affiliation')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
-        
-        fig = go.Figure(data=[
-            go.Pie(
-                labels=[party['party_affiliation'] for party in party_counts],
-                values=[party['count'] for party in party_counts],
-            )
-        ])
-        
-        fig.update_layout(
+        party_counts = summary['parties']
+        return charts.pie_chart(
+            labels=party_counts.keys(),
+            values=party_counts.values(),
             title='Voter Distribution by Party Affiliation',
-            height=500,
-            margin=dict(l=50, r=50, t=50, b=50),
-            showlegend=True
         )
-        
-        return fig.to_html(full_html=False)
 
-    def create_election_histogram(self, queryset):
+    def create_election_histogram(self, summary):
         """Create histogram of election participation"""
-        elections = {
-            'v20state': '2020 State',
-            'v21town': '2021 Town',
-            'v21primary': '2021 Primary',
-            'v22general': '2022 General',
-            'v23town': '2023 Town'
-        }
-        
-        participation = []
-        for field, name in elections.items():
-            count = queryset.filter(**{field: True}).count()
-            participation.append({
-                'election': name,
-                'count': count
-            })
-        
-        fig = go.Figure(data=[
-            go.Bar(
-                x=[p['election'] for p in participation],
-                y=[p['count'] for p in participation],
-                text=[p['count'] for p in participation],
-                textposition='auto',
-            )
-        ])
-        
-        fig.update_layout(
+        return charts.bar_chart(
+            x=ELECTION_CHART_LABELS.values(),
+            y=[summary['elections'][field] for field in ELECTION_CHART_LABELS],
             title='Voter Participation by Election',
             xaxis_title='Election',
             yaxis_title='Number of Voters',
-            showlegend=False,
-            height=400,
-            margin=dict(l=50, r=50, t=50, b=50)
         )
-        
-        return fig.to_html(full_html=False)
\ No newline at end of file
+
+
+def registration_trends(form):
+    """Return the monthly registration series for a valid RegistrationTrendForm, cached per filters"""
+    queryset = form.filter_queryset(RegistrationMonth.objects.all())
+    group_by = form.cleaned_data.get('group_by') or None
+    return chart_cache.get_or_build(
+        ('registrations', *filter_key(form.cleaned_data)),
+        lambda: registration_series(queryset, group_by),
+    )
+
+class RegistrationTrendsView(VoterFilterMixin, ListView):
+    """View to chart voter registrations by month, answered from the RegistrationMonth table"""
+    template_name = 'voter_analytics/registrations.html'
+    model = RegistrationMonth
+    form_class = RegistrationTrendForm
+    context_object_name = 'buckets'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = context['form'] = self.get_form()
+        if not form.is_valid():
+            context['error'] = form.errors.as_text()
+            return context
+
+        trends = registration_trends(form)
+        context['registration_graph'] = charts.line_chart(
+            x=trends['months'],
+            series=trends['series'],
+            title='Voter Registrations by Month',
+            xaxis_title='Month',
+            yaxis_title='Voters Registered',
+        )
+        context['registration_count'] = trends['total']
+        context['data_url'] = f"{reverse('registration_trends')}?{self.request.GET.urlencode()}"
+        return context
+
+def registration_trends_data(request):
+    """Return the monthly registration series for the trend filters as JSON"""
+    form = RegistrationTrendForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    return JsonResponse(registration_trends(form))
+
+
+def cohort_stats(request):
+    """Return turnout, score and retention statistics per cohort of the filtered voters as JSON"""
+    form = CohortForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    voter_snapshot = snapshot.get_snapshot()
+    if voter_snapshot is None:
+        return JsonResponse({'errors': {'__all__': ['Cohort statistics need NumPy.']}}, status=501)
+    return JsonResponse(cohorts.cohort_stats(
+        voter_snapshot, form.cleaned_data, by=form.cleaned_data['by'], retention=form.retention,
+    ))
+
+
+def chart_cache_stats(request):
+    """Report this worker's graph cache hit ratio and rebuild time as JSON"""
+    return JsonResponse(chart_cache.stats())
+
+
+def export_voters(request):
+    """Stream every voter matching the voter list filters and search as CSV or NDJSON"""
+    output = request.GET.get('output', 'csv')
+    if output not in export.FORMATS:
+        return HttpResponseBadRequest(f"Unknown export format: {output}")
+    form = VoterSearchForm(request.GET)
+    if not form.is_valid():
+        # Never fall back to exporting every voter on bad filters
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    queryset = form.filter_queryset(Voter.objects.all()).order_by(*VoterListView.ordering)
+    content_type, stream = export.FORMATS[output]
+    response = StreamingHttpResponse(stream(export.export_rows(queryset)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="voters.{output}"'
+    return response